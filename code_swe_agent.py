@@ -10,23 +10,34 @@ import sys
 import subprocess
 import tempfile
 import shutil
+import time
+from contextlib import contextmanager, nullcontext
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 from pathlib import Path
 
-from datasets import load_dataset
 from tqdm import tqdm
-import jsonlines
 
 from utils.claude_interface import ClaudeCodeInterface
 from utils.codex_interface import CodexCodeInterface
 from utils.gemini_interface import GeminiCodeInterface
 from utils.prompt_formatter import PromptFormatter
 from utils.patch_extractor import PatchExtractor
-from utils.model_registry import get_model_name
-
-
-DEFAULT_BACKEND = os.environ.get("CODE_SWE_BACKEND", "claude")
+from utils.model_registry import DEFAULT_BACKEND, get_model_name
+from utils.cli_probe import probe_cli
+from utils.cli_session import DEFAULT_IDLE_TIMEOUT
+from utils.dataset_cache import load_instances, select_instances
+from utils.failures import (AGENT, INFRA_TRANSIENT, RETRYABLE, CircuitBreaker, RetryQueue,
+                            classify_cli_failure, classify_exception)
+from utils.file_index import candidate_files
+from utils.symbol_index import write_symbol_index
+from utils.prediction_manifest import reserve_prediction_file
+from utils.results_sink import DEFAULT_INTERVAL, DEFAULT_MAX_BATCH, ResultsSink
+from utils.run_ledger import RunLedger
+from utils.sharding import load_shard_plan, parse_shard, select_shard
+from utils.telemetry import RunTelemetry
+from utils.time_budget import DEFAULT_BUDGET, TimeBudgets, run_deadline
+from utils import tracing
 
 
 class CodeSWEAgent:
@@ -34,7 +45,10 @@ class CodeSWEAgent:
 
     def __init__(self, prompt_template: Optional[str] = None,
                  model: Optional[str] = None,
-                 backend: str = DEFAULT_BACKEND):
+                 backend: str = DEFAULT_BACKEND,
+                 budget_options: Optional[Dict] = None,
+                 idle_timeout: Optional[float] = DEFAULT_IDLE_TIMEOUT,
+                 sink_options: Optional[Dict] = None):
         self.backend = (backend or DEFAULT_BACKEND).lower()
         if self.backend == "codex":
             self.interface = CodexCodeInterface()
@@ -59,6 +73,24 @@ class CodeSWEAgent:
         self.predictions_dir.mkdir(exist_ok=True)
         self.pred_timestamp: Optional[str] = None
         self.pred_file: Optional[Path] = None
+        self.telemetry: Optional[RunTelemetry] = None
+        # Keyword arguments for TimeBudgets (percentile, floor, ceiling, ...)
+        self.budget_options = budget_options or {}
+        self.time_budgets: Optional[TimeBudgets] = None
+        # Seconds without CLI output or workspace edits before a session counts as stalled
+        self.idle_timeout = idle_timeout
+        self.last_outcome: Optional[str] = None
+        # Failure class of the last instance (see utils.failures), None if it succeeded
+        self.last_failure: Optional[str] = None
+        # Keyword arguments for ResultsSink (interval, max_batch); a run's writes go through self.sink
+        self.sink_options = sink_options or {}
+        self.sink: Optional[ResultsSink] = None
+
+    @contextmanager
+    def _phase(self, name: str):
+        """Time a processing phase for telemetry and the trace, when enabled."""
+        with tracing.span(name), (self.telemetry.phase(name) if self.telemetry else nullcontext()):
+            yield
 
     def setup_repository(self, instance: Dict) -> Optional[str]:
         """Set up a repository for testing."""
@@ -81,12 +113,13 @@ class CodeSWEAgent:
             print(f"Cloning {repo_name} to {temp_dir}")
             clone_url = f"https://github.com/{repo_name}.git"
             
-            result = subprocess.run(
-                ["git", "clone", clone_url, str(temp_dir)],
-                capture_output=True,
-                text=True,
-                cwd=str(original_dir)  # Ensure we're in a valid directory
-            )
+            with tracing.span("git clone", repo=repo_name):
+                result = subprocess.run(
+                    ["git", "clone", clone_url, str(temp_dir)],
+                    capture_output=True,
+                    text=True,
+                    cwd=str(original_dir)  # Ensure we're in a valid directory
+                )
             
             if result.returncode != 0:
                 print(f"Failed to clone repository: {result.stderr}")
@@ -94,11 +127,12 @@ class CodeSWEAgent:
                 
             # Checkout base commit
             os.chdir(temp_dir)
-            result = subprocess.run(
-                ["git", "checkout", base_commit],
-                capture_output=True,
-                text=True
-            )
+            with tracing.span("git checkout", commit=base_commit):
+                result = subprocess.run(
+                    ["git", "checkout", base_commit],
+                    capture_output=True,
+                    text=True
+                )
             
             if result.returncode != 0:
                 print(f"Failed to checkout commit: {result.stderr}")
@@ -121,51 +155,99 @@ class CodeSWEAgent:
         """Process a single SWE-bench instance."""
         instance_id = instance["instance_id"]
         print(f"\nProcessing {instance_id}")
+        self.last_outcome = None
+        self.last_failure = None
 
         original_dir = os.getcwd()
 
-        repo_path = self.setup_repository(instance)
+        with self._phase("clone"):
+            repo_path = self.setup_repository(instance)
         if not repo_path:
+            self.last_failure = INFRA_TRANSIENT
             return {
                 "instance_id": instance_id,
                 "model": f"{self.backend}-code",
                 "prediction": "",
                 "error": "Failed to set up repository",
+                "failure": self.last_failure,
             }
 
         try:
-            prompt = self.prompt_formatter.format_for_cli(instance)
+            candidates = None
+            if self.prompt_formatter.wants_candidate_files:
+                with self._phase("retrieve"):
+                    candidates = self._candidate_files(instance, repo_path)
+            symbol_file = None
+            if self.prompt_formatter.wants_symbol_index:
+                with self._phase("symbols"):
+                    symbol_file = self._symbol_index(instance, repo_path)
+            prompt = self.prompt_formatter.format_for_cli(instance, candidates, symbol_file)
 
             os.chdir(repo_path)
             subprocess.run(["git", "add", "-A"], capture_output=True)
             subprocess.run(["git", "stash"], capture_output=True)
 
+            if self.time_budgets:
+                timeout, source = self.time_budgets.explain(instance_id)
+            else:
+                timeout, source = DEFAULT_BUDGET, "default"
             model_info = f" with model {self.model_alias}" if self.model else ""
-            print(f"Running {self.backend.title()} Code{model_info}...")
-            result = self.interface.execute_code_cli(prompt, repo_path, self.model)
-
-            if not result["success"]:
+            print(f"Running {self.backend.title()} Code{model_info} "
+                  f"(time budget {timeout:.0f}s, {source})...")
+            # Full transcripts stream to results/; the result holds only excerpts.
+            result_stem = self.results_dir / f"{instance_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            with self._phase("cli"):
+                result = self.interface.execute_code_cli(prompt, repo_path, self.model, timeout=timeout,
+                                                         idle_timeout=self.idle_timeout,
+                                                         transcript=str(result_stem))
+            if result.get("timed_out"):
+                self.last_outcome = "timeout"
+            elif result.get("stalled"):
+                self.last_outcome = "stalled"
+
+            # An interrupted session may already have edited files; keep that diff.
+            interrupted = self.last_outcome is not None
+            if interrupted:
+                print(f"⚠️  {result['stderr'].splitlines()[-1]}")
+            elif not result["success"]:
                 print(f"{self.backend.title()} Code execution failed: {result['stderr']}")
                 os.chdir(original_dir)
+                self.last_failure = classify_cli_failure(result)
                 return {
                     "instance_id": instance_id,
                     "model": self.model_alias or f"{self.backend}-code",
                     "prediction": "",
                     "error": f"Execution failed: {result['stderr']}",
+                    "failure": self.last_failure,
                 }
 
-            patch = self.patch_extractor.extract_from_cli_output(result["stdout"], repo_path)
-
-            is_valid, error = self.patch_extractor.validate_patch(patch)
-            if not is_valid:
-                print(f"Invalid patch: {error}")
-                patch = ""
+            with self._phase("extract"):
+                with tracing.span("diff"):
+                    patch = self.patch_extractor.extract_from_cli_output(result["stdout"], repo_path)
+
+                with tracing.span("validate"):
+                    is_valid, error = self.patch_extractor.validate_patch(patch)
+                if not is_valid:
+                    print(f"Invalid patch: {error}")
+                    patch = ""
+
+            if interrupted:
+                if not patch:
+                    self.last_failure = AGENT
+                    return {
+                        "instance_id": instance_id,
+                        "model": self.model_alias or f"{self.backend}-code",
+                        "prediction": "",
+                        "error": f"Execution failed: {result['stderr']}",
+                        "failure": self.last_failure,
+                    }
+                print(f"Salvaged {len(patch.splitlines())} diff lines from the interrupted session")
 
             prediction = self.patch_extractor.format_for_swebench(
                 patch, instance_id, self.model_alias or f"{self.backend}-code"
             )
 
-            self._save_result(instance_id, result, patch)
+            self._save_result(instance_id, result, patch, Path(f"{result_stem}.json"))
 
             return prediction
 
@@ -173,11 +255,13 @@ class CodeSWEAgent:
             import traceback
             print(f"Error processing instance: {e}")
             print(f"Traceback: {traceback.format_exc()}")
+            self.last_failure = classify_exception(e)
             return {
                 "instance_id": instance_id,
                 "model": self.model_alias or f"{self.backend}-code",
                 "prediction": "",
                 "error": str(e),
+                "failure": self.last_failure,
             }
         finally:
             try:
@@ -187,58 +271,100 @@ class CodeSWEAgent:
 
             if repo_path and os.path.exists(repo_path):
                 shutil.rmtree(repo_path)
-    def _save_result(self, instance_id: str, result: Dict, patch: str):
-        """Save detailed results for debugging."""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        result_file = self.results_dir / f"{instance_id}_{timestamp}.json"
-        
-        with open(result_file, 'w') as f:
-            json.dump({
-                "instance_id": instance_id,
-                "timestamp": timestamp,
-                "claude_output": result,
-                "extracted_patch": patch
-            }, f, indent=2)
-            
-    def run_on_dataset(self, dataset_name: str, split: str = "test",
-                      limit: Optional[int] = None) -> List[Dict]:
-        """Run on a full dataset."""
-        print(f"Loading dataset: {dataset_name}")
-        dataset = load_dataset(dataset_name, split=split)
-        
-        if limit:
-            dataset = dataset.select(range(min(limit, len(dataset))))
-            
-        self.pred_timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        self.pred_file = self.predictions_dir / f"predictions_{self.pred_timestamp}.jsonl"
-        if self.pred_file.exists():
-            self.pred_file.unlink()
-        json_file = self.predictions_dir / f"predictions_{self.pred_timestamp}.json"
-        if json_file.exists():
-            json_file.unlink()
 
-        predictions: List[Dict] = []
+    def _candidate_files(self, instance: Dict, repo_path: str) -> List[str]:
+        """Files the retrieval index ranks highest for the issue (empty if indexing fails)."""
+        try:
+            files = candidate_files(repo_path, instance)
+        except Exception as e:
+            print(f"Warning: Could not rank candidate files: {e}")
+            return []
+        print(f"Candidate files: {', '.join(files[:3])}{' ...' if len(files) > 3 else ''}")
+        return files
 
-        for instance in tqdm(dataset, desc="Processing instances"):
-            prediction = self.process_instance(instance)
-            predictions.append(prediction)
+    def _symbol_index(self, instance: Dict, repo_path: str) -> Optional[str]:
+        """Write the symbol lookup file into the workspace; None if indexing fails."""
+        try:
+            return write_symbol_index(repo_path, instance["repo"], instance["base_commit"])
+        except Exception as e:
+            print(f"Warning: Could not write symbol index: {e}")
+            return None
 
-            # Save prediction incrementally
-            self._save_predictions(prediction)
+    def _save_result(self, instance_id: str, result: Dict, patch: str,
+                     result_file: Optional[Path] = None):
+        """Save detailed results for debugging.
 
-        with open(json_file, 'w') as f:
-            json.dump(predictions, f, indent=2)
+        The session's full output is not copied here; ``result`` names the
+        transcript files it was streamed to.
+        """
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        result_file = result_file or self.results_dir / f"{instance_id}_{timestamp}.json"
+        data = {
+            "instance_id": instance_id,
+            "timestamp": timestamp,
+            "claude_output": result,
+            "extracted_patch": patch
+        }
+        if self.sink:
+            self.sink.write_json(result_file, data)
+            return
+        with open(result_file, 'w') as f:
+            json.dump(data, f, indent=2)
+            
+    def _reserve_prediction_file(self) -> Path:
+        """Create a new, uniquely named predictions file for this run.
 
-        print(f"Saved predictions to {self.pred_file}")
-        return predictions
+        The file is created exclusively, so concurrent runs started in the
+        same second get distinct ``predictions_<timestamp>_<n>.jsonl`` files
+        instead of appending to each other's.
+        """
+        self.pred_timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        return reserve_prediction_file(self.predictions_dir, self.pred_timestamp)
+
+    def start_run(self, dataset_name: str, split: str = "test",
+                  limit: Optional[int] = None, instances: Optional[List[Dict]] = None,
+                  metrics_file: Optional[str] = None, metrics_port: Optional[int] = None,
+                  progress: Optional[Callable[[int, int, Dict], None]] = None,
+                  shard: Optional[Tuple[int, int]] = None, shard_plan: Optional[str] = None,
+                  shard_info: Optional[Dict] = None) -> "GenerationRun":
+        """Prepare an in-process generation run; iterate it to process the instances.
+
+        ``instances`` may be passed in when the caller has already loaded the
+        dataset; otherwise it comes from the process-wide dataset cache.
+        ``shard`` (i, n) keeps only the i-th of n parts of the selection,
+        partitioned by stable hash or by the shared ``shard_plan`` file.
+        ``shard_info`` describes a selection the caller has already sharded.
+        """
+        if instances is None:
+            print(f"Loading dataset: {dataset_name}")
+            with tracing.span("load dataset", dataset=dataset_name):
+                instances = select_instances(dataset_name, limit, split)
+        elif limit:
+            instances = instances[:limit]
+        ledger = RunLedger(self.base_dir / "benchmark_scores.log")
+        if shard:
+            instances, shard_info = shard_instances(instances, shard, shard_plan, ledger, self.backend)
+        if self.time_budgets is None:
+            self.time_budgets = TimeBudgets.from_ledger(
+                ledger, self.backend, model=self.model_alias, **self.budget_options
+            )
+        return GenerationRun(self, dataset_name, instances, metrics_file, metrics_port, progress, shard_info)
+
+    def run_on_dataset(self, dataset_name: str, split: str = "test",
+                      limit: Optional[int] = None, metrics_file: Optional[str] = None,
+                      metrics_port: Optional[int] = None,
+                      shard: Optional[Tuple[int, int]] = None,
+                      shard_plan: Optional[str] = None) -> List[Dict]:
+        """Run on a full dataset, reporting live progress metrics."""
+        run = self.start_run(dataset_name, split, limit, metrics_file=metrics_file,
+                             metrics_port=metrics_port, shard=shard, shard_plan=shard_plan)
+        return run.run()
     
     def run_on_instance(self, instance_id: str, dataset_name: str = "princeton-nlp/SWE-bench_Lite") -> Dict:
         """Run on a single instance by ID."""
-        dataset = load_dataset(dataset_name, split="test")
-        
         # Find the instance
         instance = None
-        for item in dataset:
+        for item in load_instances(dataset_name):
             if item["instance_id"] == instance_id:
                 instance = item
                 break
@@ -247,14 +373,177 @@ class CodeSWEAgent:
             raise ValueError(f"Instance {instance_id} not found in dataset")
             
         return self.process_instance(instance)
-    
-    def _save_predictions(self, prediction: Dict):
-        """Append a single prediction to the jsonl file."""
-        if not self.pred_file:
-            raise ValueError("Prediction timestamp not initialized. Call run_on_dataset first.")
 
-        with jsonlines.open(self.pred_file, mode='a') as writer:
-            writer.write(prediction)
+
+def shard_instances(instances: List[Dict], shard: Tuple[int, int], plan_file: Optional[str],
+                    ledger: RunLedger, backend: str) -> Tuple[List[Dict], Dict]:
+    """This machine's part of ``instances`` and the ``shard_info`` its predictions are stamped with."""
+    index, count = shard
+    ids = [i["instance_id"] for i in instances]
+    plan = None
+    if plan_file:
+        plan = load_shard_plan(plan_file, ids, count, lambda: ledger.instance_durations(ids, backend))
+    selected, fingerprint = select_shard(instances, index, count, plan)
+    print(f"Shard {index}/{count}: {len(selected)} of {len(instances)} instances "
+          f"({'plan ' + plan_file if plan_file else 'stable-hash split'}, fingerprint {fingerprint})")
+    return selected, {"shard": f"{index}/{count}", "plan": fingerprint, "instances": ids}
+
+
+class GenerationRun:
+    """One in-process generation run over a fixed list of instances.
+
+    The predictions file is reserved when the run is created, so
+    ``prediction_file`` is known before any instance is processed. Iterating
+    the run processes the instances one by one and yields each prediction as
+    soon as it has been queued for that file; ``progress`` is called after
+    each one with ``(done, total, prediction)``. Predictions, result files
+    and ledger rows are written by one ``ResultsSink`` in group commits; the
+    files are complete once iteration ends.
+
+    Transient failures (see ``utils.failures``) are not written at once:
+    the instance goes to ``retry_queue`` and is retried after the other
+    instances, with backoff. ``breaker`` pauses dispatch after consecutive
+    backend-fatal failures and stops the run if the backend stays broken;
+    instances never attempted end up in ``skipped``.
+
+    With ``shard`` (``{"shard", "plan", "instances"}``) every prediction in
+    the file is stamped with the shard and plan, and the first one also
+    lists all instances of the split, for ``swe_bench.py merge``.
+    """
+
+    def __init__(self, agent: CodeSWEAgent, dataset_name: str, instances: List[Dict],
+                 metrics_file: Optional[str] = None, metrics_port: Optional[int] = None,
+                 progress: Optional[Callable[[int, int, Dict], None]] = None,
+                 shard: Optional[Dict] = None):
+        self.agent = agent
+        self.dataset_name = dataset_name
+        self.instances = instances
+        self.metrics_file = metrics_file
+        self.metrics_port = metrics_port
+        self.progress = progress
+        self.shard = shard
+        self.predictions: List[Dict] = []
+        self.prediction_file = agent._reserve_prediction_file()
+        self.json_file = self.prediction_file.with_suffix(".json")
+        self.run_id = agent.pred_timestamp
+        # The run's time limit grows with the instances' budgets instead of
+        # being a constant that silently cuts large runs short.
+        budgets = agent.time_budgets or TimeBudgets()
+        self.deadline = run_deadline(budgets.for_instance(i["instance_id"]) for i in instances)
+        self.skipped: List[str] = []
+        self.sleep = time.sleep
+        self.retry_queue = RetryQueue()
+        self.breaker = CircuitBreaker(sleep=lambda seconds: self.sleep(seconds))
+
+    @property
+    def instance_ids(self) -> List[str]:
+        return [instance["instance_id"] for instance in self.instances]
+
+    def __iter__(self) -> Iterator[Dict]:
+        agent = self.agent
+        agent.pred_file = self.prediction_file
+        ledger = RunLedger(agent.base_dir / "benchmark_scores.log")
+        instance_ids = self.instance_ids
+        try:
+            history = ledger.instance_durations(instance_ids, agent.backend)
+        except Exception as e:
+            print(f"Warning: Could not read instance history: {e}")
+            history = {}
+        agent.telemetry = RunTelemetry(
+            self.run_id, instance_ids, agent.backend, agent.model_alias,
+            textfile=self.metrics_file, port=self.metrics_port, history=history,
+        )
+        agent.telemetry.start()
+        agent.sink = ResultsSink(ledger, **agent.sink_options)
+        started = time.time()
+        queue, breaker = self.retry_queue, self.breaker
+        bar = tqdm(total=len(self.instances), desc="Processing instances")
+        position = 0
+
+        try:
+            while position < len(self.instances) or len(queue):
+                # First pass in order, then the deferred retries as they become ready.
+                if position < len(self.instances):
+                    instance = self.instances[position]
+                    position += 1
+                else:
+                    ready, instance = queue.pop()
+                    wait = ready - time.time()
+                    if wait > 0 and time.time() + wait - started > self.deadline:
+                        # Retrying before the backoff ends would just hit the failing backend again.
+                        self.skipped = [instance["instance_id"]] + [i["instance_id"] for i in queue.remaining()]
+                        tqdm.write(f"⚠️ Run time limit of {self.deadline / 60:.0f} minutes reached before the "
+                                   f"next retry; skipping the remaining {len(self.skipped)} instance(s)")
+                        break
+                    if wait > 0:
+                        tqdm.write(f"↻ Retrying {instance['instance_id']} in {wait:.0f}s")
+                        self.sleep(wait)
+                instance_id = instance["instance_id"]
+                unattempted = [instance_id] + self.instance_ids[position:] + \
+                    [i["instance_id"] for i in queue.remaining()]
+                if time.time() - started > self.deadline:
+                    self.skipped = unattempted
+                    tqdm.write(f"⚠️ Run time limit of {self.deadline / 60:.0f} minutes reached; "
+                               f"skipping the remaining {len(self.skipped)} instance(s)")
+                    break
+                if breaker.exhausted:
+                    self.skipped = unattempted
+                    tqdm.write(f"⛔ Backend still failing after {breaker.trips} pause(s); stopping the run "
+                               f"and skipping the remaining {len(self.skipped)} instance(s)")
+                    break
+                if breaker.open:
+                    agent.telemetry.set_circuit(True)
+                    breaker.pause()
+                    agent.telemetry.set_circuit(False)
+
+                agent.telemetry.start_instance(instance_id)
+                with tracing.span("instance", cat="instance", instance_id=instance_id):
+                    prediction = agent.process_instance(instance)
+                failure = agent.last_failure
+                breaker.record(failure, prediction.get("error", ""))
+                if failure in RETRYABLE and queue.defer(instance):
+                    # Not recorded in the ledger: a failed attempt says nothing about the instance's duration.
+                    agent.telemetry.defer_instance(instance_id, failure)
+                    tqdm.write(f"↻ {instance_id}: {failure.replace('_', ' ')} failure; "
+                               f"deferred for retry {queue.attempts[instance_id]} of {queue.max_attempts - 1}")
+                    continue
+                bar.update(1)
+                self.predictions.append(prediction)
+
+                # Save prediction incrementally
+                record = prediction
+                if self.shard:
+                    stamp = {"shard": self.shard["shard"], "plan": self.shard["plan"]}
+                    if len(self.predictions) == 1:
+                        stamp["instances"] = self.shard["instances"]
+                    record = dict(prediction, shard=stamp)
+                agent.sink.append(self.prediction_file, record)
+
+                failed = "error" in prediction
+                seconds = agent.telemetry.finish_instance(instance_id, not failed, failure)
+                outcome = agent.last_outcome or failure or (
+                    "error" if failed else ("patch" if prediction.get("prediction") else "empty")
+                )
+                agent.sink.record_instance(instance_id, seconds, outcome, agent.backend, agent.model_alias)
+                tqdm.write(agent.telemetry.progress_line())
+                if self.progress:
+                    self.progress(len(self.predictions), len(self.instances), prediction)
+                yield prediction
+        finally:
+            # Also runs when the consumer stops iterating early (``--until-ci``).
+            bar.close()
+            agent.telemetry.stop()
+            agent.telemetry = None
+            sink, agent.sink = agent.sink, None
+            sink.write_json(self.json_file, self.predictions)
+            sink.close()
+            print(f"Saved predictions to {self.prediction_file}")
+
+    def run(self) -> List[Dict]:
+        """Process every instance and return the predictions."""
+        for _ in self:
+            pass
+        return self.predictions
 
 
 def main():
@@ -272,10 +561,38 @@ def main():
                        help="Model to use (e.g., opus-4.1, codex-4.2, or any name)")
     parser.add_argument("--backend", type=str, choices=["claude", "codex", "gemini"],
                        help="Code model backend to use")
+    parser.add_argument("--metrics_file", type=str,
+                       help="Write live Prometheus metrics to this textfile")
+    parser.add_argument("--metrics_port", type=int,
+                       help="Also serve live metrics on http://127.0.0.1:PORT/metrics")
+    parser.add_argument("--budget_percentile", type=float, default=90.0,
+                       help="Percentile of past session durations used for time budgets (default: 90)")
+    parser.add_argument("--budget_floor", type=float, default=120.0,
+                       help="Minimum seconds per agent session (default: 120)")
+    parser.add_argument("--budget_ceiling", type=float, default=1800.0,
+                       help="Maximum seconds per agent session (default: 1800)")
+    parser.add_argument("--idle_timeout", type=float, default=DEFAULT_IDLE_TIMEOUT,
+                       help="End a session after this many seconds without output or file edits "
+                            "(default: 300, 0 disables)")
+    parser.add_argument("--shard", type=str, metavar="I/N",
+                       help="Process only the I-th of N deterministic parts of the instances")
+    parser.add_argument("--shard_plan", type=str, metavar="FILE",
+                       help="Shard plan shared by every shard (written from this machine's timings if missing)")
+    parser.add_argument("--commit_interval", type=float, default=DEFAULT_INTERVAL,
+                       help="Seconds the results writer gathers records before one fsync'd group commit (default: 1)")
+    parser.add_argument("--commit_batch", type=int, default=DEFAULT_MAX_BATCH,
+                       help="Commit early once this many records are queued (default: 256)")
     
     args = parser.parse_args()
     
+    # Joins the trace when launched by `swe_bench.py run --trace`
+    tracing.init_from_env("code_swe_agent")
+
     backend = args.backend or DEFAULT_BACKEND
+    try:
+        shard = parse_shard(args.shard) if args.shard else None
+    except ValueError as e:
+        parser.error(str(e))
 
     # Check if selected CLI is available
     if backend == "codex":
@@ -285,16 +602,18 @@ def main():
     else:
         cli_cmd = "claude"
 
-    try:
-        result = subprocess.run([cli_cmd, "--version"], capture_output=True, text=True)
-        if result.returncode != 0:
-            print(f"Error: {cli_cmd} CLI not found. Please ensure '{cli_cmd}' is installed and in PATH")
-            sys.exit(1)
-    except FileNotFoundError:
+    if probe_cli(cli_cmd) is None:
         print(f"Error: {cli_cmd} CLI not found. Please ensure '{cli_cmd}' is installed and in PATH")
         sys.exit(1)
 
-    agent = CodeSWEAgent(args.prompt_template, args.model, backend)
+    agent = CodeSWEAgent(args.prompt_template, args.model, backend, budget_options={
+        "percentile": args.budget_percentile,
+        "floor": args.budget_floor,
+        "ceiling": args.budget_ceiling,
+    }, idle_timeout=args.idle_timeout, sink_options={
+        "interval": args.commit_interval,
+        "max_batch": args.commit_batch,
+    })
     
     # Run on specific instance or dataset
     if args.instance_id:
@@ -303,7 +622,11 @@ def main():
         print(f"Prediction saved: {prediction}")
     else:
         print(f"Running on dataset: {args.dataset_name}")
-        predictions = agent.run_on_dataset(args.dataset_name, limit=args.limit)
+        predictions = agent.run_on_dataset(
+            args.dataset_name, limit=args.limit,
+            metrics_file=args.metrics_file, metrics_port=args.metrics_port, shard=shard,
+            shard_plan=args.shard_plan,
+        )
         print(f"Processed {len(predictions)} instances")
 
 
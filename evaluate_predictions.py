@@ -5,10 +5,9 @@ Supports individual files, date ranges, patterns, and interactive selection
 """
 
 import argparse
+import hashlib
 import json
 import os
-import sys
-import subprocess
 import time
 import re
 from datetime import datetime, timedelta
@@ -17,39 +16,42 @@ import jsonlines
 from typing import List, Tuple
 import logging
 
+from utils.evaluation_harness import execute_batch_evaluation, execute_evaluation
+from utils.image_cache import BUDGET_ENV_VAR, parse_image_budget, resolve_image_budget
+from utils.worker_autoscaler import parse_max_workers
+from utils.run_ledger import RunLedger
+from utils.prediction_manifest import PredictionManifest
+
 class PredictionEvaluator:
     def __init__(self):
         self.base_dir = Path.cwd()
         self.predictions_dir = self.base_dir / "predictions"
+        self.manifest = PredictionManifest(self.predictions_dir)
         self.log_file = self.base_dir / "benchmark_scores.log"
+        self.ledger = RunLedger(self.log_file)
         self.eval_results_dir = self.base_dir / "evaluation_results"
         self.eval_results_dir.mkdir(exist_ok=True)
         
     def get_prediction_files(self) -> List[Tuple[Path, datetime, int]]:
         """Get all prediction files with metadata"""
+        manifest = self.manifest.refresh()
+        
         files = []
-        for f in self.predictions_dir.glob("predictions_*.jsonl"):
-            # Skip eval files
-            if "_eval.jsonl" in str(f):
-                continue
+        for path_str, entry in manifest.items():
+            f = Path(path_str)
             
-            # Extract timestamp from filename (predictions_YYYYMMDD_HHMMSS.jsonl)
-            match = re.search(r'predictions_(\d{8})_(\d{6})\.jsonl', f.name)
+            # Extract timestamp from filename (predictions_YYYYMMDD_HHMMSS[_N].jsonl)
+            match = re.search(r'predictions_(\d{8})_(\d{6})(?:_\d+)?\.jsonl', f.name)
             if match:
                 date_str = match.group(1)
                 time_str = match.group(2)
                 timestamp = datetime.strptime(f"{date_str}_{time_str}", "%Y%m%d_%H%M%S")
                 
-                # Count instances
-                instance_count = 0
-                try:
-                    with jsonlines.open(f) as reader:
-                        instance_count = sum(1 for _ in reader)
-                except (jsonlines.Error, OSError) as exc:
-                    print(f"Warning: Could not read {f}: {exc}")
+                if "error" in entry:
+                    print(f"Warning: Could not read {f}: {entry['error']}")
                     continue
 
-                files.append((f, timestamp, instance_count))
+                files.append((f, timestamp, entry["instance_count"]))
         
         return sorted(files, key=lambda x: x[1], reverse=True)
     
@@ -132,25 +134,13 @@ class PredictionEvaluator:
 
     def check_evaluation_status(self, prediction_file) -> str:
         """Check if a prediction file has been evaluated"""
-        if not self.log_file.exists():
-            return "unknown"
-        
-        with open(self.log_file, 'r') as f:
-            for line in f:
-                try:
-                    entry = json.loads(line)
-                    if entry.get("prediction_file", "").endswith(prediction_file.name):
-                        return entry.get("evaluation_status", "unknown")
-                except json.JSONDecodeError:
-                    print(f"Warning: Skipping invalid JSON line: {line.strip()}")
-                except Exception as exc:
-                    print(f"Warning: Failed to parse log line due to {exc}: {line.strip()}")
-
-        return "unknown"
+        return self.ledger.status(prediction_file)
     
     def evaluate_file(self, prediction_file: Path, dataset_name="princeton-nlp/SWE-bench_Lite",
-                      max_workers=2, update_log=True, force=False) -> Tuple[float, float]:
-        """Evaluate a single prediction file"""
+                      max_workers=2, update_log=True, force=False,
+                      image_budget=None, instance_ids=None,
+                      instance_subset=None) -> Tuple[float, float]:
+        """Evaluate a single prediction file, optionally only the predictions for ``instance_ids``"""
         print(f"\n{'='*70}")
         print(f"Evaluating: {prediction_file.name}")
         print(f"{'='*70}")
@@ -171,61 +161,29 @@ class PredictionEvaluator:
         
         # Prepare for evaluation
         eval_file = str(prediction_file).replace('.jsonl', '_eval.jsonl')
-        
-        # Convert to evaluation format
-        predictions = []
-        with jsonlines.open(prediction_file) as reader:
-            for obj in reader:
-                predictions.append(obj)
+        if instance_ids is not None:
+            eval_file = eval_file.replace('_eval.jsonl', '_subset_eval.jsonl')
+        predictions, model_name = self.load_eval_predictions(prediction_file, instance_ids, instance_subset)
+        if not predictions:
+            return None, 0
 
-        model_name = None
         with jsonlines.open(eval_file, mode='w') as writer:
-            for pred in predictions:
-                if model_name is None:
-                    model_name = pred.get("model", "claude-code")
-                eval_pred = {
-                    "instance_id": pred.get("instance_id", ""),
-                    "model_name_or_path": model_name,
-                    "model_patch": pred.get("prediction", "")
-                }
-                writer.write(eval_pred)
+            writer.write_all(predictions)
         
         # Run evaluation
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         run_id = f"eval_{timestamp}"
         
-        cmd = [
-            sys.executable, "-m", "swebench.harness.run_evaluation",
-            "--predictions_path", eval_file,
-            "--dataset_name", dataset_name,
-            "--split", "test",
-            "--run_id", run_id,
-            "--max_workers", str(max_workers),
-            "--timeout", "600",
-            "--cache_level", "env",
-            "--report_dir", str(self.eval_results_dir),
-        ]
+        instance_ids = [pred.get("instance_id", "") for pred in predictions]
         
         print(f"\n🔬 Running Docker evaluation...")
-        print(f"Command: {' '.join(cmd)}")
         
         try:
             start_time = time.time()
-            process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                bufsize=1,
-                cwd=str(self.eval_results_dir),
+            output_lines = execute_evaluation(
+                eval_file, dataset_name, run_id, instance_ids, max_workers,
+                self.eval_results_dir, image_budget=image_budget,
             )
-            
-            output_lines = []
-            for line in iter(process.stdout.readline, ''):
-                print(line, end='')
-                output_lines.append(line)
-            
-            process.wait()
             eval_time = time.time() - start_time
 
             json_path = self.eval_results_dir / f"{model_name}.{run_id}.json"
@@ -269,7 +227,8 @@ class PredictionEvaluator:
             print(f"\n✅ Evaluation Score: {score:.2f}% ({resolved}/{total} issues fixed)")
 
             if update_log:
-                self.update_log_entry(prediction_file, score, eval_time)
+                report = str(json_path) if json_path.exists() else None
+                self.update_log_entry(prediction_file, score, eval_time, report, instance_subset)
 
             return score, eval_time
                 
@@ -277,44 +236,191 @@ class PredictionEvaluator:
             print(f"\n❌ Evaluation error: {e}")
             return None, 0
     
-    def update_log_entry(self, prediction_file: Path, eval_score: float, eval_time: float):
-        """Update log file with evaluation results"""
-        if not self.log_file.exists():
-            return
-        
-        # Read existing entries
-        entries = []
-        updated = False
-        
-        with open(self.log_file, 'r') as f:
-            for line in f:
-                try:
-                    entry = json.loads(line)
-                    if entry.get("prediction_file", "").endswith(prediction_file.name):
-                        # Update this entry
-                        entry["evaluation_score"] = eval_score
-                        entry["evaluation_time"] = eval_time
-                        entry["evaluation_status"] = "completed"
-                        entry["evaluation_timestamp"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                        updated = True
-                    entries.append(entry)
-                except json.JSONDecodeError:
-                    print(f"Warning: Skipping invalid JSON line: {line.strip()}")
-                    entries.append(line.strip())
-                except Exception as exc:
-                    print(f"Warning: Failed to parse log line due to {exc}: {line.strip()}")
-                    entries.append(line.strip())
-        
-        # Write back
-        with open(self.log_file, 'w') as f:
-            for entry in entries:
-                if isinstance(entry, dict):
-                    f.write(json.dumps(entry) + '\n')
-                else:
-                    f.write(entry + '\n')
+    def load_eval_predictions(self, prediction_file: Path, instance_ids=None,
+                              instance_subset=None) -> Tuple[List[dict], str]:
+        """Predictions of a file in harness format, optionally only those for ``instance_ids``"""
+        predictions = []
+        with jsonlines.open(prediction_file) as reader:
+            for obj in reader:
+                predictions.append(obj)
+
+        if instance_ids is not None:
+            wanted = set(instance_ids)
+            predictions = [p for p in predictions if p.get("instance_id") in wanted]
+            print(f"Evaluating the {len(predictions)} predictions listed in {instance_subset or 'the instance file'}")
+            if not predictions:
+                print("⚠️ None of the selected instances are in this file.")
+
+        model_name = predictions[0].get("model", "claude-code") if predictions else "claude-code"
+        return [{
+            "instance_id": pred.get("instance_id", ""),
+            "model_name_or_path": model_name,
+            "model_patch": pred.get("prediction", "")
+        } for pred in predictions], model_name
+
+    def evaluate_files(self, prediction_files: List[Path], dataset_name="princeton-nlp/SWE-bench_Lite",
+                       max_workers=2, update_log=True, force=False, image_budget=None,
+                       instance_ids=None, instance_subset=None,
+                       reuse_containers=False, executor="docker",
+                       parity_sample=0) -> List[Tuple[Path, float, float]]:
+        """Evaluate several prediction files as one harness batch.
+
+        All predictions share one worker pool; each file keeps its own run ID,
+        report and ledger entry. With ``reuse_containers``, the files'
+        patches for the same instance are graded in one warm container.
+        ``executor="local"`` grades without Docker, only for repos that have a
+        local environment spec, and records the score in separate
+        ``local_evaluation_*`` fields; ``parity_sample`` then re-grades that
+        many predictions with Docker and reports agreement.
+        Returns (file, score, evaluation time) for each file that was scored;
+        the time is the file's share of the batch.
+        """
+        runs = []
+        for prediction_file in prediction_files:
+            if executor == "local":
+                done = (self.ledger.get(prediction_file) or {}).get("local_evaluation_score") is not None
+            else:
+                done = self.check_evaluation_status(prediction_file) == "completed"
+            if done and not force:
+                print(f"⚠️ {prediction_file.name} has already been evaluated; skipping (use --force to re-evaluate)")
+                continue
+            predictions, model_name = self.load_eval_predictions(prediction_file, instance_ids, instance_subset)
+            if predictions:
+                runs.append({"file": prediction_file, "model": model_name, "predictions": predictions})
+        if not runs:
+            return []
+        if executor == "local":
+            from utils.dataset_cache import load_instances
+            from utils.local_executor import missing_env_specs
+
+            wanted = {pred["instance_id"] for run in runs for pred in run["predictions"]}
+            missing = missing_env_specs(i for i in load_instances(dataset_name) if i["instance_id"] in wanted)
+            if missing:
+                print(f"\n❌ No local environment spec for: {', '.join(missing)}")
+                print("   Add them to local_envs.json (checked with --parity-check), or evaluate with Docker")
+                return []
+
+        batch_id = f"eval_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        for n, run in enumerate(runs, 1):
+            run["run_id"] = f"{batch_id}_{n}"
+        total = sum(len(run["predictions"]) for run in runs)
+        where = "local" if executor == "local" else "Docker"
+        print(f"\n🔬 Running {where} evaluation of {len(runs)} file(s), {total} predictions, as one batch...")
+
+        start_time = time.time()
+        try:
+            execute_batch_evaluation(runs, dataset_name, max_workers, self.eval_results_dir,
+                                     batch_id, image_budget=image_budget,
+                                     reuse_containers=reuse_containers, executor=executor)
+        except Exception as e:
+            print(f"\n❌ Evaluation error: {e}")
+            return []
+        batch_time = time.time() - start_time
+        if executor == "local" and parity_sample:
+            self.check_parity(runs, dataset_name, max_workers, batch_id, parity_sample, image_budget)
+
+        results = []
+        for run in runs:
+            eval_time = batch_time * len(run["predictions"]) / total
+            json_path = self.eval_results_dir / f"{run['model'].replace('/', '__')}.{run['run_id']}.json"
+            try:
+                with open(json_path) as f:
+                    data = json.load(f)
+            except (OSError, json.JSONDecodeError) as exc:
+                print(f"\n⚠️ {run['file'].name}: missing evaluation report {json_path}: {exc}")
+                continue
+            resolved = data.get("resolved_instances", 0)
+            total_instances = data.get("total_instances") or len(run["predictions"])
+            score = (resolved / total_instances) * 100 if total_instances else 0
+            print(f"✅ {run['file'].name}: {score:.2f}% ({resolved}/{total_instances} issues fixed)")
+            if update_log:
+                self.update_log_entry(run["file"], score, eval_time, str(json_path), instance_subset,
+                                      batch=batch_id, executor=executor)
+            results.append((run["file"], score, eval_time))
+        print(f"Batch evaluation time: {batch_time:.1f}s")
+        return results
+
+    def _resolved_ids(self, model: str, run_id: str):
+        """Resolved instance IDs from a run's harness report, or None if it is missing."""
+        try:
+            with open(self.eval_results_dir / f"{model.replace('/', '__')}.{run_id}.json") as f:
+                return set(json.load(f).get("resolved_ids", []))
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def check_parity(self, runs, dataset_name, max_workers, batch_id, sample, image_budget=None):
+        """Re-grade a stable sample of a local batch with Docker and compare the outcomes."""
+        from utils.local_executor import parity_summary
+
+        candidates = [(run, pred) for run in runs for pred in run["predictions"] if pred["model_patch"]]
+        # Hash order keeps the sample stable across re-runs of the same files.
+        candidates.sort(key=lambda c: hashlib.sha256(
+            f"{c[0]['file'].name}:{c[1]['instance_id']}".encode("utf-8")).hexdigest())
+        docker_runs = {}
+        for run, pred in candidates[:sample]:
+            docker_runs.setdefault(run["run_id"], {
+                "run_id": f"{run['run_id']}_docker", "model": run["model"], "predictions": [],
+            })["predictions"].append(pred)
+        if not docker_runs:
+            return None
+
+        print(f"\n🔁 Parity check: re-grading {min(sample, len(candidates))} prediction(s) with Docker...")
+        try:
+            execute_batch_evaluation(list(docker_runs.values()), dataset_name, max_workers,
+                                     self.eval_results_dir, f"{batch_id}_docker", image_budget=image_budget)
+        except Exception as e:
+            print(f"⚠️ Parity check failed: {e}")
+            return None
+        local, docker = {}, {}
+        for run_id, docker_run in docker_runs.items():
+            local_ids = self._resolved_ids(docker_run["model"], run_id)
+            docker_ids = self._resolved_ids(docker_run["model"], docker_run["run_id"])
+            if local_ids is None or docker_ids is None:
+                print(f"⚠️ Parity check: missing report for {run_id}")
+                continue
+            ids = [pred["instance_id"] for pred in docker_run["predictions"]]
+            local[run_id] = {i: i in local_ids for i in ids}
+            docker[run_id] = {i: i in docker_ids for i in ids}
+
+        summary = parity_summary(local, docker)
+        with open(self.eval_results_dir / f"{batch_id}_parity.json", "w") as f:
+            json.dump(summary, f, indent=2)
+        if summary["compared"]:
+            print(f"🔁 Parity with Docker: {summary['agreed']}/{summary['compared']} agree "
+                  f"({summary['agreement'] * 100:.1f}%)")
+        for mismatch in summary["mismatches"]:
+            print(f"   ✗ {mismatch['instance_id']} ({mismatch['run_id']}): "
+                  f"local {'resolved' if mismatch['local'] else 'unresolved'}, "
+                  f"Docker {'resolved' if mismatch['docker'] else 'unresolved'}")
+        return summary
+
+    def update_log_entry(self, prediction_file: Path, eval_score: float, eval_time: float,
+                         evaluation_report: str = None, instance_subset: str = None,
+                         batch: str = None, executor: str = None):
+        """Update the run ledger with evaluation results"""
+        fields = {
+            "evaluation_score": eval_score,
+            "evaluation_time": eval_time,
+            "evaluation_status": "completed",
+            "evaluation_timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            # The score only covers these instances when a subset was evaluated
+            "evaluation_subset": instance_subset,
+        }
+        if evaluation_report:
+            fields["evaluation_report"] = evaluation_report
+        if batch:
+            # evaluation_time is this file's share of the batch's wall time
+            fields["evaluation_batch"] = batch
+        if executor == "local":
+            # Local environments only approximate the instance images: keep their
+            # scores apart from Docker's (see `scores --local`).
+            fields.pop("evaluation_status")
+            fields = {f"local_{name}": value for name, value in fields.items()}
+        updated = self.ledger.update(prediction_file, fields)
         
         if updated:
-            print(f"✅ Updated log file with evaluation score: {eval_score:.2f}%")
+            print(f"✅ Updated run ledger with {'local ' if executor == 'local' else ''}"
+                  f"evaluation score: {eval_score:.2f}%")
 
 def main():
     parser = argparse.ArgumentParser(
@@ -339,14 +445,26 @@ def main():
     # Other options
     parser.add_argument("--dataset", default="princeton-nlp/SWE-bench_Lite",
                        help="Dataset name")
-    parser.add_argument("--max-workers", type=int, default=2,
-                       help="Max parallel Docker containers")
+    parser.add_argument("--max-workers", type=parse_max_workers, default=2,
+                       help="Max parallel Docker containers, or 'auto' to size from host resources")
+    parser.add_argument("--image-budget", type=parse_image_budget, metavar="SIZE",
+                       default=os.environ.get(BUDGET_ENV_VAR),
+                       help="Keep evaluation images under SIZE (e.g. 200G), evicting "
+                            "least recently used ones (default: $SWE_BENCH_IMAGE_BUDGET)")
     parser.add_argument("--dry-run", action="store_true",
                        help="Show what would be evaluated without running")
     parser.add_argument("--no-update-log", action="store_true",
-                       help="Don't update the log file")
+                       help="Don't update the run ledger")
     parser.add_argument("--force", "--yes", action="store_true",
                         help="Skip confirmation prompts and re-evaluate files")
+    parser.add_argument("--no-batch", action="store_true",
+                        help="Evaluate selected files one after another instead of as one batch")
+    parser.add_argument("--reuse-containers", action="store_true",
+                        help="In a batch, grade every file's patch for an instance in one container")
+    parser.add_argument("--executor", choices=["docker", "local"], default="docker",
+                        help="Run the tests in Docker or in local environments (see local_envs.json)")
+    parser.add_argument("--parity-check", type=int, default=0, metavar="N",
+                        help="With --executor local, re-grade N predictions with Docker and report agreement")
     
     args = parser.parse_args()
     
@@ -429,8 +547,25 @@ def main():
         if response != 'y':
             return
     
-    # Evaluate each file
     results = []
+    # The local executor only runs through the batch harness
+    if (len(selected_files) > 1 and not args.no_batch) or args.executor == "local":
+        counts = {f: c for f, _, c in selected_files}
+        scored = evaluator.evaluate_files(
+            [f for f, _, _ in selected_files],
+            args.dataset,
+            args.max_workers,
+            update_log=not args.no_update_log,
+            force=args.force,
+            image_budget=resolve_image_budget(args.image_budget),
+            reuse_containers=args.reuse_containers,
+            executor=args.executor,
+            parity_sample=args.parity_check,
+        )
+        results = [(f.name, counts[f], score, eval_time) for f, score, eval_time in scored]
+        selected_files = []
+
+    # Evaluate each file
     for i, (pred_file, timestamp, count) in enumerate(selected_files, 1):
         print(f"\n[{i}/{len(selected_files)}] Processing {pred_file.name}")
         
@@ -439,7 +574,8 @@ def main():
             args.dataset,
             args.max_workers,
             update_log=not args.no_update_log,
-            force=args.force
+            force=args.force,
+            image_budget=resolve_image_budget(args.image_budget),
         )
         
         if score is not None:
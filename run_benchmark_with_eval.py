@@ -6,24 +6,46 @@ Enhanced SWE-bench benchmark runner with real evaluation support
 import argparse
 import json
 import os
-import sys
 import subprocess
 import time
 from datetime import datetime
 from pathlib import Path
 import logging
 import jsonlines
-from datasets import load_dataset
+
+from utils.evaluation_harness import execute_evaluation
+from utils.cli_session import DEFAULT_IDLE_TIMEOUT
+from utils.image_cache import resolve_image_budget
+from utils.worker_autoscaler import parse_max_workers
+from utils.run_ledger import RunLedger
+from utils.prediction_manifest import PredictionManifest
+from utils import tracing
 
 class EnhancedBenchmarkRunner:
-    def __init__(self, model=None, backend="claude"):
+    def __init__(self, model=None, backend="claude", prompt_template=None):
         self.base_dir = Path.cwd()
         self.log_file = self.base_dir / "benchmark_scores.log"
+        self.ledger = RunLedger(self.log_file)
         self.predictions_dir = self.base_dir / "predictions"
+        self.manifest = PredictionManifest(self.predictions_dir)
         self.results_dir = self.base_dir / "results"
         self.eval_results_dir = self.base_dir / "evaluation_results"
         self.model = model
         self.backend = backend
+        self.prompt_template = prompt_template
+        self.last_evaluation_report = None
+        self.generation_run = None
+        self.instance_subset = None
+        # {"shard": "i/n", "plan": fingerprint, "of": instances in the whole run} for sharded runs
+        self.shard = None
+        # What a sharded run stamps its predictions with (see code_swe_agent.GenerationRun)
+        self.shard_info = None
+        # Shard prediction files combined by `swe_bench.py merge`
+        self.merged_from = None
+        # Keyword arguments for the agent's per-session time budgets
+        self.budget_options = {}
+        # Seconds without agent output or workspace edits before a session is ended as stalled
+        self.idle_timeout = DEFAULT_IDLE_TIMEOUT
         
         # Create directories
         self.predictions_dir.mkdir(exist_ok=True)
@@ -48,14 +70,17 @@ class EnhancedBenchmarkRunner:
             "evaluation_time": evaluation_time,
             "model": self.model,
             "backend": self.backend,
+            "prompt_template": self.prompt_template,
+            "evaluation_report": self.last_evaluation_report,
+            "instance_subset": self.instance_subset,
+            "shard": self.shard,
+            "merged_from": self.merged_from,
             "notes": notes
         }
         
-        # Append to log file
-        with open(self.log_file, 'a') as f:
-            f.write(json.dumps(log_entry) + '\n')
+        self.ledger.record(log_entry)
         
-        print(f"\n✅ Results logged to {self.log_file}")
+        print(f"\n✅ Results logged to {self.ledger.db_file}")
         if evaluation_status == "completed":
             print(f"   Generation Score: {generation_score:.2f}% (patches created)")
             print(f"   Evaluation Score: {evaluation_score:.2f}% (issues fixed) ← REAL SCORE")
@@ -63,64 +88,64 @@ class EnhancedBenchmarkRunner:
             print(f"   Generation Score: {generation_score:.2f}% (patches created)")
             print(f"   Evaluation: {evaluation_status}")
             
-    def run_inference(self, dataset_name, limit):
-        """Run code model on the dataset"""
+    def select_instances(self, dataset_name, instance_ids):
+        """Dataset instances listed in ``instance_ids``, in that order"""
+        from utils.dataset_cache import load_instances
+        from utils.subset_builder import select_by_ids
+
+        with tracing.span("load dataset", dataset=dataset_name):
+            return select_by_ids(load_instances(dataset_name), instance_ids)
+
+    def run_inference(self, dataset_name, limit, metrics_file=None, metrics_port=None,
+                      progress=None, instance_ids=None):
+        """Generate patches in this process; returns (prediction file, seconds).
+
+        The prediction file is the one this run created, never just the
+        newest file in ``predictions/``, and the loaded dataset stays cached
+        for the evaluation phase. ``instance_ids`` selects the instances
+        (e.g. from ``--instances FILE``) instead of the first ``limit``.
+        """
+        from code_swe_agent import CodeSWEAgent
+
         model_info = f" with model {self.model}" if self.model else ""
         print(f"\n🚀 Running {self.backend.title()} Code{model_info} on {dataset_name} (limit: {limit})...")
 
-        cmd = [
-            sys.executable,
-            "code_swe_agent.py",
-            "--dataset_name", dataset_name,
-            "--limit", str(limit),
-            "--backend", self.backend,
-        ]
-
-        if self.model:
-            cmd.extend(["--model", self.model])
-        
+        start_time = time.time()
         try:
-            start_time = time.time()
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=7200)  # 2 hour timeout
-            execution_time = time.time() - start_time
-            
-            if result.returncode != 0:
-                print(f"⚠️ Warning: Inference had issues but continuing...")
-                if result.stderr:
-                    print(f"Stderr: {result.stderr[:500]}")
-            
-            # Find the latest prediction file
-            pred_files = sorted(self.predictions_dir.glob("predictions_*.jsonl"), reverse=True)
-            
-            if not pred_files:
-                print("❌ No prediction files generated")
-                return None, execution_time
-                
-            latest_pred = pred_files[0]
-            print(f"✅ Predictions saved to: {latest_pred}")
-            return str(latest_pred), execution_time
-            
-        except subprocess.TimeoutExpired:
-            print("❌ Inference timed out after 2 hours")
-            return None, 7200
+            agent = CodeSWEAgent(self.prompt_template, self.model, self.backend,
+                                 budget_options=self.budget_options, idle_timeout=self.idle_timeout)
+            instances = self.select_instances(dataset_name, instance_ids) if instance_ids else None
+            with tracing.span("generation", cat="command", dataset=dataset_name, limit=limit):
+                self.generation_run = agent.start_run(
+                    dataset_name, limit=limit, instances=instances, metrics_file=metrics_file,
+                    metrics_port=metrics_port, progress=progress, shard_info=self.shard_info,
+                )
+                self.generation_run.run()
         except Exception as e:
             print(f"❌ Error during inference: {e}")
-            return None, 0
+            return None, time.time() - start_time
+        execution_time = time.time() - start_time
+
+        prediction_file = self.generation_run.prediction_file
+        if not self.generation_run.predictions:
+            print("❌ No predictions generated")
+            return None, execution_time
+
+        print(f"✅ Predictions saved to: {prediction_file}")
+        return str(prediction_file), execution_time
             
     def calculate_generation_score(self, prediction_file):
         """Calculate score based on patch generation (not real score)"""
         if not prediction_file or not Path(prediction_file).exists():
             return 0.0, 0
         
-        total = 0
-        generated = 0
+        entry = self.manifest.get(Path(prediction_file))
+        if not entry or "error" in entry:
+            return 0.0, 0
         
-        with jsonlines.open(prediction_file) as reader:
-            for obj in reader:
-                total += 1
-                # Check if a non-empty patch was generated
-                if obj.get("prediction", "").strip():
-                    generated += 1
+        total = entry["instance_count"]
+        # Count instances where a non-empty patch was generated
+        generated = entry["nonempty_count"]
         
         if total == 0:
             return 0.0, 0
@@ -128,7 +153,20 @@ class EnhancedBenchmarkRunner:
         score = (generated / total) * 100
         return score, total
         
-    def run_evaluation(self, prediction_file, dataset_name, max_workers=2):
+    def write_eval_file(self, predictions, eval_file):
+        """Write predictions in the harness input format; returns the model name used"""
+        model_name = f"{self.backend}-code"
+        with jsonlines.open(eval_file, mode='w') as writer:
+            for pred in predictions:
+                eval_pred = {
+                    "instance_id": pred.get("instance_id", ""),
+                    "model_name_or_path": model_name,
+                    "model_patch": pred.get("prediction", "")
+                }
+                writer.write(eval_pred)
+        return model_name
+
+    def run_evaluation(self, prediction_file, dataset_name, max_workers=2, image_budget=None):
         """Run real SWE-bench evaluation using Docker"""
         print(f"\n🔬 Running real evaluation on {prediction_file}...")
         print("This will test if patches actually fix the issues (takes time)...")
@@ -141,57 +179,26 @@ class EnhancedBenchmarkRunner:
             for obj in reader:
                 predictions.append(obj)
 
-        model_name = f"{self.backend}-code"
-        with jsonlines.open(eval_file, mode='w') as writer:
-            for pred in predictions:
-                eval_pred = {
-                    "instance_id": pred.get("instance_id", ""),
-                    "model_name_or_path": model_name,
-                    "model_patch": pred.get("prediction", "")
-                }
-                writer.write(eval_pred)
+        model_name = self.write_eval_file(predictions, eval_file)
         
         # Run evaluation
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         run_id = f"{self.backend}_code_{timestamp}"
         
-        cmd = [
-            sys.executable, "-m", "swebench.harness.run_evaluation",
-            "--predictions_path", eval_file,
-            "--dataset_name", dataset_name,
-            "--split", "test",
-            "--run_id", run_id,
-            "--max_workers", str(max_workers),
-            "--timeout", "600",  # 10 minutes per instance
-            "--cache_level", "env",
-            "--report_dir", str(self.eval_results_dir),
-        ]
-        
-        print(f"Running: {' '.join(cmd)}")
+        instance_ids = [pred.get("instance_id", "") for pred in predictions]
         
         try:
             start_time = time.time()
-            process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                bufsize=1,
-                cwd=str(self.eval_results_dir),
+            output_lines = execute_evaluation(
+                eval_file, dataset_name, run_id, instance_ids, max_workers,
+                self.eval_results_dir, image_budget=image_budget,
             )
-            
-            # Print output in real-time
-            output_lines = []
-            for line in iter(process.stdout.readline, ''):
-                print(line, end='')
-                output_lines.append(line)
-            
-            process.wait()
             eval_time = time.time() - start_time
 
             json_path = self.eval_results_dir / f"{model_name}.{run_id}.json"
             resolved = total = None
             if json_path.exists():
+                self.last_evaluation_report = str(json_path)
                 try:
                     with open(json_path) as f:
                         data = json.load(f)
@@ -241,6 +248,150 @@ class EnhancedBenchmarkRunner:
             print(f"\n⚠️ Evaluation error: {e}")
             return None, 0
 
+    def evaluate_batch(self, predictions, eval_file, dataset_name, run_id,
+                       max_workers=2, image_budget=None):
+        """Evaluate a batch of predictions; returns the resolved instance IDs or None"""
+        model_name = self.write_eval_file(predictions, eval_file)
+        instance_ids = [pred.get("instance_id", "") for pred in predictions]
+        try:
+            execute_evaluation(
+                eval_file, dataset_name, run_id, instance_ids, max_workers,
+                self.eval_results_dir, image_budget=image_budget,
+            )
+        except Exception as e:
+            print(f"\n⚠️ Evaluation error: {e}")
+            return None
+        json_path = self.eval_results_dir / f"{model_name}.{run_id}.json"
+        try:
+            with open(json_path) as f:
+                return json.load(f).get("resolved_ids") or []
+        except (OSError, json.JSONDecodeError) as exc:
+            print(f"\n⚠️ Missing evaluation report {json_path}: {exc}")
+            return None
+
+    def run_until_ci(self, dataset_name, half_width, limit=None, max_workers=2,
+                     image_budget=None, batch_size=5, confidence=0.95, seed=None,
+                     metrics_file=None, metrics_port=None, instance_ids=None):
+        """Generate and evaluate in a stratified random order until the resolve rate is pinned down.
+
+        Predictions are evaluated in batches of ``batch_size`` on a background
+        thread while generation continues. Generation stops once the
+        anytime-valid interval is no wider than ±``half_width`` or ``limit``
+        instances have been processed. Returns a summary dict, or None if
+        generation could not start.
+        """
+        import queue
+        import random
+        import threading
+
+        from code_swe_agent import CodeSWEAgent
+        from utils.dataset_cache import load_instances
+        from utils.sequential import ConfidenceSequence, stratified_order
+
+        seed = random.randrange(2 ** 31) if seed is None else seed
+        start_time = time.time()
+        try:
+            if instance_ids:
+                instances = self.select_instances(dataset_name, instance_ids)
+            else:
+                instances = load_instances(dataset_name)
+            instances = stratified_order(instances, seed)
+            agent = CodeSWEAgent(self.prompt_template, self.model, self.backend,
+                                 budget_options=self.budget_options, idle_timeout=self.idle_timeout)
+            run = agent.start_run(dataset_name, limit=limit, instances=instances,
+                                  metrics_file=metrics_file, metrics_port=metrics_port)
+        except Exception as e:
+            print(f"❌ Error during inference: {e}")
+            return None
+        self.generation_run = run
+        print(f"\n🎯 Running until the {confidence:.0%} interval is within ±{half_width:.1%} "
+              f"(order seed {seed}, at most {len(run.instances)} instances)")
+
+        sequence = ConfidenceSequence(confidence)
+        stop = threading.Event()
+        batches = queue.Queue()
+        resolved_ids, evaluated_ids, reports = [], [], []
+        stats = {"evaluation_time": 0.0, "failed_batches": 0}
+        stem = run.prediction_file.stem
+
+        def evaluate_batches():
+            number = 0
+            while True:
+                batch = batches.get()
+                if batch is None:
+                    return
+                number += 1
+                run_id = f"{self.backend}_code_{run.run_id}_b{number}"
+                eval_file = str(self.predictions_dir / f"{stem}_b{number}_eval.jsonl")
+                batch_start = time.time()
+                resolved = self.evaluate_batch(batch, eval_file, dataset_name, run_id,
+                                               max_workers, image_budget)
+                stats["evaluation_time"] += time.time() - batch_start
+                if resolved is None:
+                    stats["failed_batches"] += 1
+                    continue
+                ids = [pred.get("instance_id", "") for pred in batch]
+                resolved = set(resolved)
+                evaluated_ids.extend(ids)
+                resolved_ids.extend(i for i in ids if i in resolved)
+                reports.append(run_id)
+                sequence.update(i in resolved for i in ids)
+                low, high = sequence.interval()
+                print(f"\n🎯 {sequence.successes}/{sequence.trials} resolved "
+                      f"({sequence.rate:.1%}), {confidence:.0%} interval "
+                      f"[{low:.1%}, {high:.1%}] ±{sequence.half_width():.1%}")
+                if sequence.half_width() <= half_width:
+                    stop.set()
+
+        evaluator = threading.Thread(target=evaluate_batches, daemon=True)
+        evaluator.start()
+        batch = []
+        with tracing.span("generation", cat="command", dataset=dataset_name, limit=limit):
+            for prediction in run:
+                batch.append(prediction)
+                if len(batch) >= batch_size:
+                    batches.put(batch)
+                    batch = []
+                if stop.is_set():
+                    print("\n✅ Confidence target reached; stopping generation")
+                    break
+        generation_time = time.time() - start_time
+        if batch and not stop.is_set():
+            batches.put(batch)
+        batches.put(None)
+        evaluator.join()
+
+        low, high = sequence.interval()
+        model_name = f"{self.backend}-code"
+        self.last_evaluation_report = None
+        if reports:
+            # One combined report so the run looks like any other evaluated run.
+            report_file = self.eval_results_dir / f"{model_name}.{run.run_id}_until_ci.json"
+            with open(report_file, "w") as f:
+                json.dump({
+                    "total_instances": len(evaluated_ids),
+                    "submitted_instances": len(evaluated_ids),
+                    "resolved_instances": len(resolved_ids),
+                    "submitted_ids": evaluated_ids,
+                    "resolved_ids": resolved_ids,
+                    "batch_run_ids": reports,
+                }, f, indent=2)
+            self.last_evaluation_report = str(report_file)
+
+        return {
+            "prediction_file": str(run.prediction_file),
+            "generated": len(run.predictions),
+            "evaluated": sequence.trials,
+            "resolved": sequence.successes,
+            "rate": sequence.rate,
+            "interval": (low, high),
+            "target_reached": stop.is_set(),
+            "seed": seed,
+            "failed_batches": stats["failed_batches"],
+            "generation_time": generation_time,
+            "evaluation_time": stats["evaluation_time"],
+        }
+
 def main():
     parser = argparse.ArgumentParser(
         description="Run SWE-bench benchmark with real evaluation scores"
@@ -251,14 +402,38 @@ def main():
                        help="Number of instances to test (default: 5)")
     parser.add_argument("--skip-eval", action="store_true",
                        help="Skip Docker evaluation (faster but no real scores)")
-    parser.add_argument("--max-workers", type=int, default=2,
-                       help="Max parallel Docker containers for evaluation (default: 2)")
+    parser.add_argument("--max-workers", type=parse_max_workers, default=2,
+                       help="Max parallel Docker containers for evaluation, or 'auto' "
+                            "to size from host resources (default: 2)")
+    parser.add_argument("--image-budget", type=str, metavar="SIZE",
+                       help="Keep evaluation images under SIZE (e.g. 200G), evicting "
+                            "least recently used ones (default: $SWE_BENCH_IMAGE_BUDGET)")
+    parser.add_argument("--metrics-file", type=str, metavar="FILE.prom",
+                       help="Write live progress metrics (Prometheus textfile format) during generation")
+    parser.add_argument("--metrics-port", type=int, metavar="PORT",
+                       help="Serve live progress metrics on http://127.0.0.1:PORT/metrics")
+    parser.add_argument("--prompt-template", type=str,
+                       help="Path to a custom prompt template (recorded with the run)")
+    parser.add_argument("--budget-percentile", type=float, default=90.0,
+                       help="Percentile of past session durations used for per-instance time budgets")
+    parser.add_argument("--budget-floor", type=float, default=120.0,
+                       help="Minimum seconds per agent session (default: 120)")
+    parser.add_argument("--budget-ceiling", type=float, default=1800.0,
+                       help="Maximum seconds per agent session (default: 1800)")
+    parser.add_argument("--idle-timeout", type=float, default=DEFAULT_IDLE_TIMEOUT, metavar="SECONDS",
+                       help="End an agent session after this long without output or file edits (0 disables)")
     parser.add_argument("--notes", default="",
                        help="Optional notes about this run")
     
     args = parser.parse_args()
     
-    runner = EnhancedBenchmarkRunner()
+    runner = EnhancedBenchmarkRunner(prompt_template=args.prompt_template)
+    runner.budget_options = {
+        "percentile": args.budget_percentile,
+        "floor": args.budget_floor,
+        "ceiling": args.budget_ceiling,
+    }
+    runner.idle_timeout = args.idle_timeout
     
     print("="*60)
     print("Enhanced SWE-bench Benchmark Runner")
@@ -271,7 +446,9 @@ def main():
     # Run inference
     print("\nPhase 1: Generating patches with Claude Code...")
     start_time = time.time()
-    prediction_file, generation_time = runner.run_inference(args.dataset, args.limit)
+    prediction_file, generation_time = runner.run_inference(
+        args.dataset, args.limit, args.metrics_file, args.metrics_port,
+    )
     
     if not prediction_file:
         print("❌ Failed to generate predictions")
@@ -293,7 +470,8 @@ def main():
     if not args.skip_eval:
         print("\nPhase 2: Evaluating patches with Docker (testing if they work)...")
         evaluation_score, evaluation_time = runner.run_evaluation(
-            prediction_file, args.dataset, args.max_workers
+            prediction_file, args.dataset, args.max_workers,
+            image_budget=resolve_image_budget(args.image_budget),
         )
         
         if evaluation_score is not None:
@@ -332,24 +510,19 @@ def main():
     if evaluation_time > 0:
         print(f"  Evaluation: {evaluation_time:.1f}s")
     
-    print(f"\nResults logged to: {runner.log_file}")
+    print(f"\nResults logged to: {runner.ledger.db_file}")
     
     # Show recent scores
     print("\n📊 Recent runs:")
-    if runner.log_file.exists():
-        with open(runner.log_file, 'r') as f:
-            lines = f.readlines()
-            recent = lines[-5:] if len(lines) >= 5 else lines
-            for line in recent:
-                entry = json.loads(line)
-                gen_score = entry.get('generation_score', 0)
-                eval_score = entry.get('evaluation_score')
-                status = entry.get('evaluation_status', 'unknown')
-                
-                if status == "completed" and eval_score is not None:
-                    print(f"  {entry['timestamp']}: Gen={gen_score:.1f}% → Eval={eval_score:.1f}% (real)")
-                else:
-                    print(f"  {entry['timestamp']}: Gen={gen_score:.1f}% ({status})")
+    for entry in runner.ledger.entries(last=5):
+        gen_score = entry.get('generation_score', 0)
+        eval_score = entry.get('evaluation_score')
+        status = entry.get('evaluation_status', 'unknown')
+        
+        if status == "completed" and eval_score is not None:
+            print(f"  {entry['timestamp']}: Gen={gen_score:.1f}% → Eval={eval_score:.1f}% (real)")
+        else:
+            print(f"  {entry['timestamp']}: Gen={gen_score:.1f}% ({status})")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
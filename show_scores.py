@@ -9,30 +9,70 @@ import argparse
 from datetime import datetime
 from pathlib import Path
 import csv
-from typing import List, Dict
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from utils.outcome_matrix import OutcomeMatrix, popcount
+from utils.run_ledger import RunLedger, prediction_key
+from utils.score_analytics import CATEGORIES, RunTable, grouped_stats, rolling_rates
 
 class ScoreViewer:
-    def __init__(self):
+    def __init__(self, local: bool = False):
         self.log_file = Path("benchmark_scores.log")
+        self.ledger = RunLedger(self.log_file)
+        self.outcome_dir = Path("evaluation_results")
+        # Show the scores of local (Docker-free) evaluations instead of Docker's
+        self.local = local
+    
+    def _view(self, entries: List[Dict]) -> List[Dict]:
+        """Entries as the views should see them: Docker scores, or local ones with ``local``"""
+        if not self.local:
+            return entries
+        return [
+            dict(e, evaluation_score=e["local_evaluation_score"], evaluation_status="completed",
+                 evaluation_time=e.get("local_evaluation_time"),
+                 evaluation_report=e.get("local_evaluation_report"))
+            for e in entries if e.get("local_evaluation_score") is not None
+        ]
         
-    def load_scores(self) -> List[Dict]:
-        """Load all scores from log file"""
-        if not self.log_file.exists():
-            print(f"No log file found at {self.log_file}")
+    def load_scores(self, last: Optional[int] = None) -> List[Dict]:
+        """Load scores from the run ledger, optionally only the last N entries"""
+        if not self.ledger.exists():
+            print(f"No run ledger found at {self.ledger.db_file}")
             return []
         
-        scores = []
-        with open(self.log_file, 'r') as f:
-            for line in f:
-                try:
-                    entry = json.loads(line.strip())
-                    scores.append(entry)
-                except json.JSONDecodeError:
-                    print(f"Warning: Skipping invalid JSON line: {line.strip()}")
-                except Exception as exc:
-                    print(f"Warning: Failed to parse line due to {exc}: {line.strip()}")
-
-        return scores
+        return self._view(self.ledger.entries(last=last))
+    
+    def watch(self, render: Callable[[List[Dict]], None], last: Optional[int] = None,
+              interval: float = 2.0):
+        """Follow the ledger and re-render only when runs are added or updated"""
+        rows, seq = self.ledger.snapshot(last)
+        window: Dict[int, Dict] = dict(rows)
+        changed = True
+        try:
+            while True:
+                if changed:
+                    if sys.stdout.isatty():
+                        print("\033[2J\033[H", end="")
+                    render(self._view([window[row_id] for row_id in sorted(window)]))
+                    print(f"\nWatching {self.ledger.db_file} (Ctrl+C to stop)...")
+                time.sleep(interval)
+                
+                changes, seq = self.ledger.changes_since(seq)
+                changed = False
+                for row_id, entry in changes:
+                    if last and len(window) >= last and row_id < min(window):
+                        continue  # update to a run outside the window
+                    window[row_id] = entry
+                    changed = True
+                if last:
+                    for row_id in sorted(window)[:-last]:
+                        del window[row_id]
+        except KeyboardInterrupt:
+            print()
     
     def display_scores(self, scores: List[Dict], filter_type="all"):
         """Display scores in a formatted table"""
@@ -78,41 +118,41 @@ class ScoreViewer:
         
         print("="*100)
     
-    def show_statistics(self, scores: List[Dict]):
-        """Show statistics and trends"""
+    def show_statistics(self, scores: List[Dict], group_by: Optional[str] = None):
+        """Show statistics, optionally broken down per model/backend/dataset/prompt template"""
         if not scores:
             return
         
-        evaluated = [s for s in scores if s.get("evaluation_status") == "completed"]
-        pending = [s for s in scores if s.get("evaluation_status") != "completed"]
+        table = RunTable.from_entries(scores)
+        evaluated = table["evaluated"]
         
         print("\n" + "="*60)
         print("STATISTICS")
         print("="*60)
         
-        print(f"Total runs: {len(scores)}")
-        print(f"  - Evaluated: {len(evaluated)}")
-        print(f"  - Pending evaluation: {len(pending)}")
+        print(f"Total runs: {len(table)}")
+        print(f"  - Evaluated: {int(evaluated.sum())}")
+        print(f"  - Pending evaluation: {int((~evaluated).sum())}")
         
-        if evaluated:
-            gen_scores = [s.get("generation_score", 0) for s in evaluated]
-            eval_scores = [s.get("evaluation_score", 0) for s in evaluated 
-                          if s.get("evaluation_score") is not None]
+        if evaluated.any():
+            gen_scores = np.nan_to_num(table["generation_score"][evaluated])
+            eval_scores = table["evaluation_score"][evaluated]
+            eval_scores = eval_scores[~np.isnan(eval_scores)]
             
             print(f"\nGeneration Scores (patches created):")
-            print(f"  Average: {sum(gen_scores)/len(gen_scores):.1f}%")
-            print(f"  Min: {min(gen_scores):.1f}%")
-            print(f"  Max: {max(gen_scores):.1f}%")
+            print(f"  Average: {gen_scores.mean():.1f}%")
+            print(f"  Min: {gen_scores.min():.1f}%")
+            print(f"  Max: {gen_scores.max():.1f}%")
             
-            if eval_scores:
+            if eval_scores.size:
                 print(f"\nEvaluation Scores (issues fixed - REAL):")
-                print(f"  Average: {sum(eval_scores)/len(eval_scores):.1f}%")
-                print(f"  Min: {min(eval_scores):.1f}%")
-                print(f"  Max: {max(eval_scores):.1f}%")
+                print(f"  Average: {eval_scores.mean():.1f}%")
+                print(f"  Min: {eval_scores.min():.1f}%")
+                print(f"  Max: {eval_scores.max():.1f}%")
                 
                 # Show average drop from generation to evaluation
-                avg_gen = sum(gen_scores)/len(gen_scores)
-                avg_eval = sum(eval_scores)/len(eval_scores)
+                avg_gen = gen_scores.mean()
+                avg_eval = eval_scores.mean()
                 drop = avg_gen - avg_eval
                 print(f"\nAverage drop from generation to evaluation: {drop:.1f}%")
                 if avg_gen == 0:
@@ -121,61 +161,154 @@ class ScoreViewer:
                     print(f"Success rate: {avg_eval/avg_gen*100:.1f}% of generated patches actually work")
         
         # Time statistics
-        all_gen_times = [s.get("generation_time", 0) for s in scores 
-                        if s.get("generation_time")]
-        all_eval_times = [s.get("evaluation_time", 0) for s in evaluated 
-                         if s.get("evaluation_time")]
+        gen_times = table["generation_time"]
+        gen_times = gen_times[np.nan_to_num(gen_times) > 0]
+        eval_times = table["evaluation_time"][evaluated]
+        eval_times = eval_times[np.nan_to_num(eval_times) > 0]
         
-        if all_gen_times:
+        if gen_times.size:
             print(f"\nGeneration times:")
-            print(f"  Average: {sum(all_gen_times)/len(all_gen_times):.1f}s")
-            print(f"  Total: {sum(all_gen_times):.1f}s")
+            print(f"  Average: {gen_times.mean():.1f}s")
+            print(f"  Total: {gen_times.sum():.1f}s")
         
-        if all_eval_times:
+        if eval_times.size:
             print(f"\nEvaluation times:")
-            print(f"  Average: {sum(all_eval_times)/len(all_eval_times):.1f}s")
-            print(f"  Total: {sum(all_eval_times):.1f}s")
+            print(f"  Average: {eval_times.mean():.1f}s")
+            print(f"  Total: {eval_times.sum():.1f}s")
+        
+        if group_by:
+            self.show_groups(table, group_by)
     
-    def show_trends(self, scores: List[Dict]):
-        """Show score trends over time"""
-        evaluated = [s for s in scores if s.get("evaluation_status") == "completed"]
+    def show_groups(self, table: "RunTable", group_by: str, confidence: float = 0.95):
+        """Show pooled resolve rates per group with bootstrap confidence intervals"""
+        groups = grouped_stats(table, group_by, confidence=confidence)
         
-        if len(evaluated) < 2:
+        print("\n" + "="*86)
+        print(f"BY {group_by.upper().replace('_', ' ')} (evaluated runs, "
+              f"{confidence*100:.0f}% bootstrap CI of the resolve rate)")
+        print("="*86)
+        if not groups:
+            print("No evaluated runs with instance counts.")
+            return
+        
+        print(f"{group_by:<28} {'Runs':>5} {'Resolved':>12} {'Rate':>7} {'CI':>15} {'Mean±Std':>13}")
+        for group in sorted(groups, key=lambda g: -g["rate"]):
+            resolved = f"{group['resolved']}/{group['instances']}"
+            ci = f"[{group['ci_low']:.1f}, {group['ci_high']:.1f}]"
+            spread = f"{group['mean_score']:.1f}±{group['std_score']:.1f}"
+            print(f"{str(group[group_by])[:28]:<28} {group['runs']:>5} {resolved:>12} "
+                  f"{group['rate']:>6.1f}% {ci:>15} {spread:>13}")
+    
+    def show_trends(self, scores: List[Dict], window: int = 10):
+        """Show score trends over time using rolling windows of evaluated runs"""
+        table = RunTable.from_entries(scores).scored()
+        
+        if len(table) < 2:
             return
         
         print("\n" + "="*60)
         print("TRENDS (Evaluated Runs Only)")
         print("="*60)
         
-        # Sort by timestamp
-        evaluated.sort(key=lambda x: x.get("timestamp", ""))
-        
-        # Show last 10 runs
-        recent = evaluated[-10:] if len(evaluated) >= 10 else evaluated
+        window = max(1, window)
+        rolling = rolling_rates(table, window)
+        order = np.argsort(np.nan_to_num(table["timestamp"], nan=-np.inf), kind="stable")
         
         print("\nRecent evaluation scores:")
-        for entry in recent:
-            timestamp = entry.get("timestamp", "Unknown")[:10]
-            eval_score = entry.get("evaluation_score", 0)
-            instances = entry.get("num_instances", 0)
-            print(f"  {timestamp}: {eval_score:5.1f}% on {instances} instances")
+        for i in order[-10:]:
+            stamp = table["timestamp"][i]
+            day = "Unknown" if np.isnan(stamp) else str(np.datetime64(int(stamp), "s"))[:10]
+            print(f"  {day}: {table['evaluation_score'][i]:5.1f}% "
+                  f"on {int(table['num_instances'][i])} instances")
         
-        # Calculate trend
-        if len(evaluated) >= 3:
-            first_half = evaluated[:len(evaluated)//2]
-            second_half = evaluated[len(evaluated)//2:]
-            
-            first_avg = sum(e.get("evaluation_score", 0) for e in first_half) / len(first_half)
-            second_avg = sum(e.get("evaluation_score", 0) for e in second_half) / len(second_half)
-            
-            trend = second_avg - first_avg
+        # Compare the latest window of runs with the one before it
+        if len(table) >= 3:
+            span = min(window, len(table) // 2)
+            latest = rolling_rates(table, span)["rate"]
+            recent, previous = latest[-1], latest[-1 - span]
+            trend = recent - previous
+            print(f"\nRolling resolve rate (last {min(window, len(table))} runs): "
+                  f"{rolling['rate'][-1]:.1f}%")
             if trend > 0:
-                print(f"\n📈 Improving trend: +{trend:.1f}% from first to second half")
+                print(f"\n📈 Improving trend: +{trend:.1f}% over the last {span} runs vs the {span} before")
             elif trend < 0:
-                print(f"\n📉 Declining trend: {trend:.1f}% from first to second half")
+                print(f"\n📉 Declining trend: {trend:.1f}% over the last {span} runs vs the {span} before")
             else:
                 print(f"\n➡️  Stable performance")
     
+    def comparison_groups(self, scores: List[Dict], selectors: List[str],
+                          group_by: Optional[str] = None) -> Dict[str, List[str]]:
+        """Ledger keys of the runs in each comparison group"""
+        groups: Dict[str, List[str]] = {}
+        if selectors:
+            for selector in selectors:
+                groups[selector] = [
+                    prediction_key(entry) for entry in scores
+                    if selector in (Path(str(entry.get("prediction_file"))).name,
+                                    entry.get("model"), entry.get("backend"),
+                                    entry.get("dataset"), entry.get("prompt_template"))
+                ]
+        else:
+            field = group_by or "model"
+            for entry in scores:
+                label = str(entry.get(field) or "-")
+                groups.setdefault(label, []).append(prediction_key(entry))
+        return groups
+    
+    def show_comparison(self, scores: List[Dict], selectors: Optional[List[str]] = None,
+                        group_by: Optional[str] = None, list_limit: int = 20):
+        """Show oracle, never-solved and pairwise win/loss counts from per-instance outcomes"""
+        matrix = OutcomeMatrix(self.outcome_dir)
+        matrix.sync(scores)
+        
+        groups = {
+            label: matrix.row_indices(keys)
+            for label, keys in self.comparison_groups(scores, selectors or [], group_by).items()
+        }
+        missing = [label for label, rows in groups.items() if not len(rows)]
+        groups = {label: rows for label, rows in groups.items() if len(rows)}
+        
+        print("\n" + "="*60)
+        print("OUTCOME COMPARISON (per-instance results)")
+        print("="*60)
+        for label in missing:
+            print(f"⚠️ No evaluated runs with reports match {label!r}")
+        if not groups:
+            print("Nothing to compare: evaluate runs first (reports are recorded on evaluation).")
+            return
+        
+        rows = np.concatenate(list(groups.values()))
+        attempted = popcount(matrix.union(rows, matrix.attempted))
+        print(f"Runs: {len(np.unique(rows))}, instances attempted: {attempted}")
+        print(f"Oracle (solved by any run): {popcount(matrix.oracle(rows))}/{attempted}")
+        never = matrix.never_solved(rows)
+        print(f"Never solved: {popcount(never)}")
+        
+        print(f"\n{'Group':<28} {'Runs':>5} {'Solved':>8} {'Attempted':>10} {'Unique':>7}")
+        for label, group_rows in groups.items():
+            others = np.setdiff1d(rows, group_rows)
+            unique = matrix.oracle(group_rows) & ~matrix.union(others)
+            print(f"{label[:28]:<28} {len(group_rows):>5} {popcount(matrix.oracle(group_rows)):>8} "
+                  f"{popcount(matrix.union(group_rows, matrix.attempted)):>10} {popcount(unique):>7}")
+        
+        if len(groups) < 2:
+            return
+        
+        labels, wins = matrix.win_loss(groups)
+        print("\nPairwise wins (row solves, column does not; shared instances only):")
+        names = [label[:12] for label in labels]
+        print(" " * 14 + "".join(f"{name:>13}" for name in names))
+        for i, name in enumerate(names):
+            cells = "".join(f"{'-' if i == j else wins[i, j]:>13}" for j in range(len(labels)))
+            print(f"{name:<14}{cells}")
+        
+        if len(groups) == 2:
+            first, second = labels
+            for a, b in ((first, second), (second, first)):
+                only = matrix.ids(matrix.difference(groups[a], groups[b]))
+                shown = ", ".join(only[:list_limit]) + (" ..." if len(only) > list_limit else "")
+                print(f"\nSolved by {a} but not {b} ({len(only)}): {shown or '-'}")
+    
     def export_to_csv(self, scores: List[Dict], filename: str):
         """Export scores to CSV file"""
         if not scores:
@@ -199,6 +332,11 @@ class ScoreViewer:
         
         print(f"\n✅ Exported {len(scores)} entries to {filename}")
     
+    def export_to_jsonl(self, scores: List[Dict], filename: str):
+        """Export scores in the legacy benchmark_scores.log format"""
+        count = self.ledger.export_jsonl(Path(filename), scores)
+        print(f"\n✅ Exported {count} entries to {filename}")
+    
     def show_pending_evaluations(self, scores: List[Dict]):
         """Show which predictions still need evaluation"""
         pending = []
@@ -239,15 +377,27 @@ def main():
                        help="Show detailed statistics")
     parser.add_argument("--trends", action="store_true",
                        help="Show score trends over time")
+    parser.add_argument("--group-by", choices=CATEGORIES,
+                       help="Break statistics down per group with bootstrap CIs (implies --stats)")
+    parser.add_argument("--compare", nargs="*", metavar="RUN",
+                       help="Compare per-instance outcomes of runs matching each RUN (prediction "
+                            "file, model, backend, dataset or prompt template); with no RUN, "
+                            "compare every --group-by group (default: model)")
+    parser.add_argument("--window", type=int, default=10, metavar="N",
+                       help="Rolling window size (in runs) for --trends (default: 10)")
     parser.add_argument("--pending", action="store_true",
                        help="Show pending evaluations")
     parser.add_argument("--last", type=int, metavar="N",
                        help="Show only last N entries")
+    parser.add_argument("--export-jsonl", type=str, metavar="FILE.jsonl",
+                       help="Export the ledger as JSON lines")
+    parser.add_argument("--local", action="store_true",
+                       help="Show scores from `eval --executor local` instead of Docker evaluations")
     
     args = parser.parse_args()
     
-    viewer = ScoreViewer()
-    scores = viewer.load_scores()
+    viewer = ScoreViewer(local=args.local)
+    scores = viewer.load_scores(last=args.last)
     
     if not scores:
         print("No benchmark scores found.")
@@ -255,10 +405,6 @@ def main():
         print("  python run_benchmark_with_eval.py --limit 5")
         return
     
-    # Apply last N filter if specified
-    if args.last:
-        scores = scores[-args.last:]
-    
     # Main display
     print("\n" + "="*60)
     print("SWE-BENCH BENCHMARK SCORES")
@@ -267,11 +413,14 @@ def main():
     viewer.display_scores(scores, args.filter)
     
     # Additional displays based on flags
-    if args.stats:
-        viewer.show_statistics(scores)
+    if args.stats or args.group_by:
+        viewer.show_statistics(scores, args.group_by)
     
     if args.trends:
-        viewer.show_trends(scores)
+        viewer.show_trends(scores, args.window)
+    
+    if args.compare is not None:
+        viewer.show_comparison(scores, args.compare, args.group_by)
     
     if args.pending:
         viewer.show_pending_evaluations(scores)
@@ -280,6 +429,9 @@ def main():
     if args.export:
         viewer.export_to_csv(scores, args.export)
     
+    if args.export_jsonl:
+        viewer.export_to_jsonl(scores, args.export_jsonl)
+    
     # Quick summary
     evaluated = len([s for s in scores if s.get("evaluation_status") == "completed"])
     pending = len([s for s in scores if s.get("evaluation_status") != "completed"])
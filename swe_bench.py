@@ -29,19 +29,82 @@ def check_swebench_installed():
         print("but evaluation requires it to test if patches actually work.")
         return False
 
-from run_benchmark_with_eval import EnhancedBenchmarkRunner
-from evaluate_predictions import PredictionEvaluator
-from show_scores import ScoreViewer
-from utils.model_registry import list_models, get_model_name
-from code_swe_agent import DEFAULT_BACKEND
+# Only lightweight modules are imported here. Each subcommand imports what it
+# needs, so `scores`, `check` and `list-models` don't pay for datasets/pyarrow.
+from utils.model_registry import DEFAULT_BACKEND, list_models, get_model_name
+from utils.worker_autoscaler import parse_max_workers
+from utils.image_cache import BUDGET_ENV_VAR, parse_image_budget
+from utils import tracing
+from utils.score_analytics import CATEGORIES as GROUP_BY_FIELDS
+
+
+def parse_ci_target(value):
+    """argparse type for `run --until-ci` (e.g. ±3%)"""
+    from utils.sequential import parse_half_width
+
+    try:
+        return parse_half_width(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def parse_shard_arg(value):
+    """argparse type for `--shard I/N`"""
+    from utils.sharding import parse_shard
+
+    try:
+        return parse_shard(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def load_instance_selection(args):
+    """Instance IDs from --instances FILE (None when not given); exits on unreadable files"""
+    path = getattr(args, 'instances', None)
+    if not path:
+        return None
+    from utils.subset_builder import read_instance_file
+
+    try:
+        ids = read_instance_file(path)
+    except OSError as e:
+        print(f"❌ Could not read instance file {path}: {e}")
+        sys.exit(1)
+    if not ids:
+        print(f"❌ No instance IDs in {path}")
+        sys.exit(1)
+    print(f"Instances: {len(ids)} from {path}")
+    return ids
 
 def run_command(args):
     """Handle 'run' subcommand - run new benchmarks"""
+    from run_benchmark_with_eval import EnhancedBenchmarkRunner
+    from utils.image_cache import resolve_image_budget
+    from utils.image_prewarm import ImagePrewarmer
+    
     runner = EnhancedBenchmarkRunner(
         model=args.model if hasattr(args, 'model') else None,
         backend=args.backend if hasattr(args, 'backend') and args.backend else DEFAULT_BACKEND,
+        prompt_template=getattr(args, 'prompt_template', None),
     )
     
+    runner.budget_options = {
+        key: getattr(args, f'budget_{key}')
+        for key in ('percentile', 'floor', 'ceiling') if getattr(args, f'budget_{key}', None) is not None
+    }
+    if getattr(args, 'idle_timeout', None) is not None:
+        runner.idle_timeout = args.idle_timeout
+    instance_ids = load_instance_selection(args)
+    runner.instance_subset = getattr(args, 'instances', None)
+    if instance_ids:
+        args.limit = len(instance_ids)
+
+    if getattr(args, 'until_ci', None):
+        if getattr(args, 'shard', None):
+            print("❌ --shard cannot be combined with --until-ci")
+            return 1
+        return until_ci_command(args, runner, instance_ids)
+
     # Set default limit if not specified
     if not args.limit:
         if args.quick:
@@ -52,6 +115,12 @@ def run_command(args):
             args.limit = 300
         else:
             args.limit = 300  # Default to full test
+
+    if getattr(args, 'shard', None):
+        instance_ids = shard_selection(args, runner, instance_ids)
+        if instance_ids is None:
+            return 1
+        args.limit = len(instance_ids)
     
     # Import datetime for logging
     from datetime import datetime
@@ -69,13 +138,31 @@ def run_command(args):
     print(f"Evaluation: {'DISABLED' if args.no_eval else 'ENABLED'}")
     print(f"Timestamp: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     
+    # Build evaluation images while patches are being generated
+    prewarmer = None
+    if getattr(args, 'prewarm', False) and not args.no_eval and check_swebench_installed():
+        prewarmer = ImagePrewarmer(args.dataset, instance_ids=instance_ids, limit=args.limit)
+        prewarmer.start()
+    
     # Run inference
     print(f"\nPhase 1: Generating patches with {runner.backend.title()} Code...")
     start_time = time.time()
-    prediction_file, generation_time = runner.run_inference(args.dataset, args.limit)
+    try:
+        prediction_file, generation_time = runner.run_inference(
+            args.dataset, args.limit,
+            getattr(args, 'metrics_file', None), getattr(args, 'metrics_port', None),
+            instance_ids=instance_ids,
+        )
+    except BaseException:
+        # Don't leave the prepare_images child building after an interrupted run
+        if prewarmer:
+            prewarmer.stop()
+        raise
     
     if not prediction_file:
         print("❌ Failed to generate predictions")
+        if prewarmer:
+            prewarmer.stop()
         runner.log_result(
             args.dataset, args.limit, 0.0, None, generation_time, 0,
             None, f"Failed to generate predictions. {args.notes}", "failed"
@@ -99,10 +186,17 @@ def run_command(args):
             evaluation_score = None
             evaluation_time = 0
         else:
+            if prewarmer:
+                prewarmer.wait()
             print("\nPhase 2: Evaluating patches with Docker...")
+            image_budget = resolve_image_budget(getattr(args, 'image_budget', None))
             evaluation_score, evaluation_time = runner.run_evaluation(
-                prediction_file, args.dataset, args.max_workers
+                prediction_file, args.dataset, args.max_workers,
+                image_budget=image_budget,
             )
+            # Without a budget managing the cache, prewarmed images go like the harness's own
+            if prewarmer and not image_budget:
+                prewarmer.remove_images()
             
             if evaluation_score is not None:
                 evaluation_status = "completed"
@@ -135,17 +229,110 @@ def run_command(args):
         print("Evaluation: FAILED")
     
     print(f"\nTotal time: {total_time:.1f} seconds")
-    print(f"Results logged to: {runner.log_file}")
+    print(f"Results logged to: {runner.ledger.db_file}")
     
     return 0
 
+def shard_selection(args, runner, instance_ids=None):
+    """Instance IDs of this machine's `--shard I/N` part of the selected instances (None on a bad plan)"""
+    from code_swe_agent import shard_instances
+    from utils.dataset_cache import select_instances
+
+    if instance_ids:
+        instances = runner.select_instances(args.dataset, instance_ids)
+    else:
+        instances = select_instances(args.dataset, args.limit)
+    try:
+        shard, runner.shard_info = shard_instances(instances, args.shard, getattr(args, 'shard_plan', None),
+                                                   runner.ledger, runner.backend)
+    except (OSError, ValueError) as e:
+        print(f"❌ Shard plan: {e}")
+        return None
+    runner.shard = {"shard": runner.shard_info["shard"], "plan": runner.shard_info["plan"], "of": len(instances)}
+    return [i["instance_id"] for i in shard]
+
+def until_ci_command(args, runner, instance_ids=None):
+    """Handle 'run --until-ci' - stop once the resolve rate is known well enough"""
+    from datetime import datetime
+    from utils.image_cache import resolve_image_budget
+
+    if args.no_eval:
+        print("❌ --until-ci needs evaluation; it cannot be combined with --no-eval")
+        return 1
+    if not check_swebench_installed():
+        return 1
+
+    # --limit/--quick/--standard/--full become the instance budget
+    if instance_ids:
+        args.limit = None
+    elif not args.limit:
+        args.limit = 10 if args.quick else 50 if args.standard else 300 if args.full else None
+
+    print("="*60)
+    print("SWE-bench Sequential Benchmark")
+    print("="*60)
+    print(f"Dataset: {args.dataset}")
+    print(f"Target: ±{args.until_ci:.1%} at {args.confidence:.0%} confidence")
+    print(f"Budget: {args.limit or len(instance_ids or []) or 'whole dataset'} instances")
+    print(f"Backend: {runner.backend}")
+    print(f"Timestamp: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+
+    result = runner.run_until_ci(
+        args.dataset, args.until_ci, limit=args.limit, max_workers=args.max_workers,
+        image_budget=resolve_image_budget(getattr(args, 'image_budget', None)),
+        batch_size=args.ci_batch, confidence=args.confidence, seed=args.seed,
+        metrics_file=getattr(args, 'metrics_file', None),
+        metrics_port=getattr(args, 'metrics_port', None), instance_ids=instance_ids,
+    )
+    if result is None or not result["generated"]:
+        print("❌ Failed to generate predictions")
+        runner.log_result(
+            args.dataset, args.limit or 0, 0.0, None, 0, 0,
+            None, f"Failed to generate predictions. {args.notes}", "failed"
+        )
+        return 1
+
+    generation_score, _ = runner.calculate_generation_score(result["prediction_file"])
+    low, high = result["interval"]
+    notes = (f"until-ci ±{args.until_ci:.1%}: {args.confidence:.0%} CI "
+             f"[{low * 100:.1f}%, {high * 100:.1f}%], seed {result['seed']}, "
+             f"{result['evaluated']}/{result['generated']} evaluated")
+    if result["failed_batches"]:
+        notes += f", {result['failed_batches']} batch(es) failed to evaluate"
+    if args.notes:
+        notes = f"{args.notes} ({notes})"
+
+    evaluated = result["evaluated"]
+    evaluation_score = result["rate"] * 100 if evaluated else None
+    runner.log_result(
+        args.dataset, evaluated or result["generated"], generation_score,
+        evaluation_score, result["generation_time"], result["evaluation_time"],
+        result["prediction_file"], notes, "completed" if evaluated else "failed"
+    )
+
+    print("\n" + "="*60)
+    print("SEQUENTIAL BENCHMARK SUMMARY")
+    print("="*60)
+    print(f"Instances generated: {result['generated']}, evaluated: {evaluated}")
+    if evaluated:
+        print(f"Evaluation Score: {evaluation_score:.2f}% ({result['resolved']}/{evaluated} issues fixed)")
+        print(f"{args.confidence:.0%} interval: [{low:.1%}, {high:.1%}]"
+              + ("" if result["target_reached"] else f" (target ±{args.until_ci:.1%} not reached within budget)"))
+    print(f"Order seed: {result['seed']} (pass --seed to repeat this order)")
+    print(f"Results logged to: {runner.ledger.db_file}")
+    return 0
+
 def eval_command(args):
     """Handle 'eval' subcommand - evaluate past predictions"""
+    from evaluate_predictions import PredictionEvaluator
+    from utils.image_cache import resolve_image_budget
+    
     # Check if swebench is installed for evaluation
     if not check_swebench_installed():
         return 1
     
     evaluator = PredictionEvaluator()
+    instance_ids = load_instance_selection(args)
     
     # Get all prediction files
     all_files = evaluator.get_prediction_files()
@@ -223,18 +410,43 @@ def eval_command(args):
         if response != 'y':
             return 0
     
-    # Evaluate each file
     results = []
+    if (len(selected_files) > 1 and not args.no_batch) or args.executor == 'local':
+        # One harness process and one worker pool for every selected file
+        # (the local executor only runs through the batch harness)
+        counts = {f: c for f, _, c in selected_files}
+        with tracing.span("evaluate batch", cat="evaluation", files=len(selected_files)):
+            scored = evaluator.evaluate_files(
+                [f for f, _, _ in selected_files],
+                args.dataset,
+                args.max_workers,
+                update_log=not args.no_update_log,
+                force=args.force,
+                image_budget=resolve_image_budget(args.image_budget),
+                instance_ids=instance_ids,
+                instance_subset=args.instances,
+                reuse_containers=args.reuse_containers,
+                executor=args.executor,
+                parity_sample=args.parity_check,
+            )
+        results = [(f.name, counts[f], score, eval_time) for f, score, eval_time in scored]
+        selected_files = []
+
+    # Evaluate each file
     for i, (pred_file, timestamp, count) in enumerate(selected_files, 1):
         print(f"\n[{i}/{len(selected_files)}] Processing {pred_file.name}")
         
-        score, eval_time = evaluator.evaluate_file(
-            pred_file,
-            args.dataset,
-            args.max_workers,
-            update_log=not args.no_update_log,
-            force=args.force
-        )
+        with tracing.span("evaluate file", cat="evaluation", file=pred_file.name):
+            score, eval_time = evaluator.evaluate_file(
+                pred_file,
+                args.dataset,
+                args.max_workers,
+                update_log=not args.no_update_log,
+                force=args.force,
+                image_budget=resolve_image_budget(args.image_budget),
+                instance_ids=instance_ids,
+                instance_subset=args.instances,
+            )
         
         if score is not None:
             results.append((pred_file.name, count, score, eval_time))
@@ -256,22 +468,178 @@ def eval_command(args):
     
     return 0
 
-def scores_command(args):
-    """Handle 'scores' subcommand - view and analyze scores"""
-    viewer = ScoreViewer()
-    scores = viewer.load_scores()
+def prewarm_command(args):
+    """Handle 'prewarm' subcommand - build evaluation images ahead of time"""
+    from utils.image_prewarm import ImagePrewarmer
     
-    if not scores:
-        print("No benchmark scores found.")
-        print("Run benchmarks first with:")
-        print("  python swe_bench.py run --quick")
+    if not check_swebench_installed():
         return 1
     
-    # Apply last N filter if specified
-    if args.last:
-        scores = scores[-args.last:]
+    prewarmer = ImagePrewarmer(args.dataset, instance_ids=load_instance_selection(args),
+                               limit=args.limit, max_workers=args.max_workers)
+    return 0 if prewarmer.run() else 1
+
+def images_command(args):
+    """Handle 'images' subcommand - inspect and prune cached evaluation images"""
+    from utils.image_cache import ImageCacheManager, resolve_image_budget
+    
+    evaluator_dir = Path.cwd() / "evaluation_results"
+    evaluator_dir.mkdir(exist_ok=True)
+    cache = ImageCacheManager(evaluator_dir, resolve_image_budget(args.budget))
     
-    # Main display
+    if args.prune:
+        if not cache.budget_bytes:
+            print("No image budget configured. Use --budget SIZE or set SWE_BENCH_IMAGE_BUDGET.")
+            return 1
+        cache.enforce_budget()
+        cache.save()
+    
+    cache.show_stats()
+    return 0
+
+def subset_command(args):
+    """Handle 'subset' subcommand - build a representative instance subset"""
+    from datetime import datetime
+    from utils.dataset_cache import load_instances
+    from utils.outcome_matrix import OutcomeMatrix
+    from utils.run_ledger import RunLedger
+    from utils.subset_builder import SubsetBuilder, write_instance_file
+
+    print(f"Loading dataset: {args.dataset}")
+    instances = load_instances(args.dataset)
+    ledger = RunLedger(Path.cwd() / "benchmark_scores.log")
+    matrix = OutcomeMatrix(Path.cwd() / "evaluation_results")
+    if ledger.exists():
+        matrix.sync(ledger.entries())
+    durations = ledger.instance_durations([i["instance_id"] for i in instances]) if ledger.exists() else {}
+
+    builder = SubsetBuilder(instances, matrix, durations)
+    report = builder.validate(args.size)
+    subset = builder.build(args.size, refine=report["method"] == "refined")
+    ids = builder.ids(subset)
+
+    output = args.output or f"test_sets/subset_{len(ids)}.txt"
+    header = [
+        f"Representative subset of {args.dataset}: {len(ids)} of {len(instances)} instances",
+        f"Built {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} with `swe_bench.py subset` "
+        f"({report['method']} selection, {report['runs']} past full run(s))",
+    ]
+    if "stratified_loo_mae" in report:
+        method = report["method"]
+        header.append(f"Held-out error vs full score: {report[f'{method}_loo_mae']:.1f} pts "
+                      f"(first {report['size']} rows: {report['first_n_mae']:.1f} pts)")
+    write_instance_file(output, ids, header)
+
+    repos = {}
+    for i in subset:
+        repos[builder.repos[i]] = repos.get(builder.repos[i], 0) + 1
+    print(f"\n✅ Wrote {len(ids)} instance IDs to {output}")
+    print("   " + ", ".join(f"{repo} {count}" for repo, count in sorted(repos.items(), key=lambda r: -r[1])))
+    if not report["runs"]:
+        print("\nNo past full runs to validate against; selection uses repo mix and issue/patch size only.")
+        print("Evaluate full runs to let the builder use historical resolve rates.")
+    else:
+        print(f"\nMean absolute error vs {report['runs']} past full run(s), in score points:")
+        print(f"  {'Selection':<22} {'In-sample':>10} {'Held-out':>10}")
+        print(f"  {'First ' + str(report['size']) + ' rows':<22} {report['first_n_mae']:>10.1f} {'':>10}")
+        for method in ("stratified", "refined"):
+            held_out = report.get(f"{method}_loo_mae")
+            held_out = f"{held_out:>10.1f}" if held_out is not None else f"{'n/a':>10}"
+            marker = " ←" if method == report["method"] else ""
+            print(f"  {method.title():<22} {report[f'{method}_fit_mae']:>10.1f} {held_out}{marker}")
+    print(f"\nUse it with: python swe_bench.py run --instances {output}")
+    return 0
+
+def merge_command(args):
+    """Handle 'merge' subcommand - combine shard prediction files into one run"""
+    from datetime import datetime
+    from run_benchmark_with_eval import EnhancedBenchmarkRunner
+    from utils.dataset_cache import load_instances
+    from utils.prediction_manifest import reserve_prediction_file, summarize_predictions_file
+    from utils.run_ledger import RunLedger
+    from utils.sharding import merge_predictions
+
+    files = [str(Path(f)) for f in args.files]
+    absent = [f for f in files if not Path(f).is_file()]
+    if absent:
+        print(f"❌ Prediction file(s) not found: {', '.join(absent)}")
+        return 1
+
+    # Used for the model, backend and generation time when the shards ran on this machine
+    ledger = RunLedger(Path.cwd() / "benchmark_scores.log")
+    entries = [ledger.get(f) or {} for f in files]
+
+    expected = load_instance_selection(args)
+    order = None
+    try:
+        instances = load_instances(args.dataset)
+        order = {i["instance_id"]: n for n, i in enumerate(instances)}
+        if expected is None and args.limit:
+            expected = [i["instance_id"] for i in instances[:args.limit]]
+    except Exception as e:
+        print(f"⚠️  Could not load {args.dataset} ({e}); shards will be concatenated")
+        if expected is None and args.limit:
+            print("❌ --limit needs the dataset to know which instances to expect")
+            return 1
+
+    if args.output:
+        output = Path(args.output)
+        output.parent.mkdir(parents=True, exist_ok=True)
+    else:
+        (Path.cwd() / "predictions").mkdir(exist_ok=True)
+        output = reserve_prediction_file(Path.cwd() / "predictions", datetime.now().strftime("%Y%m%d_%H%M%S"))
+    try:
+        report = merge_predictions(files, str(output), order, expected)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+
+    print(f"✅ Merged {len(files)} file(s) into {output}: {report['written']} instances"
+          + ("" if report["ordered"] else " (concatenated, not in dataset order)"))
+    # Shard stamps come from the prediction files themselves
+    warnings = []
+    shards = report["shards"]
+    counts = {int(name.split("/")[1]) for name in shards}
+    if len(counts) > 1:
+        warnings.append(f"shards come from different splits ({', '.join(shards)})")
+    elif counts:
+        absent_shards = sorted(set(range(1, counts.pop() + 1)) - {int(name.split("/")[0]) for name in shards})
+        if absent_shards:
+            warnings.append(f"shard(s) {', '.join(map(str, absent_shards))} not included")
+    if len(report["plans"]) > 1:
+        warnings.append("shards were split by different plans "
+                        "(run every shard with the same --shard-plan file, or none)")
+    if report["duplicates"]:
+        extra = sum(n - 1 for n in report["duplicates"].values())
+        shown = ", ".join(list(report["duplicates"])[:5])
+        warnings.append(f"{len(report['duplicates'])} instance(s) appeared in several files; kept the best "
+                        f"of each and dropped {extra} ({shown}{' ...' if len(report['duplicates']) > 5 else ''})")
+    if report["missing"]:
+        shown = ", ".join(report["missing"][:5])
+        warnings.append(f"{len(report['missing'])} expected instance(s) missing: "
+                        f"{shown}{' ...' if len(report['missing']) > 5 else ''}")
+    for warning in warnings:
+        print(f"⚠️  {warning}")
+
+    if not args.no_log:
+        first = next((e for e in entries if e), {})
+        summary = summarize_predictions_file(str(output))
+        runner = EnhancedBenchmarkRunner(
+            model=args.model or first.get("model"),
+            backend=args.backend or first.get("backend") or summary.get("backend") or DEFAULT_BACKEND,
+            prompt_template=first.get("prompt_template"),
+        )
+        runner.merged_from = files
+        runner.instance_subset = getattr(args, 'instances', None)
+        generation_score, total = runner.calculate_generation_score(str(output))
+        generation_time = sum(e.get("generation_time") or 0 for e in entries)
+        notes = args.notes or f"Merged from {len(files)} shard file(s)"
+        runner.log_result(args.dataset, total, generation_score, None, generation_time, 0,
+                          str(output), notes, "pending")
+    return 1 if report["missing"] else 0
+
+def render_scores(viewer, scores, args):
+    """Print the score table plus the statistics/trends/pending sections requested by args"""
     print("\n" + "="*60)
     print("SWE-BENCH BENCHMARK SCORES")
     print("="*60)
@@ -279,19 +647,49 @@ def scores_command(args):
     viewer.display_scores(scores, args.filter)
     
     # Additional displays based on flags
-    if args.stats:
-        viewer.show_statistics(scores)
+    group_by = getattr(args, 'group_by', None)
+    if args.stats or group_by:
+        viewer.show_statistics(scores, group_by)
     
     if args.trends:
-        viewer.show_trends(scores)
+        viewer.show_trends(scores, getattr(args, 'window', 10))
+    
+    compare = getattr(args, 'compare', None)
+    if compare is not None:
+        viewer.show_comparison(scores, compare, group_by)
     
     if args.pending:
         viewer.show_pending_evaluations(scores)
+
+def scores_command(args):
+    """Handle 'scores' subcommand - view and analyze scores"""
+    from show_scores import ScoreViewer
+    
+    viewer = ScoreViewer(local=getattr(args, 'local', False))
+    
+    if getattr(args, 'watch', None):
+        viewer.watch(lambda scores: render_scores(viewer, scores, args),
+                     last=args.last, interval=args.watch)
+        return 0
+    
+    # Only the last N entries are read when --last is given
+    scores = viewer.load_scores(last=args.last)
+    
+    if not scores:
+        print("No benchmark scores found.")
+        print("Run benchmarks first with:")
+        print("  python swe_bench.py run --quick")
+        return 1
+    
+    render_scores(viewer, scores, args)
     
     # Export if requested
     if args.export:
         viewer.export_to_csv(scores, args.export)
     
+    if getattr(args, 'export_jsonl', None):
+        viewer.export_to_jsonl(scores, args.export_jsonl)
+    
     # Quick summary
     evaluated = len([s for s in scores if s.get("evaluation_status") == "completed"])
     pending = len([s for s in scores if s.get("evaluation_status") != "completed"])
@@ -372,10 +770,50 @@ Examples:
     run_parser.add_argument('--full', action='store_true', help='Full test (300 instances)')
     run_parser.add_argument('--no-eval', action='store_true', help='Skip Docker evaluation')
     run_parser.add_argument('--dataset', default='princeton-nlp/SWE-bench_Lite', help='Dataset to use')
-    run_parser.add_argument('--max-workers', type=int, default=2, help='Max parallel Docker containers')
+    run_parser.add_argument('--max-workers', type=parse_max_workers, default=2,
+                            help="Max parallel Docker containers, or 'auto' to size from host resources")
     run_parser.add_argument('--notes', default='', help='Optional notes about this run')
+    run_parser.add_argument('--metrics-file', type=str, metavar='FILE.prom',
+                            help='Write live progress metrics (Prometheus textfile format) during generation')
+    run_parser.add_argument('--metrics-port', type=int, metavar='PORT',
+                            help='Serve live progress metrics on http://127.0.0.1:PORT/metrics')
+    run_parser.add_argument('--trace', type=str, metavar='OUT.json',
+                            help='Record a Chrome/Perfetto trace of every phase of the run')
+    run_parser.add_argument('--prompt-template', type=str, help='Path to a custom prompt template')
     run_parser.add_argument('--model', type=str, help='Model to use (e.g., opus-4.1, codex-4.2)')
     run_parser.add_argument('--backend', type=str, choices=['claude', 'codex', 'gemini'], help='Code model backend')
+    run_parser.add_argument('--image-budget', type=parse_image_budget, metavar='SIZE',
+                            default=os.environ.get(BUDGET_ENV_VAR),
+                            help='Keep evaluation images under SIZE (e.g. 200G), evicting least recently used ones')
+    run_parser.add_argument('--prewarm', action='store_true',
+                            help='Build evaluation images in the background during generation')
+    run_parser.add_argument('--until-ci', type=parse_ci_target, metavar='±X%',
+                            help='Evaluate as instances finish (stratified random order) and stop once the '
+                                 'resolve-rate interval is within ±X%%; --limit becomes the instance budget')
+    run_parser.add_argument('--confidence', type=float, default=0.95,
+                            help='Confidence level for --until-ci (default: 0.95)')
+    run_parser.add_argument('--ci-batch', type=int, default=5, metavar='N',
+                            help='Predictions per evaluation batch with --until-ci (default: 5)')
+    run_parser.add_argument('--seed', type=int, help='Seed for the --until-ci instance order')
+    run_parser.add_argument('--budget-percentile', type=float, metavar='P',
+                            help='Per-instance agent time budget: this percentile of past session '
+                                 'durations for the instance/repo/model, with a safety margin (default: 90)')
+    run_parser.add_argument('--budget-floor', type=float, metavar='SECONDS',
+                            help='Minimum time budget per agent session (default: 120)')
+    run_parser.add_argument('--budget-ceiling', type=float, metavar='SECONDS',
+                            help='Maximum time budget per agent session (default: 1800)')
+    run_parser.add_argument('--idle-timeout', type=float, metavar='SECONDS',
+                            help='End an agent session that produces no output and edits no files for this '
+                                 'long, keeping any diff it made (default: 300, 0 disables)')
+    run_parser.add_argument('--instances', type=str, metavar='FILE',
+                            help='Run the instance IDs listed in FILE (e.g. from `subset`) instead of the first --limit')
+    run_parser.add_argument('--shard', type=parse_shard_arg, metavar='I/N',
+                            help='Run only the I-th of N deterministic parts of the selected instances '
+                                 '(split by a stable hash of the instance IDs); combine the parts with `merge`')
+    run_parser.add_argument('--shard-plan', type=str, metavar='FILE',
+                            help='Split by the shard plan in FILE instead, balanced by past generation time; '
+                                 'written from this machine\'s history if FILE does not exist, then copied to '
+                                 'every machine')
     
     # EVAL command
     eval_parser = subparsers.add_parser('eval', help='Evaluate past predictions')
@@ -387,20 +825,88 @@ Examples:
     eval_group.add_argument('--pattern', type=str, help='Files matching pattern')
     eval_group.add_argument('--interactive', action='store_true', help='Interactive selection (default)')
     eval_parser.add_argument('--dataset', default='princeton-nlp/SWE-bench_Lite', help='Dataset name')
-    eval_parser.add_argument('--max-workers', type=int, default=2, help='Max parallel Docker containers')
+    eval_parser.add_argument('--max-workers', type=parse_max_workers, default=2,
+                             help="Max parallel Docker containers, or 'auto' to size from host resources")
+    eval_parser.add_argument('--image-budget', type=parse_image_budget, metavar='SIZE',
+                             default=os.environ.get(BUDGET_ENV_VAR),
+                             help='Keep evaluation images under SIZE (e.g. 200G), evicting least recently used ones')
+    eval_parser.add_argument('--trace', type=str, metavar='OUT.json',
+                             help='Record a Chrome/Perfetto trace of the evaluation')
+    eval_parser.add_argument('--instances', type=str, metavar='FILE',
+                             help='Only evaluate predictions for the instance IDs listed in FILE')
     eval_parser.add_argument('--dry-run', action='store_true', help='Show what would be evaluated')
-    eval_parser.add_argument('--no-update-log', action='store_true', help="Don't update log file")
+    eval_parser.add_argument('--no-update-log', action='store_true', help="Don't update the run ledger")
+    eval_parser.add_argument('--no-batch', action='store_true',
+                             help='Evaluate selected files one after another instead of as one batch')
+    eval_parser.add_argument('--reuse-containers', action='store_true',
+                             help="In a batch, grade every file's patch for an instance in one warm container, "
+                                  "resetting the tree between patches")
+    eval_parser.add_argument('--executor', choices=['docker', 'local'], default='docker',
+                             help='Run the tests in Docker containers or in cached local environments '
+                                  '(no Docker needed; see local_envs.json)')
+    eval_parser.add_argument('--parity-check', type=int, default=0, metavar='N',
+                             help='With --executor local, re-grade N predictions with Docker and report agreement')
     eval_parser.add_argument('--force', '--yes', action='store_true',
                               help='Skip confirmation prompts and re-evaluate files')
     
+    # PREWARM command
+    prewarm_parser = subparsers.add_parser('prewarm', help='Build evaluation images ahead of time')
+    prewarm_parser.add_argument('--limit', type=int, help='Number of instances (default: whole dataset)')
+    prewarm_parser.add_argument('--dataset', default='princeton-nlp/SWE-bench_Lite', help='Dataset to use')
+    prewarm_parser.add_argument('--max-workers', type=int, default=1, help='Max concurrent image builds')
+    prewarm_parser.add_argument('--instances', type=str, metavar='FILE',
+                                help='Build images for the instance IDs listed in FILE')
+
+    # SUBSET command
+    subset_parser = subparsers.add_parser('subset', help='Build a representative instance subset file')
+    subset_parser.add_argument('--size', type=int, default=50, help='Number of instances (default: 50)')
+    subset_parser.add_argument('--dataset', default='princeton-nlp/SWE-bench_Lite', help='Dataset to sample')
+    subset_parser.add_argument('--output', type=str, metavar='FILE',
+                               help='Instance ID file to write (default: test_sets/subset_<size>.txt)')
+    
+    # MERGE command
+    merge_parser = subparsers.add_parser('merge', help='Combine shard prediction files into one run')
+    merge_parser.add_argument('files', nargs='+', metavar='PREDICTIONS.jsonl', help='Shard prediction files')
+    merge_parser.add_argument('--output', type=str, help='Merged file (default: a new predictions/predictions_<time>.jsonl)')
+    merge_parser.add_argument('--dataset', default='princeton-nlp/SWE-bench_Lite', help='Dataset the shards came from')
+    merge_parser.add_argument('--limit', type=int, help='Check that the first N dataset instances are all present')
+    merge_parser.add_argument('--instances', type=str, metavar='FILE',
+                              help='Check that the instance IDs listed in FILE are all present')
+    merge_parser.add_argument('--model', type=str, help='Model to record (default: from the shard runs)')
+    merge_parser.add_argument('--backend', type=str, choices=['claude', 'codex', 'gemini'],
+                              help='Backend to record (default: from the shard runs)')
+    merge_parser.add_argument('--notes', default='', help='Optional notes for the merged run')
+    merge_parser.add_argument('--no-log', action='store_true', help='Do not record the merged run in the ledger')
+    
+    # IMAGES command
+    images_parser = subparsers.add_parser('images', help='Show image cache hit rate and prune to budget')
+    images_parser.add_argument('--budget', type=parse_image_budget, metavar='SIZE',
+                               default=os.environ.get(BUDGET_ENV_VAR),
+                               help='Disk budget for evaluation images (default: $SWE_BENCH_IMAGE_BUDGET)')
+    images_parser.add_argument('--prune', action='store_true', help='Evict images until under budget')
+    
     # SCORES command
     scores_parser = subparsers.add_parser('scores', help='View and analyze scores')
     scores_parser.add_argument('--filter', choices=['all', 'evaluated', 'pending'], default='all', help='Filter scores')
     scores_parser.add_argument('--stats', action='store_true', help='Show statistics')
     scores_parser.add_argument('--trends', action='store_true', help='Show trends over time')
+    scores_parser.add_argument('--group-by', choices=GROUP_BY_FIELDS,
+                               help='Break statistics down per group with bootstrap CIs (implies --stats)')
+    scores_parser.add_argument('--compare', nargs='*', metavar='RUN',
+                               help='Compare per-instance outcomes of runs matching each RUN (prediction '
+                                    'file, model, backend, dataset or prompt template); with no RUN, '
+                                    'compare every --group-by group (default: model)')
+    scores_parser.add_argument('--window', type=int, default=10, metavar='N',
+                               help='Rolling window size (in runs) for --trends (default: 10)')
     scores_parser.add_argument('--pending', action='store_true', help='Show pending evaluations')
     scores_parser.add_argument('--export', type=str, metavar='FILE.csv', help='Export to CSV')
     scores_parser.add_argument('--last', type=int, metavar='N', help='Show only last N entries')
+    scores_parser.add_argument('--watch', type=float, nargs='?', const=2.0, metavar='SECONDS',
+                               help='Keep following the ledger, re-rendering when runs change (default: every 2s)')
+    scores_parser.add_argument('--export-jsonl', type=str, metavar='FILE.jsonl',
+                               help='Export the ledger as JSON lines (legacy log format)')
+    scores_parser.add_argument('--local', action='store_true',
+                               help='Show scores from `eval --executor local` instead of Docker evaluations')
     
     # Shortcut commands
     subparsers.add_parser('quick', help='Quick test (10 instances with eval)')
@@ -426,13 +932,23 @@ Examples:
     
     # Route to appropriate handler
     if args.command == 'run':
-        return run_command(args)
+        with tracing.session(getattr(args, 'trace', None), "swe_bench run"):
+            return run_command(args)
     elif args.command == 'eval':
         if not any([args.file, args.date, args.date_range, args.last, args.pattern, args.interactive]):
             args.interactive = True  # Default to interactive
-        return eval_command(args)
+        with tracing.session(args.trace, "swe_bench eval"):
+            return eval_command(args)
     elif args.command == 'scores':
         return scores_command(args)
+    elif args.command == 'prewarm':
+        return prewarm_command(args)
+    elif args.command == 'images':
+        return images_command(args)
+    elif args.command == 'subset':
+        return subset_command(args)
+    elif args.command == 'merge':
+        return merge_command(args)
     elif args.command == 'quick':
         # Create args for quick command
         class QuickArgs:
@@ -0,0 +1,192 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import evaluate_predictions
+from utils import batch_harness, dataset_cache
+
+
+def _predictions(path, ids, model):
+    path.write_text("".join(json.dumps({"instance_id": i, "model": model, "prediction": f"diff {i}"}) + "\n"
+                            for i in ids))
+    return path
+
+
+def _fake_batch(calls, resolved):
+    """Stand-in for execute_batch_evaluation; ``resolved`` maps each executor to the IDs it resolves."""
+    def fake_batch(runs, dataset_name, max_workers, report_dir, batch_id, image_budget=None,
+                   reuse_containers=False, executor="docker"):
+        calls.append((executor, runs))
+        for run in runs:
+            model = run["predictions"][0]["model_name_or_path"]
+            (report_dir / f"{model}.{run['run_id']}.json").write_text(json.dumps({
+                "resolved_instances": len(resolved[executor]), "total_instances": len(run["predictions"]),
+                "resolved_ids": resolved[executor],
+            }))
+        return []
+    return fake_batch
+
+
+def test_files_are_evaluated_as_one_batch_and_scored_per_file(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "predictions").mkdir()
+    first = _predictions(tmp_path / "predictions" / "predictions_20250101_000000.jsonl", ["a", "b"], "claude-code")
+    second = _predictions(tmp_path / "predictions" / "predictions_20250102_000000.jsonl", ["a"], "codex-code")
+    evaluator = evaluate_predictions.PredictionEvaluator()
+    for f in (first, second):
+        evaluator.ledger.record({"timestamp": "t", "prediction_file": str(f), "evaluation_status": "pending"})
+
+    calls = []
+    monkeypatch.setattr(evaluate_predictions, "execute_batch_evaluation", _fake_batch(calls, {"docker": ["a"]}))
+    results = evaluator.evaluate_files([first, second])
+
+    assert len(calls) == 1
+    runs = calls[0][1]
+    assert [[p["instance_id"] for p in run["predictions"]] for run in runs] == [["a", "b"], ["a"]]
+    assert runs[1]["predictions"][0]["model_name_or_path"] == "codex-code"
+    assert [(f, score) for f, score, _ in results] == [(first, 50.0), (second, 100.0)]
+    entry = evaluator.ledger.get(first.name)
+    assert entry["evaluation_status"] == "completed" and entry["evaluation_batch"].startswith("eval_")
+
+    # Evaluated files are left alone unless forced.
+    assert evaluator.evaluate_files([first, second]) == []
+
+
+def test_local_batch_is_checked_against_docker_on_a_sample(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "envs.json").write_text(json.dumps({"acme/calc": {"*": {"packages": ["pytest"]}}}))
+    monkeypatch.setenv("SWE_BENCH_LOCAL_ENVS", str(tmp_path / "envs.json"))
+    monkeypatch.setattr(dataset_cache, "load_instances", lambda name: [
+        {"instance_id": i, "repo": "acme/calc", "version": "1.0"} for i in "abc"])
+    (tmp_path / "predictions").mkdir()
+    first = _predictions(tmp_path / "predictions" / "predictions_20250101_000000.jsonl", ["a", "b", "c"], "m")
+    evaluator = evaluate_predictions.PredictionEvaluator()
+    evaluator.ledger.record({"timestamp": "t", "prediction_file": str(first), "evaluation_status": "pending"})
+
+    calls = []
+    # Local resolves a and b; Docker only resolves a.
+    monkeypatch.setattr(evaluate_predictions, "execute_batch_evaluation",
+                        _fake_batch(calls, {"local": ["a", "b"], "docker": ["a"]}))
+    evaluator.evaluate_files([first], executor="local", parity_sample=3)
+
+    assert [executor for executor, _ in calls] == ["local", "docker"]
+    assert sorted(p["instance_id"] for p in calls[1][1][0]["predictions"]) == ["a", "b", "c"]
+    parity = json.loads(next(evaluator.eval_results_dir.glob("*_parity.json")).read_text())
+    assert (parity["compared"], parity["agreed"]) == (3, 2)
+    assert [m["instance_id"] for m in parity["mismatches"]] == ["b"]
+    # Local scores are kept apart from Docker's.
+    entry = evaluator.ledger.get(first.name)
+    assert round(entry["local_evaluation_score"], 2) == 66.67 and entry["evaluation_status"] == "pending"
+    assert "evaluation_score" not in entry
+
+    # Repos without a local environment spec are refused.
+    calls.clear()
+    monkeypatch.setattr(dataset_cache, "load_instances", lambda name: [
+        {"instance_id": i, "repo": "acme/other", "version": "1.0"} for i in "abc"])
+    assert evaluator.evaluate_files([first], executor="local", force=True) == []
+    assert calls == []
+
+
+def test_batch_harness_grades_every_row_in_one_pool(tmp_path, monkeypatch):
+    batch = tmp_path / "batch.jsonl"
+    rows = [
+        {"run_id": "r1", "instance_id": "a", "model_name_or_path": "m", "model_patch": "p"},
+        {"run_id": "r1", "instance_id": "b", "model_name_or_path": "m", "model_patch": ""},
+        {"run_id": "r2", "instance_id": "a", "model_name_or_path": "m", "model_patch": "q"},
+    ]
+    batch.write_text("".join(json.dumps(r) + "\n" for r in rows))
+    graded, reports, pools = [], {}, []
+
+    import docker
+    monkeypatch.setattr(docker, "from_env", lambda: "client")
+    monkeypatch.setattr(batch_harness, "load_swebench_dataset",
+                        lambda name, split, ids: [{"instance_id": i} for i in ids])
+    monkeypatch.setattr(batch_harness, "make_test_spec", lambda instance: instance["instance_id"])
+    monkeypatch.setattr(batch_harness, "_prepare_images", lambda client, instances, workers: None)
+    monkeypatch.setattr(batch_harness, "run_instance",
+                        lambda test_spec, pred, client, run_id, timeout: graded.append((run_id, pred["model_patch"])))
+    monkeypatch.setattr(batch_harness, "run_threadpool",
+                        lambda func, payloads, workers: pools.append(workers) or [func(*p) for p in payloads])
+    monkeypatch.setattr(batch_harness, "make_run_report",
+                        lambda preds, dataset, run_id, client: reports.update({run_id: sorted(preds)}))
+
+    batch_harness.main(str(batch), "lite", "test", max_workers=3, timeout=60)
+    assert pools == [3]
+    assert graded == [("r1", "p"), ("r2", "q")]
+    assert reports == {"r1": ["a", "b"], "r2": ["a"]}
+
+
+class _Container:
+    name, id = "sweb.eval.a.r1.warm", "c1"
+
+    def __init__(self, stubborn=False):
+        self.dirty = False
+        self.stubborn = stubborn
+        self.patch = ""
+
+    def start(self):
+        pass
+
+    def exec_run(self, cmd, workdir=None, user=None):
+        command = cmd[-1] if isinstance(cmd, list) else cmd
+
+        class Result:
+            exit_code, output = 0, b""
+        if command == "git status --porcelain":
+            Result.output = b" M src.py\n" if self.dirty else b""
+        elif command.startswith("git apply --verbose"):
+            self.dirty = True
+        elif command.startswith("git reset --hard"):
+            self.dirty = self.stubborn
+        return Result
+
+
+def test_candidates_share_a_warm_container_and_are_graded_separately(tmp_path, monkeypatch):
+    from swebench.harness import docker_utils, grading, run_evaluation
+
+    monkeypatch.chdir(tmp_path)
+    containers = []
+
+    def create(test_spec, client, run_id, logger):
+        containers.append(_Container(stubborn=stubborn))
+        return containers[-1]
+
+    def copy(container, src, dst):
+        if str(dst).endswith(".diff"):
+            container.patch = src.read_text()
+
+    monkeypatch.setattr(run_evaluation, "create_container", create)
+    monkeypatch.setattr(docker_utils, "copy_to_container", copy)
+    monkeypatch.setattr(docker_utils, "cleanup_container", lambda client, container, logger: None)
+    monkeypatch.setattr(docker_utils, "exec_run_with_timeout",
+                        lambda container, cmd, timeout: (f"tests for {containers[-1].patch}", False, 1.0))
+    monkeypatch.setattr(grading, "get_eval_report", lambda test_spec, prediction, test_log_path, include_tests_status: {
+        "a": {"resolved": "good" in test_log_path.read_text()}})
+
+    class Spec:
+        instance_id, eval_script = "a", "pytest"
+
+    rows = [{"run_id": f"r{n}", "instance_id": "a", "model_name_or_path": "m", "model_patch": patch}
+            for n, patch in enumerate(["good", "bad", "good again"], 1)]
+    stubborn = False
+    assert batch_harness.run_candidates(Spec, rows, "client", 60) == {"r1": True, "r2": False, "r3": True}
+    assert len(containers) == 1
+    report = tmp_path / "logs" / "run_evaluation" / "r2" / "m" / "a" / "report.json"
+    assert json.loads(report.read_text()) == {"a": {"resolved": False}}
+
+    # A tree that cannot be reset means a fresh container for the next candidate.
+    stubborn = True
+    rows = [dict(row, run_id=f"s{n}") for n, row in enumerate(rows, 1)]
+    assert batch_harness.run_candidates(Spec, rows, "client", 60) == {"s1": True, "s2": False, "s3": True}
+    assert len(containers) == 4
+
+
+def test_older_harnesses_remove_images_unless_a_budget_keeps_them(monkeypatch):
+    def old_run_instance(test_spec, pred, rm_image, force_rebuild, client, run_id, timeout):
+        pass
+
+    monkeypatch.setattr(batch_harness, "run_instance", old_run_instance)
+    assert batch_harness._run_instance_kwargs() == {"rm_image": True, "force_rebuild": False}
+    assert batch_harness._run_instance_kwargs(keep_images=True) == {"rm_image": False, "force_rebuild": False}
@@ -0,0 +1,44 @@
+import os
+import stat
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils import cli_probe
+
+
+def _fake_cli(bin_dir, name, version):
+    path = bin_dir / name
+    counter = bin_dir / f"{name}.calls"
+    path.write_text(f"#!/bin/sh\necho x >> {counter}\necho '{version}'\n")
+    path.chmod(path.stat().st_mode | stat.S_IEXEC)
+    return path, counter
+
+
+def test_probe_is_cached_until_binary_changes(tmp_path, monkeypatch):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    monkeypatch.setenv("PATH", str(bin_dir))
+    monkeypatch.setenv(cli_probe.CACHE_ENV, str(tmp_path / "cache"))
+    monkeypatch.setattr(cli_probe, "_memory", {})
+    path, counter = _fake_cli(bin_dir, "fakecli", "1.0")
+
+    assert cli_probe.probe_cli("fakecli") == "1.0"
+    assert cli_probe.probe_cli("fakecli") == "1.0"
+    # A fresh process reads the on-disk cache instead of re-running the CLI
+    monkeypatch.setattr(cli_probe, "_memory", {})
+    assert cli_probe.probe_cli("fakecli") == "1.0"
+    assert len(counter.read_text().split()) == 1
+
+    # Upgrading the binary changes its fingerprint and forces a new probe
+    path.write_text(path.read_text().replace("1.0", "2.0") + "\n")
+    assert cli_probe.probe_cli("fakecli") == "2.0"
+    assert len(counter.read_text().split()) == 2
+
+
+def test_require_cli_raises_when_missing(tmp_path, monkeypatch):
+    monkeypatch.setenv("PATH", str(tmp_path))
+    with pytest.raises(RuntimeError, match="Missing CLI not found"):
+        cli_probe.require_cli("definitely-not-installed", "Missing")
@@ -0,0 +1,76 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils.cli_session import EXCERPT_BYTES, run_cli_session, workspace_state
+
+
+def _python(code):
+    return [sys.executable, "-c", code]
+
+
+def test_silent_session_is_ended_as_stalled(tmp_path):
+    (tmp_path / "fix.py").write_text("x = 1\n")
+    start = time.monotonic()
+    result = run_cli_session(_python("import time; time.sleep(30)"), "", str(tmp_path),
+                             timeout=60, idle_timeout=1, poll_interval=0.2)
+
+    assert result["stalled"] and not result["timed_out"] and not result["success"]
+    assert time.monotonic() - start < 10
+    assert "stalled" in result["stderr"]
+
+
+def test_workspace_edits_and_output_keep_a_session_alive(tmp_path):
+    # Silent on stdout but editing a file every 0.3 s, longer than the idle window.
+    edits = ("import time\n"
+             "for i in range(8):\n"
+             "    open('work.txt', 'w').write('x' * i)\n"
+             "    time.sleep(0.3)\n")
+    result = run_cli_session(_python(edits), "", str(tmp_path), timeout=60,
+                             idle_timeout=1, poll_interval=0.2)
+    assert result["success"] and not result["stalled"]
+
+    talking = "import sys, time\nfor i in range(8):\n    print(i, flush=True)\n    time.sleep(0.3)\n"
+    result = run_cli_session(_python(talking), "", str(tmp_path), timeout=60,
+                             idle_timeout=1, poll_interval=0.2)
+    assert result["success"] and result["stdout"].split() == [str(i) for i in range(8)]
+
+
+def test_prompt_is_sent_on_stdin_and_timeout_still_applies(tmp_path):
+    echo = "import sys; print(sys.stdin.read().upper())"
+    result = run_cli_session(_python(echo), "fix the bug", str(tmp_path), timeout=60)
+    assert result["stdout"].strip() == "FIX THE BUG"
+    assert result["returncode"] == 0 and not result["stalled"]
+
+    chatty = "import time\nwhile True:\n    print('.', flush=True)\n    time.sleep(0.1)\n"
+    result = run_cli_session(_python(chatty), "", str(tmp_path), timeout=1,
+                             idle_timeout=5, poll_interval=0.2)
+    assert result["timed_out"] and not result["stalled"]
+    assert result["stdout"].startswith(".")
+
+
+def test_workspace_state_ignores_git_internals(tmp_path):
+    (tmp_path / ".git").mkdir()
+    (tmp_path / "a.py").write_text("a")
+    before = workspace_state(str(tmp_path))
+    (tmp_path / ".git" / "index").write_text("changed")
+    assert workspace_state(str(tmp_path)) == before
+    (tmp_path / "b.py").write_text("b")
+    assert workspace_state(str(tmp_path)) != before
+
+
+def test_output_streams_to_transcript_with_bounded_excerpt(tmp_path):
+    noisy = "import sys\nfor i in range(20000):\n    sys.stdout.write('line %05d\\n' % i)\n"
+    result = run_cli_session(_python(noisy), "", str(tmp_path), timeout=60,
+                             transcript=str(tmp_path / "session"))
+
+    assert result["stdout_bytes"] == 20000 * 11
+    with open(result["stdout_file"], "rb") as f:
+        assert f.read().count(b"\n") == 20000
+    assert len(result["stdout"]) < 2 * EXCERPT_BYTES + 200
+    assert result["stdout"].startswith("line 00000")
+    assert result["stdout"].rstrip().endswith("line 19999")
+    assert "bytes omitted" in result["stdout"]
+    assert open(result["stderr_file"]).read() == ""
@@ -0,0 +1,56 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils.failures import (AGENT, BACKEND_FATAL, BACKEND_TRANSIENT, INFRA_TRANSIENT, CircuitBreaker,
+                            RetryQueue, classify_cli_failure, classify_exception)
+
+
+def test_classification():
+    assert classify_cli_failure({"returncode": 1, "stderr": "Invalid API key · Please run /login"}) == BACKEND_FATAL
+    assert classify_cli_failure({"returncode": 127, "stderr": ""}) == BACKEND_FATAL
+    assert classify_cli_failure({"returncode": 1, "stderr": "API Error: 529 Overloaded"}) == BACKEND_TRANSIENT
+    assert classify_cli_failure({"returncode": -9, "stderr": ""}) == BACKEND_TRANSIENT
+
+    assert classify_exception(OSError("No space left on device")) == INFRA_TRANSIENT
+    assert classify_exception(RuntimeError("429 Too Many Requests")) == BACKEND_TRANSIENT
+    assert classify_exception(RuntimeError("OAuth token has expired")) == BACKEND_FATAL
+    assert classify_exception(KeyError("prediction")) == AGENT
+
+
+def test_retry_queue_backs_off_and_gives_up():
+    queue = RetryQueue(max_attempts=3, backoff=10, max_backoff=15)
+    assert queue.defer({"instance_id": "a"}, now=100)
+    assert queue.defer({"instance_id": "b"}, now=101)
+    assert queue.pop() == (110, {"instance_id": "a"})
+    assert queue.defer({"instance_id": "a"}, now=120)  # second failure: 20s, capped at 15
+    assert [i["instance_id"] for i in queue.remaining()] == ["b", "a"]
+    assert queue.pop()[0] == 111 and queue.pop()[0] == 135
+    assert not queue.defer({"instance_id": "a"}, now=140)
+    assert len(queue) == 0
+
+
+def test_circuit_breaker_pauses_then_gives_up(capsys):
+    slept = []
+    breaker = CircuitBreaker(threshold=2, cooldown=60, max_trips=2, sleep=slept.append)
+    breaker.record(BACKEND_FATAL, "Invalid API key")
+    breaker.record(BACKEND_TRANSIENT)
+    assert not breaker.open
+    breaker.record(BACKEND_FATAL, "Invalid API key")
+    assert breaker.open and not breaker.exhausted
+
+    alerts = []
+    breaker.pause(on_alert=alerts.append)
+    assert slept == [60] and "Invalid API key" in alerts[0]
+    assert "Pausing dispatch" in capsys.readouterr().err
+    # Half-open: a success closes the circuit, one more fatal error reopens it.
+    breaker.record(BACKEND_FATAL)
+    assert breaker.open
+    breaker.pause()
+    assert slept == [60, 120]
+    breaker.record(None)
+    assert not breaker.open
+    breaker.record(BACKEND_FATAL)
+    breaker.record(BACKEND_FATAL)
+    assert breaker.exhausted
@@ -0,0 +1,85 @@
+import os
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils import cli_probe, file_index
+from utils.file_index import FileIndex, candidate_files, tokenize
+from utils.prompt_formatter import PromptFormatter
+
+
+def _git(repo, *args):
+    return subprocess.run(["git", *args], cwd=repo, check=True, capture_output=True, text=True).stdout.strip()
+
+
+def _commit(repo, files, message):
+    for path, text in files.items():
+        target = repo / path
+        if text is None:
+            target.unlink()
+            continue
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_text(text)
+    _git(repo, "add", "-A")
+    _git(repo, "-c", "user.name=t", "-c", "user.email=t@t", "commit", "-qm", message)
+    return _git(repo, "rev-parse", "HEAD")
+
+
+def _repo(tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    _git(repo, "init", "-q")
+    first = _commit(repo, {
+        "pkg/query.py": 'class QuerySet:\n    """Lazy database lookup."""\n    def filter(self):\n        pass\n',
+        "pkg/forms/widgets.py": 'class DateInput:\n    """Render a date picker widget."""\n',
+        "pkg/utils/text.py": 'def slugify(value):\n    """Convert to ASCII slug."""\n',
+        "README.md": "QuerySet QuerySet QuerySet\n",
+    }, "first")
+    second = _commit(repo, {
+        "pkg/utils/text.py": None,
+        "pkg/utils/html.py": 'def escape_html(text):\n    """Escape markup in text."""\n',
+        "pkg/query.py": 'class QuerySet:\n    """Lazy database lookup."""\n    def exclude(self):\n        pass\n',
+    }, "second")
+    return repo, first, second
+
+
+def test_tokenize_splits_identifiers():
+    assert tokenize("QuerySet.filter_by") == ["queryset", "query", "set", "filter_by", "filter"]
+
+
+def test_incremental_build_matches_full_build_and_ranks_files(tmp_path, monkeypatch):
+    monkeypatch.setenv(cli_probe.CACHE_ENV, str(tmp_path / "cache"))
+    monkeypatch.setattr(file_index, "_recent", {})
+    repo, first, second = _repo(tmp_path)
+
+    _git(repo, "checkout", "-q", first)
+    instance = {"repo": "org/pkg", "base_commit": first,
+                "problem_statement": "QuerySet.filter() returns wrong rows from the database"}
+    assert candidate_files(str(repo), instance, k=1) == ["pkg/query.py"]
+    assert "README.md" not in file_index.STORE.load("org/pkg", first)
+
+    _git(repo, "checkout", "-q", second)
+    reads = []
+    original = file_index.read_terms
+    monkeypatch.setattr(file_index, "read_terms", lambda r, p: reads.append(p) or original(r, p))
+    monkeypatch.setattr(file_index, "_recent", {})
+    incremental = file_index.load_index(str(repo), "org/pkg", second)
+    assert sorted(reads) == ["pkg/query.py", "pkg/utils/html.py"]
+
+    full = FileIndex.build(str(repo), "org/pkg", second)
+    assert incremental.docs == full.docs
+    assert incremental.rank("escape html markup", k=1)[0][0] == "pkg/utils/html.py"
+
+
+def test_candidate_files_placeholder(tmp_path):
+    template = tmp_path / "prompt.txt"
+    template.write_text("Fix {instance_id}.\nStart with:\n{candidate_files}\n")
+    formatter = PromptFormatter(str(template))
+    assert formatter.wants_candidate_files
+    assert not PromptFormatter().wants_candidate_files
+
+    instance = {"instance_id": "org__pkg-1", "repo": "org/pkg", "problem_statement": "bug"}
+    prompt = formatter.format_issue(instance, ["pkg/query.py", "pkg/forms/widgets.py"])
+    assert "Start with:\n- pkg/query.py\n- pkg/forms/widgets.py\n" in prompt
+    assert "(none found)" in formatter.format_issue(instance)
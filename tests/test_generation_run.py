@@ -0,0 +1,127 @@
+import json
+import os
+import stat
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import code_swe_agent
+from utils import cli_probe
+
+
+def _agent(tmp_path, monkeypatch):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    cli = bin_dir / "claude"
+    cli.write_text("#!/bin/sh\necho 1.0\n")
+    cli.chmod(cli.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("PATH", str(bin_dir) + os.pathsep + os.environ["PATH"])
+    monkeypatch.setenv(cli_probe.CACHE_ENV, str(tmp_path / "cache"))
+    monkeypatch.chdir(tmp_path)
+
+    agent = code_swe_agent.CodeSWEAgent(backend="claude")
+    monkeypatch.setattr(agent, "process_instance", lambda instance: {
+        "instance_id": instance["instance_id"],
+        "model": "claude-code",
+        "prediction": "diff" if instance["instance_id"] != "b" else "",
+    })
+    return agent
+
+
+def test_run_streams_predictions_into_its_own_file(tmp_path, monkeypatch):
+    agent = _agent(tmp_path, monkeypatch)
+    instances = [{"instance_id": i} for i in ("a", "b", "c")]
+    seen = []
+
+    run = agent.start_run("local", instances=instances, limit=2,
+                          progress=lambda done, total, p: seen.append((done, total)))
+    other = agent.start_run("local", instances=instances)
+    assert run.prediction_file.exists()
+    assert run.prediction_file != other.prediction_file
+
+    streamed = [p["instance_id"] for p in run]
+    assert streamed == ["a", "b"]
+    assert seen == [(1, 2), (2, 2)]
+    with open(run.prediction_file) as f:
+        assert [json.loads(line)["instance_id"] for line in f] == ["a", "b"]
+    assert json.loads(run.json_file.read_text()) == run.predictions
+    assert other.prediction_file.read_text() == ""
+
+
+def test_sharded_run_stamps_its_predictions(tmp_path, monkeypatch):
+    agent = _agent(tmp_path, monkeypatch)
+    instances = [{"instance_id": f"i{n}"} for n in range(6)]
+    run = agent.start_run("local", instances=instances, shard=(2, 3))
+    run.run()
+
+    with open(run.prediction_file) as f:
+        stamps = [json.loads(line)["shard"] for line in f]
+    assert len(stamps) == 2 and {s["shard"] for s in stamps} == {"2/3"}
+    assert stamps[0]["instances"] == [i["instance_id"] for i in instances]
+    assert "instances" not in stamps[1]
+    assert all("shard" not in p for p in run.predictions)
+
+
+def test_run_stops_loudly_at_its_time_limit(tmp_path, monkeypatch, capsys):
+    agent = _agent(tmp_path, monkeypatch)
+    run = agent.start_run("local", instances=[{"instance_id": i} for i in ("a", "b")])
+    assert run.deadline > 0
+    run.deadline = -1
+
+    assert run.run() == []
+    assert run.skipped == ["a", "b"]
+    assert "Run time limit" in capsys.readouterr().out
+
+
+def test_run_retries_transient_failures_and_stops_on_a_broken_backend(tmp_path, monkeypatch, capsys):
+    agent = _agent(tmp_path, monkeypatch)
+    failures = {"a": ["backend_transient"], "c": ["backend_fatal"] * 9, "d": ["backend_fatal"] * 9}
+    attempts = []
+
+    def process(instance):
+        instance_id = instance["instance_id"]
+        attempts.append(instance_id)
+        pending = failures.get(instance_id)
+        agent.last_failure = pending.pop(0) if pending else None
+        if agent.last_failure:
+            return {"instance_id": instance_id, "prediction": "", "error": "boom", "failure": agent.last_failure}
+        return {"instance_id": instance_id, "prediction": "diff"}
+
+    monkeypatch.setattr(agent, "process_instance", process)
+    run = agent.start_run("local", instances=[{"instance_id": i} for i in "abcde"])
+    slept = []
+    run.sleep = slept.append
+    run.breaker.threshold, run.breaker.max_trips = 2, 1
+
+    predictions = run.run()
+    # "a" succeeds on its retry after the first pass; the breaker pauses after
+    # c and d, and stops the run when their retries fail again.
+    assert attempts == ["a", "b", "c", "d", "e", "a", "c", "d"]
+    assert [p["instance_id"] for p in predictions] == ["b", "e", "a"]
+    assert run.skipped == ["c", "d"]
+    assert 300 in slept
+    output = capsys.readouterr()
+    assert "Pausing dispatch" in output.err and "stopping the run" in output.out
+
+
+def test_retry_that_would_pass_the_time_limit_is_skipped_not_rushed(tmp_path, monkeypatch, capsys):
+    agent = _agent(tmp_path, monkeypatch)
+    attempts = []
+
+    def process(instance):
+        attempts.append(instance["instance_id"])
+        agent.last_failure = "backend_transient" if instance["instance_id"] == "a" else None
+        if agent.last_failure:
+            return {"instance_id": "a", "prediction": "", "error": "rate limited", "failure": agent.last_failure}
+        return {"instance_id": instance["instance_id"], "prediction": "diff"}
+
+    monkeypatch.setattr(agent, "process_instance", process)
+    run = agent.start_run("local", instances=[{"instance_id": i} for i in "ab"])
+    slept = []
+    run.sleep = slept.append
+    run.deadline = 10  # shorter than the 30s backoff before "a" may be retried
+
+    assert [p["instance_id"] for p in run.run()] == ["b"]
+    assert attempts == ["a", "b"]
+    assert run.skipped == ["a"] and slept == []
+    assert "before the next retry" in capsys.readouterr().out
@@ -0,0 +1,84 @@
+import argparse
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils import dataset_cache
+from utils.image_cache import (BUDGET_ENV_VAR, ImageCacheManager, _build_log_seconds, _image_kind,
+                               parse_image_budget, resolve_image_budget, resolve_image_keys)
+
+
+def test_eviction_prefers_stale_and_cheap_images(tmp_path):
+    cache = ImageCacheManager(tmp_path, budget_bytes=1)
+    cache.state["images"] = {
+        "sweb.eval.x86_64.old-cheap:latest": {"kind": "instance", "last_used": 1000.0, "build_seconds": 10},
+        "sweb.eval.x86_64.old-costly:latest": {"kind": "instance", "last_used": 1000.0, "build_seconds": 900},
+        "sweb.eval.x86_64.recent:latest": {"kind": "instance", "last_used": 5000.0, "build_seconds": 10},
+    }
+
+    order = cache.eviction_order()
+    assert order[0] == "sweb.eval.x86_64.old-cheap:latest"
+    assert order[-1] == "sweb.eval.x86_64.old-costly:latest"
+    assert "sweb.eval.x86_64.recent:latest" not in cache.eviction_order(
+        pinned={"sweb.eval.x86_64.recent:latest"}
+    )
+
+
+def test_build_log_seconds(tmp_path):
+    log = tmp_path / "build_image.log"
+    log.write_text(
+        "2025-09-02 10:00:00,000 - INFO - Building image\n"
+        "step output without timestamp\n"
+        "2025-09-02 10:02:30,500 - INFO - Image built successfully\n"
+    )
+    assert _build_log_seconds(log) == 150.5
+    assert _build_log_seconds(tmp_path / "missing.log") is None
+
+
+def test_resolve_image_budget(monkeypatch):
+    monkeypatch.delenv(BUDGET_ENV_VAR, raising=False)
+    assert resolve_image_budget("200G") == 200 * 1024 ** 3
+    assert resolve_image_budget("1.5TB") == int(1.5 * 1000 ** 4)
+    assert resolve_image_budget("") is None and resolve_image_budget(None) is None
+    monkeypatch.setenv(BUDGET_ENV_VAR, "50GiB")
+    assert resolve_image_budget() == 50 * 1024 ** 3
+
+    for bad in ("lots", "0G"):
+        with pytest.raises(ValueError):
+            resolve_image_budget(bad)
+        with pytest.raises(argparse.ArgumentTypeError):
+            parse_image_budget(bad)
+    assert parse_image_budget("200G") == "200G"
+
+
+def test_resolve_image_keys_on_the_installed_harness(monkeypatch):
+    instance = {
+        "instance_id": "acme__calc-1", "repo": "acme/calc", "version": "1.0",
+        "image": "swebench/sweb.eval.x86_64.acme_1776_calc-1:latest",
+        "eval_script": "pytest tests", "log_parser": "pytest", "eval_type": "pytest",
+        "FAIL_TO_PASS": "[]", "PASS_TO_PASS": "[]",
+    }
+    monkeypatch.setattr(dataset_cache, "cached_instances", lambda name, split="test": [instance])
+
+    keys = resolve_image_keys("acme/calc-bench", ["acme__calc-1", "acme__calc-2"])
+    assert list(keys) == ["acme__calc-1"]
+    assert keys["acme__calc-1"]["instance"].startswith(("sweb.eval.", "swebench/sweb.eval."))
+    assert all(_image_kind(name) == "instance" for name in keys["acme__calc-1"].values()
+               if "sweb.eval." in name)
+
+
+def test_published_images_are_tracked(tmp_path):
+    class Client:
+        def df(self):
+            return {"Images": [
+                {"RepoTags": ["swebench/sweb.eval.x86_64.acme_1776_calc-1:latest"], "Size": 300, "SharedSize": 100},
+                {"RepoTags": ["python:3.11"], "Size": 50, "SharedSize": 0},
+            ]}
+
+    cache = ImageCacheManager(tmp_path)
+    cache._client = Client()
+    assert cache.present_images() == {"swebench/sweb.eval.x86_64.acme_1776_calc-1:latest": 200}
+
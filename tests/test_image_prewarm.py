@@ -0,0 +1,123 @@
+import importlib.util
+import os
+import sys
+import time
+
+import docker
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils import image_cache, image_prewarm
+from utils.image_prewarm import ImagePrewarmer, build_prewarm_command, prepare_images_module, pull_images
+
+
+def _prewarmer(tmp_path, monkeypatch, script):
+    monkeypatch.setattr(image_prewarm, "build_prewarm_command",
+                        lambda dataset, ids, workers: [sys.executable, "-c", script])
+    return ImagePrewarmer("org/dataset", instance_ids=["a", "b"], log_dir=tmp_path / "logs")
+
+
+class _Images:
+    def __init__(self, present):
+        self.present = set(present)
+        self.pulled, self.removed = [], []
+
+    def list(self):
+        return [type("Image", (), {"tags": [tag]}) for tag in sorted(self.present)]
+
+    def pull(self, name):
+        if "broken" in name:
+            raise docker.errors.ImageNotFound(name)
+        self.pulled.append(name)
+        self.present.add(name)
+
+    def remove(self, name):
+        self.removed.append(name)
+        self.present.discard(name)
+
+
+def _client(monkeypatch, present=()):
+    client = type("Client", (), {"images": _Images(present)})()
+    monkeypatch.setattr(image_prewarm, "_docker_client", lambda: client)
+    monkeypatch.setattr(image_cache, "resolve_image_keys", lambda dataset, ids: {
+        i: {"instance": f"swebench/sweb.eval.x86_64.{i}:latest"} for i in ids})
+    return client.images
+
+
+def _started(prewarmer):
+    deadline = time.time() + 10
+    while prewarmer._process is None and time.time() < deadline:
+        time.sleep(0.01)
+    return prewarmer._process
+
+
+def test_prewarm_runs_the_command_and_logs_it(tmp_path, monkeypatch, capsys):
+    prewarmer = _prewarmer(tmp_path, monkeypatch, "print('built')")
+    assert prewarmer.run()
+    assert prewarmer.returncode == 0
+    assert "built" in prewarmer.log_file.read_text()
+    assert "Evaluation images ready (2 instances)" in capsys.readouterr().out
+
+
+def test_wait_is_bounded_and_stops_a_slow_prewarm(tmp_path, monkeypatch, capsys):
+    prewarmer = _prewarmer(tmp_path, monkeypatch, "import time; time.sleep(60)")
+    prewarmer.start()
+    process = _started(prewarmer)
+
+    assert not prewarmer.wait(timeout=0.1)
+    assert process.poll() is not None and not prewarmer.running
+    assert "was stopped" in capsys.readouterr().out
+
+
+def test_stop_terminates_the_child_or_keeps_it_from_starting(tmp_path, monkeypatch):
+    prewarmer = _prewarmer(tmp_path, monkeypatch, "import time; time.sleep(60)")
+    prewarmer.start()
+    process = _started(prewarmer)
+    prewarmer.stop()
+    assert process.poll() is not None and not prewarmer.running
+    assert prewarmer.returncode != 0
+
+    stopped_early = _prewarmer(tmp_path, monkeypatch, "import time; time.sleep(60)")
+    stopped_early.stop()
+    stopped_early._run()
+    assert stopped_early._process is None and stopped_early.returncode == -1
+
+
+def test_command_uses_the_installed_prepare_images_entry_point(monkeypatch):
+    module = prepare_images_module()
+    assert module is not None and importlib.util.find_spec(module) is not None
+    cmd = build_prewarm_command("org/dataset", ["a", "b"], max_workers=2)
+    if module == image_prewarm.PREPARE_IMAGES_MODULES[0]:
+        # swebench 5: pull the published images through this module's own entry point.
+        assert cmd[1] == os.path.abspath(image_prewarm.__file__)
+    else:
+        assert cmd[1:3] == ["-m", module]
+    assert cmd[-3:] == ["--instance_ids", "a", "b"]
+
+    # Older layouts are found when the new one is missing.
+    monkeypatch.setattr(image_prewarm, "PREPARE_IMAGES_MODULES",
+                        ("swebench.missing.prepare_images", "swebench.harness.run_evaluation"))
+    assert build_prewarm_command("org/dataset", [])[1:3] == ["-m", "swebench.harness.run_evaluation"]
+    monkeypatch.setattr(image_prewarm, "PREPARE_IMAGES_MODULES", ("swebench.missing.prepare_images",))
+    with pytest.raises(RuntimeError):
+        build_prewarm_command("org/dataset", ["a"])
+
+
+def test_pull_images_fetches_only_missing_images(monkeypatch):
+    images = _client(monkeypatch, present=["swebench/sweb.eval.x86_64.a:latest"])
+    assert pull_images("org/dataset", ["a", "b", "broken"], max_workers=2) == 1
+    assert images.pulled == ["swebench/sweb.eval.x86_64.b:latest"]
+
+
+def test_prewarmed_images_are_removed_after_evaluation(tmp_path, monkeypatch):
+    images = _client(monkeypatch, present=["swebench/sweb.eval.x86_64.a:latest", "python:3.11"])
+    prewarmer = ImagePrewarmer("org/dataset", instance_ids=["a", "b", "c"], log_dir=tmp_path / "logs")
+    monkeypatch.setattr(image_prewarm, "build_prewarm_command", lambda dataset, ids, workers: [
+        sys.executable, "-c", "pass"])
+    assert prewarmer.run()
+    images.present |= {"swebench/sweb.eval.x86_64.b:latest", "swebench/sweb.eval.x86_64.other:latest"}
+
+    assert prewarmer.remove_images() == 1
+    assert images.removed == ["swebench/sweb.eval.x86_64.b:latest"]
+
@@ -0,0 +1,118 @@
+import json
+import os
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from swebench.harness.utils import make_test_spec
+
+from utils.local_executor import (LocalExecutor, env_spec, localize_eval_script, missing_env_specs,
+                                  parity_summary)
+
+CONTAINER_SCRIPT = """#!/bin/bash
+set -uxo pipefail
+source /opt/miniconda3/bin/activate
+conda activate testbed
+cd /testbed
+git config --global --add safe.directory /testbed
+python -m pip install -e .
+git checkout {base} tests/test_calc.py
+git apply -v - <<'EOF_114329324912'
+{test_patch}
+EOF_114329324912
+: '>>>>> Start Test Output'
+python -m pytest -rA -p no:cacheprovider tests/test_calc.py
+: '>>>>> End Test Output'
+git checkout {base} tests/test_calc.py
+"""
+
+
+def test_eval_script_is_localized():
+    script = CONTAINER_SCRIPT.format(base="abc", test_patch="+pip install /testbed/x")
+    local = localize_eval_script(script, "/tmp/co", "/envs/calc", ["/tmp/co", "/tmp/co/src"]).split("\n")
+
+    assert local[:3] == ["#!/bin/bash", "source /envs/calc/bin/activate",
+                         "export PYTHONPATH=/tmp/co:/tmp/co/src${PYTHONPATH:+:$PYTHONPATH}"]
+    assert "cd /tmp/co" in local
+    assert not any("conda" in line or "--global" in line or line.startswith("python -m pip") for line in local)
+    # Heredoc bodies are patch content and are left alone.
+    assert "+pip install /testbed/x" in local
+
+
+def test_env_spec_needs_a_repo_entry_and_fills_in_defaults():
+    specs = {"*": {"packages": ["pytest"], "pythonpath": ["lib"]},
+             "acme/calc": {"1.0": {"packages": ["pytest<7"]}, "*": {"packages": ["pytest<8"]}}}
+    assert env_spec(specs, "acme/calc", "1.0") == {"packages": ["pytest<7"], "pythonpath": ["lib"]}
+    assert env_spec(specs, "acme/calc", "2.0")["packages"] == ["pytest<8"]
+    assert env_spec(specs, "acme/other", "1.0") is None
+
+    instances = [{"repo": "acme/calc", "version": "3.0"}, {"repo": "acme/other", "version": "1.0"}]
+    assert missing_env_specs(instances, specs) == ["acme/other 1.0"]
+
+
+def _git(cwd, *args):
+    return subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True, text=True).stdout
+
+
+def _diff(repo, edits):
+    """A patch for ``edits`` ({path: content}) against the repo's HEAD."""
+    for path, content in edits.items():
+        (repo / path).write_text(content)
+    patch = _git(repo, "diff")
+    _git(repo, "checkout", "--", ".")
+    return patch
+
+
+def test_local_executor_grades_a_patch_in_a_copy_of_the_checkout(tmp_path):
+    upstream = tmp_path / "upstream"
+    (upstream / "tests").mkdir(parents=True)
+    (upstream / "calc.py").write_text("def add(a, b):\n    return a + b\n\n\ndef double(a):\n    return a\n")
+    (upstream / "tests" / "test_calc.py").write_text(
+        "from calc import add\n\n\ndef test_add():\n    assert add(1, 2) == 3\n")
+    _git(upstream, "init", "-q")
+    _git(upstream, "-c", "user.name=t", "-c", "user.email=t@t", "add", ".")
+    _git(upstream, "-c", "user.name=t", "-c", "user.email=t@t", "commit", "-qm", "base")
+    base = _git(upstream, "rev-parse", "HEAD").strip()
+
+    test_patch = _diff(upstream, {"tests/test_calc.py": "from calc import add, double\n\n\ndef test_add():\n"
+                                  "    assert add(1, 2) == 3\n\n\ndef test_double():\n    assert double(2) == 4\n"})
+    fix = _diff(upstream, {"calc.py": "def add(a, b):\n    return a + b\n\n\ndef double(a):\n    return 2 * a\n"})
+    instance = {
+        "instance_id": "acme__calc-1", "repo": "acme/calc", "version": "1.0", "base_commit": base,
+        "image": "unused", "log_parser": "parse_log_pytest", "eval_type": "pass_and_fail",
+        "FAIL_TO_PASS": ["tests/test_calc.py::test_double"], "PASS_TO_PASS": ["tests/test_calc.py::test_add"],
+        "eval_script": CONTAINER_SCRIPT.format(base=base, test_patch=test_patch.rstrip("\n")),
+    }
+    test_spec = make_test_spec(instance)
+
+    env = tmp_path / "env"
+    (env / "bin").mkdir(parents=True)
+    (env / "bin" / "activate").write_text("")  # the test process's own Python has pytest
+    executor = LocalExecutor(root=tmp_path / "cache", specs={}, repo_url=lambda repo: str(upstream))
+    executor.environment = lambda repo, version, pristine: env
+
+    def grade(patch, name):
+        pred = {"instance_id": "acme__calc-1", "model_name_or_path": "m", "model_patch": patch}
+        return executor.run(instance, test_spec, pred, tmp_path / "logs" / name, timeout=120)
+
+    report = grade(fix, "fixed")["acme__calc-1"]
+    assert report["resolved"] and report["tests_status"]["FAIL_TO_PASS"]["success"] == ["tests/test_calc.py::test_double"]
+    assert json.loads((tmp_path / "logs" / "fixed" / "report.json").read_text())["acme__calc-1"]["resolved"]
+
+    assert grade(fix.replace("2 * a", "a + 1"), "wrong")["acme__calc-1"]["resolved"] is False
+    assert grade("not a patch\n", "garbage") is None
+
+    # Candidates ran in copies; the cached checkout is still at the base commit.
+    pristine = executor.pristine("acme/calc", base)
+    assert _git(pristine, "status", "--porcelain") == ""
+    assert "return a\n" in (pristine / "calc.py").read_text()
+
+
+def test_parity_summary_counts_agreement_and_lists_mismatches():
+    local = {"r1": {"a": True, "b": False}, "r2": {"a": True}}
+    docker = {"r1": {"a": True, "b": True}, "r2": {"a": True}}
+    summary = parity_summary(local, docker)
+    assert summary["compared"] == 3 and summary["agreed"] == 2
+    assert summary["mismatches"] == [{"run_id": "r1", "instance_id": "b", "local": False, "docker": True}]
+    assert parity_summary({}, {})["agreement"] is None
@@ -0,0 +1,57 @@
+import json
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils.outcome_matrix import OutcomeMatrix, popcount
+
+
+def _entry(tmp_path, name, submitted, resolved):
+    report = tmp_path / f"{name}.json"
+    report.write_text(json.dumps({"submitted_ids": submitted, "resolved_ids": resolved}))
+    return {"prediction_file": f"predictions/{name}.jsonl", "evaluation_report": str(report)}
+
+
+def test_set_queries_and_win_loss(tmp_path):
+    entries = [
+        _entry(tmp_path, "a1", ["x", "y", "z"], ["x"]),
+        _entry(tmp_path, "a2", ["x", "y", "z"], ["y"]),
+        _entry(tmp_path, "b1", ["x", "y", "z", "w"], ["x", "w"]),
+    ]
+    matrix = OutcomeMatrix(tmp_path)
+    assert matrix.sync(entries)
+
+    a = matrix.row_indices(["a1.jsonl", "a2.jsonl"])
+    b = matrix.row_indices(["b1.jsonl"])
+    assert sorted(matrix.ids(matrix.oracle())) == ["w", "x", "y"]
+    assert matrix.ids(matrix.never_solved()) == ["z"]
+    assert matrix.ids(matrix.intersection(np.r_[a, b])) == []
+    assert matrix.ids(matrix.difference(a, b)) == ["y"]
+    # w was never attempted by A, so it does not count as a win for B
+    assert matrix.ids(matrix.difference(b, a)) == []
+
+    labels, wins = matrix.win_loss({"a": a, "b": b})
+    assert labels == ["a", "b"]
+    assert wins.tolist() == [[0, 1], [0, 0]]
+    assert popcount(matrix.oracle(b)) == 2
+
+
+def test_index_is_stable_across_reloads(tmp_path):
+    matrix = OutcomeMatrix(tmp_path)
+    matrix.sync([_entry(tmp_path, "r1", ["x", "y"], ["y"])])
+
+    reloaded = OutcomeMatrix(tmp_path)
+    assert reloaded.instance_ids == ["x", "y"]
+    # Unchanged reports are not re-read
+    assert not reloaded.sync([{
+        "prediction_file": "predictions/r1.jsonl",
+        "evaluation_report": str(tmp_path / "r1.json"),
+    }])
+
+    reloaded.sync([_entry(tmp_path, "r2", [f"n{i}" for i in range(10)], ["n9"])])
+    assert reloaded.instance_ids[:2] == ["x", "y"]
+    assert reloaded.ids(reloaded.oracle(reloaded.row_indices(["r1.jsonl"]))) == ["y"]
+    assert reloaded.ids(reloaded.oracle(reloaded.row_indices(["r2.jsonl"]))) == ["n9"]
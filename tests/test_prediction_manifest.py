@@ -0,0 +1,48 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils import prediction_manifest
+from utils.prediction_manifest import PredictionManifest
+
+
+def _write_predictions(path, patches):
+    with open(path, "w") as f:
+        for i, patch in enumerate(patches):
+            f.write(json.dumps({"instance_id": f"repo__repo-{i}", "model": "claude-code",
+                                "prediction": patch}) + "\n")
+
+
+def test_refresh_only_rereads_changed_files(tmp_path, monkeypatch):
+    first = tmp_path / "predictions_20250902_163415.jsonl"
+    second = tmp_path / "predictions_20250903_101010.jsonl"
+    _write_predictions(first, ["diff --git a/x b/x", ""])
+    _write_predictions(second, ["diff --git a/y b/y"])
+    (tmp_path / "predictions_20250903_101010_eval.jsonl").write_text("")
+
+    entries = PredictionManifest(tmp_path).refresh()
+    entry = entries[str(first)]
+    assert len(entries) == 2
+    assert entry["instance_count"] == 2
+    assert entry["nonempty_count"] == 1
+    assert entry["backend"] == "claude"
+    assert entry["patch_hashes"]["repo__repo-1"] is None
+
+    reads = []
+    original = prediction_manifest.summarize_predictions_file
+    monkeypatch.setattr(prediction_manifest, "summarize_predictions_file",
+                        lambda path: reads.append(path) or original(path))
+
+    # A fresh instance loads the saved manifest; nothing has changed yet.
+    manifest = PredictionManifest(tmp_path)
+    manifest.refresh()
+    assert reads == []
+
+    _write_predictions(second, ["diff --git a/y b/y", "diff --git a/z b/z"])
+    assert manifest.get(second)["instance_count"] == 2
+    assert reads == [str(second)]
+
+    second.unlink()
+    assert list(manifest.refresh()) == [str(first)]
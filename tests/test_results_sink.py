@@ -0,0 +1,57 @@
+import json
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils.results_sink import ResultsSink
+from utils.run_ledger import RunLedger
+
+
+def test_concurrent_records_land_whole_in_group_commits(tmp_path):
+    ledger = RunLedger(tmp_path / "benchmark_scores.log")
+    path = tmp_path / "predictions.jsonl"
+    sink = ResultsSink(ledger, interval=0.05, max_batch=100)
+
+    def produce(worker):
+        for n in range(50):
+            sink.append(path, {"instance_id": f"w{worker}-{n}", "prediction": "x" * 5000})
+            sink.record_instance(f"w{worker}-{n}", 1.0, "patch", "claude")
+
+    threads = [threading.Thread(target=produce, args=(w,)) for w in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    sink.write_json(tmp_path / "result.json", {"n": 1})
+    sink.write_json(tmp_path / "result.json", {"n": 2})
+    sink.close()
+
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert len(records) == 200 == sink.records
+    for w in range(4):
+        assert [r["instance_id"] for r in records if r["instance_id"].startswith(f"w{w}-")] == \
+            [f"w{w}-{n}" for n in range(50)]
+    assert sink.commits < 200
+    assert json.loads((tmp_path / "result.json").read_text()) == {"n": 2}
+    assert len(ledger.instance_history()) == 200
+
+
+def test_flush_commits_now_and_torn_lines_are_dropped(tmp_path, capsys):
+    path = tmp_path / "predictions.jsonl"
+    path.write_text('{"instance_id": "a"}\n{"instance_id": "b", "predic')
+    with ResultsSink(interval=60) as sink:
+        sink.append(path, {"instance_id": "c"})
+        assert sink.flush(timeout=5)
+        assert [json.loads(line)["instance_id"] for line in path.read_text().splitlines()] == ["a", "c"]
+    assert "torn" in capsys.readouterr().out
+
+
+def test_write_errors_surface_on_close(tmp_path):
+    sink = ResultsSink(interval=0)
+    sink.append(tmp_path / "missing" / "predictions.jsonl", {"instance_id": "a"})
+    with pytest.raises(OSError):
+        sink.close()
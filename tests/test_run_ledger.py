@@ -0,0 +1,93 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils.run_ledger import RunLedger
+
+
+def _entry(name, status="pending", **extra):
+    entry = {
+        "timestamp": "2025-09-02 16:34:15",
+        "prediction_file": f"/tmp/predictions/{name}",
+        "evaluation_status": status,
+        "generation_score": 50.0,
+    }
+    entry.update(extra)
+    return entry
+
+
+def test_imports_legacy_log_incrementally(tmp_path):
+    log_file = tmp_path / "benchmark_scores.log"
+    log_file.write_text(json.dumps(_entry("predictions_1.jsonl")) + "\n")
+
+    ledger = RunLedger(log_file)
+    assert ledger.status("predictions_1.jsonl") == "pending"
+
+    with open(log_file, "a") as f:
+        f.write(json.dumps(_entry("predictions_2.jsonl", "completed")) + "\n")
+        f.write('{"partial": ')
+    assert [e["prediction_file"][-19:] for e in ledger.entries()] == [
+        "predictions_1.jsonl", "predictions_2.jsonl"
+    ]
+    assert ledger.status(tmp_path / "predictions_2.jsonl") == "completed"
+
+
+def test_rewritten_legacy_log_does_not_overwrite_ledger_updates(tmp_path):
+    log_file = tmp_path / "benchmark_scores.log"
+    log_file.write_text("".join(json.dumps(_entry(f"predictions_{n}.jsonl", notes="x" * 50)) + "\n"
+                                for n in (1, 2)))
+    ledger = RunLedger(log_file)
+    assert ledger.update("predictions_1.jsonl", {"evaluation_status": "completed", "evaluation_score": 40.0})
+
+    # An older checkout rewrites a shorter log with a stale entry and a new one.
+    log_file.write_text(json.dumps(_entry("predictions_1.jsonl")) + "\n"
+                        + json.dumps(_entry("predictions_3.jsonl")) + "\n")
+    assert ledger.get("predictions_1.jsonl")["evaluation_score"] == 40.0
+    assert ledger.status("predictions_1.jsonl") == "completed"
+    assert ledger.status("predictions_3.jsonl") == "pending"
+
+def test_update_is_keyed_by_prediction_file(tmp_path):
+    ledger = RunLedger(tmp_path / "benchmark_scores.log")
+    ledger.record(_entry("predictions_1.jsonl"))
+    ledger.record(_entry("predictions_2.jsonl"))
+
+    assert ledger.update("predictions_2.jsonl", {"evaluation_status": "completed",
+                                                "evaluation_score": 20.0})
+    assert not ledger.update("predictions_missing.jsonl", {"evaluation_status": "completed"})
+
+    entries = ledger.entries()
+    assert [e["evaluation_status"] for e in entries] == ["pending", "completed"]
+    assert entries[1]["evaluation_score"] == 20.0
+    assert entries[1]["generation_score"] == 50.0
+
+    out = tmp_path / "export.jsonl"
+    assert ledger.export_jsonl(out) == 2
+    assert json.loads(out.read_text().splitlines()[1])["evaluation_score"] == 20.0
+
+
+def test_missing_ledger_is_not_created_on_read(tmp_path):
+    ledger = RunLedger(tmp_path / "benchmark_scores.log")
+    assert ledger.status("predictions_1.jsonl") == "unknown"
+    assert ledger.entries() == []
+    assert not ledger.db_file.exists()
+
+
+def test_last_and_changes_since(tmp_path):
+    ledger = RunLedger(tmp_path / "benchmark_scores.log")
+    for i in range(5):
+        ledger.record(_entry(f"predictions_{i}.jsonl"))
+
+    assert [e["prediction_file"][-19:] for e in ledger.entries(last=2)] == [
+        "predictions_3.jsonl", "predictions_4.jsonl"
+    ]
+
+    rows, seq = ledger.snapshot(last=2)
+    assert len(rows) == 2
+    assert ledger.changes_since(seq) == ([], seq)
+
+    ledger.update("predictions_1.jsonl", {"evaluation_status": "completed"})
+    changes, new_seq = ledger.changes_since(seq)
+    assert new_seq > seq
+    assert [entry["evaluation_status"] for _, entry in changes] == ["completed"]
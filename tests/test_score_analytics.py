@@ -0,0 +1,54 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils.score_analytics import RunTable, grouped_stats, rolling_rates
+
+
+def _run(day, score, model="a", instances=10, status="completed"):
+    return {
+        "timestamp": f"2025-09-{day:02d} 12:00:00",
+        "num_instances": instances,
+        "generation_score": 80.0,
+        "evaluation_score": score,
+        "evaluation_status": status,
+        "model": model,
+    }
+
+
+def test_grouped_stats_pools_resolved_instances():
+    table = RunTable.from_entries([
+        _run(1, 20.0, "a"),
+        _run(2, 40.0, "a", instances=20),
+        _run(3, 50.0, "b"),
+        _run(4, None, "b", status="pending"),
+    ])
+
+    groups = {g["model"]: g for g in grouped_stats(table, "model", n_boot=200)}
+    assert groups["a"]["runs"] == 2
+    assert groups["a"]["resolved"] == 10 and groups["a"]["instances"] == 30
+    assert abs(groups["a"]["rate"] - 100 / 3) < 1e-9
+    assert groups["a"]["min_score"] == 20.0 and groups["a"]["max_score"] == 40.0
+    assert groups["a"]["ci_low"] <= groups["a"]["rate"] <= groups["a"]["ci_high"]
+    assert groups["b"]["runs"] == 1 and groups["b"]["rate"] == 50.0
+
+
+def test_single_run_groups_get_instance_level_intervals():
+    table = RunTable.from_entries([_run(1, 20.0, "opus"), _run(2, 0.0, "haiku")])
+
+    groups = {g["model"]: g for g in grouped_stats(table, "model", n_boot=500)}
+    opus, haiku = groups["opus"], groups["haiku"]
+    assert opus["runs"] == 1 and opus["ci_low"] < 20.0 < opus["ci_high"]
+    # About the binomial 95% interval for 2/10, not a zero-width [20.0, 20.0].
+    assert opus["ci_low"] < 10.0 and opus["ci_high"] > 40.0
+    assert haiku["ci_low"] < 1.0
+    assert haiku["ci_high"] > 10.0
+
+
+def test_rolling_rates_follow_timestamps():
+    table = RunTable.from_entries([_run(3, 30.0), _run(1, 10.0), _run(2, 20.0)])
+
+    rolling = rolling_rates(table, 2)
+    assert rolling["score"].tolist() == [10.0, 20.0, 30.0]
+    assert rolling["rate"].tolist() == [10.0, 15.0, 25.0]
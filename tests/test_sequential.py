@@ -0,0 +1,80 @@
+import os
+import stat
+import sys
+from collections import Counter
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import code_swe_agent
+from run_benchmark_with_eval import EnhancedBenchmarkRunner
+from utils import cli_probe, dataset_cache
+from utils.sequential import ConfidenceSequence, parse_half_width, stratified_order
+
+
+def test_parse_half_width():
+    assert parse_half_width("±3%") == pytest.approx(0.03)
+    assert parse_half_width("5") == pytest.approx(0.05)
+    assert parse_half_width("0.1") == pytest.approx(0.1)
+    with pytest.raises(ValueError):
+        parse_half_width("60%")
+
+
+def test_stratified_order_keeps_repo_mix_in_prefixes():
+    instances = ([{"instance_id": f"d{i}", "repo": "django"} for i in range(60)]
+                 + [{"instance_id": f"s{i}", "repo": "sympy"} for i in range(30)]
+                 + [{"instance_id": f"f{i}", "repo": "flask"} for i in range(10)])
+    order = stratified_order(instances, seed=7)
+
+    assert sorted(i["instance_id"] for i in order) == sorted(i["instance_id"] for i in instances)
+    assert order == stratified_order(instances, seed=7)
+    prefix = Counter(i["repo"] for i in order[:20])
+    assert abs(prefix["django"] - 12) <= 1 and abs(prefix["sympy"] - 6) <= 1
+    assert abs(prefix["flask"] - 2) <= 1
+
+
+def test_confidence_sequence_covers_and_narrows():
+    rng = np.random.default_rng(1)
+    misses = 0
+    for _ in range(50):
+        sequence = ConfidenceSequence(0.95)
+        outcomes = rng.random(300) < 0.3
+        covered = True
+        for start in range(0, 300, 10):
+            sequence.update(outcomes[start:start + 10])
+            low, high = sequence.interval()
+            covered &= low <= 0.3 <= high
+        misses += not covered
+    assert misses <= 5
+    assert sequence.half_width() < 0.1
+
+
+def test_run_until_ci_stops_at_target(tmp_path, monkeypatch):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    cli = bin_dir / "claude"
+    cli.write_text("#!/bin/sh\necho 1.0\n")
+    cli.chmod(cli.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("PATH", str(bin_dir) + os.pathsep + os.environ["PATH"])
+    monkeypatch.setenv(cli_probe.CACHE_ENV, str(tmp_path / "cache"))
+    monkeypatch.chdir(tmp_path)
+
+    instances = [{"instance_id": f"repo{i % 3}__{i}", "repo": f"repo{i % 3}"} for i in range(400)]
+    monkeypatch.setitem(dataset_cache._loaded, ("local", "test"), instances)
+    monkeypatch.setattr(code_swe_agent.CodeSWEAgent, "process_instance", lambda self, instance: {
+        "instance_id": instance["instance_id"], "model": "claude-code", "prediction": "diff",
+    })
+    runner = EnhancedBenchmarkRunner()
+    # Every instance resolved: the interval collapses towards 100% quickly.
+    monkeypatch.setattr(runner, "evaluate_batch", lambda predictions, *args, **kwargs:
+                        [p["instance_id"] for p in predictions])
+
+    result = runner.run_until_ci("local", 0.1, batch_size=5, seed=3)
+    assert result["target_reached"]
+    assert result["rate"] == 1.0
+    assert result["interval"][0] >= 0.8
+    assert result["evaluated"] < len(instances)
+    assert result["evaluated"] <= result["generated"] < len(instances)
+    assert runner.last_evaluation_report and os.path.exists(runner.last_evaluation_report)
@@ -0,0 +1,111 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils.sharding import assign_shards, load_shard_plan, merge_predictions, parse_shard, select_shard
+
+
+def test_parse_shard():
+    assert parse_shard("2/4") == (2, 4)
+    assert parse_shard(" 1 / 1 ") == (1, 1)
+    for bad in ("0/4", "5/4", "2", "a/b"):
+        with pytest.raises(ValueError):
+            parse_shard(bad)
+
+
+def test_shards_are_disjoint_deterministic_and_balanced():
+    instances = [{"instance_id": f"repo__repo-{n}"} for n in range(40)]
+    durations = {f"repo__repo-{n}": float(100 + 37 * (n % 7)) for n in range(30)}
+
+    # The default split depends on the IDs only.
+    shards = [select_shard(instances, i, 3) for i in (1, 2, 3)]
+    ids = [[x["instance_id"] for x in shard] for shard, _ in shards]
+    assert sorted(sum(ids, [])) == sorted(x["instance_id"] for x in instances)
+    assert len({plan for _, plan in shards}) == 1
+    sizes = [len(shard) for shard in ids]
+    assert max(sizes) - min(sizes) <= 1
+    # Shards keep the original order.
+    assert all(ids_ == sorted(ids_, key=lambda x: int(x.rsplit("-", 1)[1])) for ids_ in ids)
+
+    # The same partition whatever order the instances arrive in.
+    assert assign_shards(reversed([x["instance_id"] for x in instances]), 3, durations) == \
+        assign_shards([x["instance_id"] for x in instances], 3, durations)
+
+    default = 100 + 37 * 3  # median of the known durations
+    balanced = assign_shards([x["instance_id"] for x in instances], 3, durations)
+    loads = [sum(durations.get(i, default) for i, s in balanced.items() if s == shard) for shard in (1, 2, 3)]
+    assert max(loads) - min(loads) <= max(durations.values())
+
+
+def test_shard_plan_is_written_once_and_shared(tmp_path):
+    instances = [{"instance_id": f"i{n}"} for n in range(10)]
+    ids = [i["instance_id"] for i in instances]
+    path = str(tmp_path / "plan.json")
+    plan = load_shard_plan(path, ids, 2, lambda: {"i0": 500.0, "i1": 10.0})
+    # Another machine with a different history reads the same plan.
+    assert load_shard_plan(path, ids, 2, lambda: {"i1": 900.0}) == plan
+
+    first, fingerprint = select_shard(instances, 1, 2, plan)
+    second, other = select_shard(instances, 2, 2, plan)
+    assert fingerprint == other
+    assert sorted(i["instance_id"] for i in first + second) == sorted(ids)
+    assert {i["instance_id"] for i in first} == {i for i, s in plan["assignment"].items() if s == 1}
+
+    with pytest.raises(ValueError):
+        select_shard(instances, 1, 3, plan)
+    with pytest.raises(ValueError):
+        select_shard(instances + [{"instance_id": "new"}], 1, 2, plan)
+
+
+def _write(path, records):
+    path.write_text("".join(json.dumps(r) + "\n" for r in records))
+    return str(path)
+
+
+def test_merge_restores_dataset_order_and_reports_problems(tmp_path):
+    order = {f"i{n}": n for n in range(6)}
+    first = _write(tmp_path / "a.jsonl", [
+        {"instance_id": "i0", "prediction": "p0"},
+        {"instance_id": "i3", "prediction": "", "error": "boom"},
+        {"instance_id": "i4", "prediction": "p4"},
+    ])
+    second = _write(tmp_path / "b.jsonl", [
+        {"instance_id": "i1", "prediction": "p1"},
+        {"instance_id": "i3", "prediction": "p3"},
+    ])
+    output = tmp_path / "merged.jsonl"
+    report = merge_predictions([first, second], str(output), order, expected=list(order))
+
+    merged = [json.loads(line) for line in output.read_text().splitlines()]
+    assert [(p["instance_id"], p["prediction"]) for p in merged] == \
+        [("i0", "p0"), ("i1", "p1"), ("i3", "p3"), ("i4", "p4")]
+    assert report["ordered"] and report["written"] == 4
+    assert report["duplicates"] == {"i3": 2}
+    assert report["missing"] == ["i2", "i5"]
+
+    # Files out of dataset order are concatenated instead.
+    report = merge_predictions([second, first], str(output), {"i1": 5, "i3": 0, "i0": 1, "i4": 2})
+    assert not report["ordered"]
+    assert [json.loads(line)["instance_id"] for line in output.read_text().splitlines()] == \
+        ["i1", "i3", "i0", "i4"]
+
+
+def test_merge_checks_coverage_from_the_shard_stamps(tmp_path):
+    stamp = {"shard": "1/3", "plan": "abc", "instances": ["i0", "i1", "i2", "i3"]}
+    first = _write(tmp_path / "a.jsonl", [
+        {"instance_id": "i0", "prediction": "p0", "shard": stamp},
+        {"instance_id": "i3", "prediction": "p3", "shard": {"shard": "1/3", "plan": "abc"}},
+    ])
+    second = _write(tmp_path / "b.jsonl", [
+        {"instance_id": "i1", "prediction": "p1", "shard": dict(stamp, shard="2/3", plan="xyz")},
+    ])
+    output = tmp_path / "merged.jsonl"
+    report = merge_predictions([first, second], str(output))
+
+    assert report["missing"] == ["i2"]
+    assert report["shards"] == ["1/3", "2/3"] and report["plans"] == ["abc", "xyz"]
+    assert all("shard" not in json.loads(line) for line in output.read_text().splitlines())
@@ -18,3 +18,19 @@ def test_no_patches_generated(capsys):
     viewer.show_statistics(scores)
     captured = capsys.readouterr()
     assert "No patches generated; success rate unavailable." in captured.out
+
+
+def test_local_scores_are_only_shown_on_request(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    docker = {"timestamp": "t1", "prediction_file": "p1.jsonl", "evaluation_status": "completed",
+              "evaluation_score": 30.0}
+    local = {"timestamp": "t2", "prediction_file": "p2.jsonl", "evaluation_status": "pending",
+             "evaluation_score": None, "local_evaluation_score": 45.0}
+    viewer = ScoreViewer()
+    viewer.ledger.record(docker)
+    viewer.ledger.record(local)
+
+    assert [s["evaluation_score"] for s in viewer.load_scores()] == [30.0, None]
+    local_view = ScoreViewer(local=True).load_scores()
+    assert [(s["prediction_file"], s["evaluation_score"], s["evaluation_status"]) for s in local_view] == \
+        [("p2.jsonl", 45.0, "completed")]
@@ -0,0 +1,46 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+SWE_BENCH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "swe_bench.py"))
+
+# Lightweight subcommands must stay well clear of datasets/pyarrow imports.
+HEAVY_MODULES = ("datasets", "pyarrow", "pandas", "docker", "code_swe_agent",
+                 "run_benchmark_with_eval", "evaluate_predictions")
+
+
+def _loaded_modules(tmp_path, *argv):
+    probe = (
+        "import json, runpy, sys\n"
+        "sys.argv = %r\n"
+        "try:\n"
+        "    runpy.run_path(%r, run_name='__main__')\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        "sys.stderr.write(json.dumps(sorted(sys.modules)))\n"
+    ) % ([SWE_BENCH] + list(argv), SWE_BENCH)
+    result = subprocess.run([sys.executable, "-c", probe], cwd=tmp_path,
+                            capture_output=True, text=True)
+    return set(json.loads(result.stderr.strip().splitlines()[-1]))
+
+
+def test_light_subcommands_skip_heavy_imports(tmp_path):
+    for argv in (["scores"], ["check"], ["list-models"]):
+        loaded = _loaded_modules(tmp_path, *argv)
+        assert not loaded & set(HEAVY_MODULES), argv
+
+
+def test_group_by_choices_match_analytics(monkeypatch, capsys):
+    import swe_bench
+    from utils.score_analytics import CATEGORIES
+
+    monkeypatch.setattr(sys, "argv", ["swe_bench.py", "scores", "--group-by", "nonsense"])
+    with pytest.raises(SystemExit):
+        swe_bench.main()
+    choices = capsys.readouterr().err.split("choose from", 1)[1]
+    assert all(category in choices for category in CATEGORIES)
@@ -0,0 +1,85 @@
+import os
+import sys
+from collections import Counter
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils.outcome_matrix import OutcomeMatrix
+from utils.subset_builder import (SubsetBuilder, read_instance_file, select_by_ids,
+                                  write_instance_file)
+
+REGRESSION_SET = os.path.join(os.path.dirname(__file__), "..", "test_sets", "regression_tests.txt")
+
+
+def _dataset(rng):
+    repos = ["django"] * 60 + ["sympy"] * 30 + ["flask"] * 10
+    return [{
+        "instance_id": f"{repo}__{i}",
+        "repo": repo,
+        "problem_statement": "x" * int(rng.integers(100, 4000)),
+        "patch": "\n".join("+line" for _ in range(int(rng.integers(1, 40)))),
+    } for i, repo in enumerate(repos)]
+
+
+def test_subset_is_repo_proportional_without_history():
+    instances = _dataset(np.random.default_rng(0))
+    builder = SubsetBuilder(instances)
+
+    ids = builder.ids(builder.build(20))
+    counts = Counter(i.split("__")[0] for i in ids)
+    assert counts == {"django": 12, "sympy": 6, "flask": 2}
+    assert builder.validate(20) == {"runs": 0, "size": 20, "method": "stratified"}
+
+
+def test_difficulty_ignores_history_too_small_to_calibrate(tmp_path):
+    instances = _dataset(np.random.default_rng(2))
+    ids = [i["instance_id"] for i in instances]
+    matrix = OutcomeMatrix(tmp_path)
+    # One run covering only a few instances, all solved.
+    matrix.add_run("partial", ids[:5], ids[:5])
+
+    builder = SubsetBuilder(instances, matrix, min_coverage=0.0)
+    difficulty = builder.difficulty()
+    assert difficulty.min() == 0.0 and difficulty.max() == 1.0
+    np.testing.assert_array_equal(difficulty, SubsetBuilder(instances).difficulty())
+    size = np.log1p(builder.statement_len) / np.log1p(builder.statement_len).max() \
+        + np.log1p(builder.patch_lines) / np.log1p(builder.patch_lines).max()
+    assert difficulty[np.argmin(size)] == 1.0 and difficulty[np.argmax(size)] == 0.0
+
+
+def test_validation_against_past_full_runs(tmp_path):
+    rng = np.random.default_rng(1)
+    instances = _dataset(rng)
+    ease = rng.normal(0, 1.5, len(instances))
+    matrix = OutcomeMatrix(tmp_path)
+    ids = [i["instance_id"] for i in instances]
+    for run in range(6):
+        solved = rng.random(len(ids)) < 1 / (1 + np.exp(-(ease + rng.normal(-0.5, 0.5))))
+        matrix.add_run(f"run{run}", ids, [i for i, s in zip(ids, solved) if s])
+    # A partial run on another dataset is not a full run of this one.
+    matrix.add_run("other", ["other__1"], ["other__1"])
+
+    builder = SubsetBuilder(instances, matrix)
+    report = builder.validate(30)
+    assert report["runs"] == 6
+    assert report["refined_fit_mae"] <= report["stratified_fit_mae"]
+    assert report["method"] in ("stratified", "refined")
+    assert {"stratified_loo_mae", "refined_loo_mae", "first_n_mae"} <= set(report)
+    assert len(set(builder.build(30))) == 30
+
+
+def test_instance_files_round_trip(tmp_path):
+    regression = read_instance_file(REGRESSION_SET)
+    assert regression and all("__" in i and not i.startswith("#") for i in regression)
+
+    path = tmp_path / "subset.txt"
+    write_instance_file(path, ["a__1", "b__2"], ["header"])
+    assert read_instance_file(path) == ["a__1", "b__2"]
+
+    instances = [{"instance_id": "a__1"}, {"instance_id": "b__2"}]
+    assert select_by_ids(instances, ["b__2", "a__1"]) == instances[::-1]
+    with pytest.raises(ValueError, match="c__3"):
+        select_by_ids(instances, ["c__3"])
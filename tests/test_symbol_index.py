@@ -0,0 +1,114 @@
+import os
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils import cli_probe, commit_index, symbol_index
+from utils.commit_index import analyze_files, build_entries
+from utils.prompt_formatter import PromptFormatter
+from utils.symbol_index import LOOKUP_FILE, file_symbols, write_symbol_index
+
+MODELS = '''"""Models."""
+from . import fields
+from ..utils import text
+import os.path
+
+
+class Model:
+    class Meta:
+        ordering = []
+
+    def save(self):
+        def helper():
+            pass
+        return helper
+
+
+async def fetch():
+    pass
+'''
+
+
+def _git(repo, *args):
+    return subprocess.run(["git", *args], cwd=repo, check=True, capture_output=True, text=True).stdout.strip()
+
+
+def _commit(repo, files):
+    for path, text in files.items():
+        (repo / path).parent.mkdir(parents=True, exist_ok=True)
+        (repo / path).write_text(text)
+    _git(repo, "add", "-A")
+    _git(repo, "-c", "user.name=t", "-c", "user.email=t@t", "commit", "-qm", "c")
+    return _git(repo, "rev-parse", "HEAD")
+
+
+def test_file_symbols_lists_definitions_spans_and_imports(tmp_path):
+    (tmp_path / "pkg" / "db").mkdir(parents=True)
+    (tmp_path / "pkg" / "db" / "models.py").write_text(MODELS)
+    entry = file_symbols(str(tmp_path), "pkg/db/models.py")
+
+    assert entry["module"] == "pkg.db.models"
+    assert entry["defs"] == [
+        ["class", "pkg.db.models.Model", 7, 14],
+        ["class", "pkg.db.models.Model.Meta", 8, 9],
+        ["method", "pkg.db.models.Model.save", 11, 14],
+        ["def", "pkg.db.models.fetch", 17, 18],
+    ]
+    assert entry["imports"] == ["os.path", "pkg.db", "pkg.utils"]
+
+    (tmp_path / "old.py").write_text("print 'python 2'\n")
+    assert file_symbols(str(tmp_path), "old.py")["defs"] == []
+
+
+def test_lookup_file_is_cached_incremental_and_kept_out_of_the_patch(tmp_path, monkeypatch):
+    monkeypatch.setenv(cli_probe.CACHE_ENV, str(tmp_path / "cache"))
+    monkeypatch.setattr(symbol_index, "_recent", {})
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    _git(repo, "init", "-q")
+    first = _commit(repo, {"pkg/__init__.py": "", "pkg/db/models.py": MODELS})
+    second = _commit(repo, {"pkg/views.py": "def index(request):\n    return None\n"})
+
+    _git(repo, "checkout", "-q", first)
+    assert write_symbol_index(str(repo), "org/pkg", first) == LOOKUP_FILE
+    lines = (repo / LOOKUP_FILE).read_text().splitlines()
+    assert "pkg.db.models.Model.save\tmethod\tpkg/db/models.py:11-14" in lines
+    assert _git(repo, "status", "--porcelain") == ""
+
+    _git(repo, "checkout", "-q", second)
+    monkeypatch.setattr(symbol_index, "_recent", {})
+    analyzed = []
+    monkeypatch.setattr(symbol_index, "file_symbols",
+                        lambda r, p: analyzed.append(p) or file_symbols(r, p))
+    write_symbol_index(str(repo), "org/pkg", second, workers=1)
+    assert analyzed == ["pkg/views.py"]
+    assert "pkg.views.index\tdef\tpkg/views.py:1-2" in (repo / LOOKUP_FILE).read_text()
+    assert symbol_index.STORE.load("org/pkg", second) == build_entries(
+        str(repo), second, symbol_index.SOURCE_SUFFIXES, file_symbols)
+    assert _git(repo, "status", "--porcelain") == ""
+
+
+def test_process_pool_workers_are_spawned(tmp_path, monkeypatch):
+    (tmp_path / "a.py").write_text("def a():\n    pass\n")
+    (tmp_path / "b.py").write_text("class B:\n    pass\n")
+    monkeypatch.setattr(commit_index, "POOL_THRESHOLD", 1)
+    contexts = []
+    pool = commit_index.ProcessPoolExecutor
+    monkeypatch.setattr(commit_index, "ProcessPoolExecutor",
+                        lambda **kw: contexts.append(kw["mp_context"]) or pool(**kw))
+
+    entries = analyze_files(str(tmp_path), ["a.py", "b.py"], file_symbols, workers=2)
+    assert entries == {p: file_symbols(str(tmp_path), p) for p in ("a.py", "b.py")}
+    assert [c.get_start_method() for c in contexts] == ["spawn"]
+
+
+def test_prompt_leaves_out_navigation_without_an_index():
+    template = os.path.join(os.path.dirname(__file__), "..", "prompts", "swe_bench_prompt.txt")
+    formatter = PromptFormatter(template)
+    instance = {"instance_id": "org__pkg-1", "repo": "org/pkg", "problem_statement": "bug"}
+
+    assert f"grep -n \"QuerySet.filter\" {LOOKUP_FILE}" in formatter.format_issue(instance, symbol_index=LOOKUP_FILE)
+    prompt = formatter.format_issue(instance)
+    assert "NAVIGATION" not in prompt and "symbol index" not in prompt
+    assert "ISSUE DESCRIPTION:\nbug\n\nYOUR TASK:" in prompt
@@ -0,0 +1,58 @@
+import os
+import sys
+import urllib.request
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils import telemetry as telemetry_module
+from utils.run_ledger import RunLedger
+from utils.telemetry import RunTelemetry
+
+
+def test_textfile_metrics_and_history_eta(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(telemetry_module.time, "time", lambda: now[0])
+    textfile = tmp_path / "metrics" / "swebench.prom"
+
+    telemetry = RunTelemetry("run1", ["a", "b", "c"], "claude", textfile=textfile,
+                             history={"b": 100.0, "c": 300.0})
+    telemetry.write()
+    telemetry.start_instance("a")
+    now[0] += 60
+    telemetry.finish_instance("a", success=False)
+    with telemetry.phase("clone"):
+        pass
+
+    # Remaining instances use their own history rather than the run's mean
+    assert telemetry.eta_seconds() == 400.0
+
+    text = telemetry.render()
+    assert 'swebench_queue_depth{run="run1",backend="claude"} 2' in text
+    assert 'swebench_instances_total{run="run1",backend="claude",outcome="failed"} 1' in text
+    assert 'swebench_failure_ratio{run="run1",backend="claude"} 1.0000' in text
+    assert 'swebench_phase_seconds_count{run="run1",backend="claude",phase="clone"} 1' in text
+
+    telemetry.write()
+    assert textfile.read_text() == text
+    assert [p.name for p in textfile.parent.iterdir()] == ["swebench.prom"]
+
+
+def test_http_endpoint_serves_metrics():
+    telemetry = RunTelemetry("run2", ["a"], "codex", port=0)
+    telemetry.start()
+    try:
+        url = f"http://127.0.0.1:{telemetry.port}/metrics"
+        with urllib.request.urlopen(url, timeout=5) as response:
+            body = response.read().decode()
+        assert 'swebench_queue_depth{run="run2",backend="codex"} 1' in body
+    finally:
+        telemetry.stop()
+
+
+def test_ledger_instance_history(tmp_path):
+    ledger = RunLedger(tmp_path / "benchmark_scores.log")
+    ledger.record_instance("a", 10.0, "patch", "claude")
+    ledger.record_instance("a", 30.0, "empty", "claude")
+    ledger.record_instance("a", 99.0, "patch", "codex")
+
+    assert ledger.instance_durations(["a", "b"], "claude") == {"a": 20.0}
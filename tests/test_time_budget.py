@@ -0,0 +1,48 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils.run_ledger import RunLedger
+from utils.time_budget import TimeBudgets, repo_of, run_deadline
+
+
+def test_budget_prefers_instance_then_repo_then_backend():
+    history = [("django__django-1", "opus", 100.0, "patch")]
+    history += [(f"django__django-{i}", "opus", 200.0, "empty") for i in range(2, 7)]
+    history += [(f"sympy__sympy-{i}", "opus", 400.0, "patch") for i in range(5)]
+    history += [("flask__flask-1", "opus", 5000.0, "error")]  # errors don't count
+    budgets = TimeBudgets(history, percentile=50, margin=1.0, floor=10, ceiling=10000)
+
+    assert budgets.for_instance("django__django-1") == 100.0
+    assert budgets.for_instance("django__django-99") == 200.0
+    assert budgets.for_instance("flask__flask-1") == 200.0  # backend-wide median
+    assert repo_of("scikit-learn__scikit-learn-13439") == "scikit-learn__scikit-learn"
+
+
+def test_budget_model_preference_clamping_and_timeouts():
+    history = [("a__a-1", "opus", 100.0, "patch"), ("a__a-1", "sonnet", 900.0, "patch")]
+    assert TimeBudgets(history, model="opus", margin=1.0, floor=10).for_instance("a__a-1") == 100.0
+    assert TimeBudgets(history, percentile=50, margin=1.0).for_instance("a__a-1") == 500.0
+    assert TimeBudgets(history, percentile=100, margin=1.0, ceiling=600).for_instance("a__a-1") == 600.0
+    assert TimeBudgets(floor=120, default=60).for_instance("new__new-1") == 120.0
+
+    timed_out = history + [("a__a-1", "opus", 700.0, "timeout")]
+    budget, source = TimeBudgets(timed_out, percentile=50, margin=1.0).explain("a__a-1")
+    assert budget == pytest.approx(1050.0) and "timed out" in source
+    # A later completed session settles it again.
+    settled = timed_out + [("a__a-1", "opus", 300.0, "patch")]
+    assert TimeBudgets(settled, percentile=0, margin=1.0).for_instance("a__a-1") == 120.0
+
+
+def test_ledger_history_and_run_deadline(tmp_path):
+    ledger = RunLedger(tmp_path / "benchmark_scores.log")
+    ledger.record_instance("a__a-1", 30.0, "patch", backend="claude", model="opus")
+    ledger.record_instance("a__a-2", 40.0, "timeout", backend="codex")
+    assert ledger.instance_history("claude") == [("a__a-1", "opus", 30.0, "patch")]
+    assert len(ledger.instance_history()) == 2
+
+    assert run_deadline([100, 200], workers=1, overhead=0, slack=1.0) == 300
+    assert run_deadline([100, 200], workers=2, overhead=50, slack=1.0) == 200
@@ -0,0 +1,69 @@
+import json
+import os
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils import tracing
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def test_disabled_spans_are_free():
+    assert not tracing.enabled()
+    assert tracing.span("clone") is tracing.span("cli")
+
+
+def test_session_merges_child_processes(tmp_path):
+    output = tmp_path / "trace.json"
+    child = (
+        "import sys; sys.path.insert(0, %r)\n"
+        "from utils import tracing\n"
+        "tracing.init_from_env('child')\n"
+        "with tracing.span('instance', instance_id='x'):\n"
+        "    with tracing.span('cli'):\n"
+        "        pass\n"
+    ) % ROOT
+
+    with tracing.session(str(output), "parent"):
+        with tracing.span("generation"):
+            subprocess.run([sys.executable, "-c", child], check=True)
+
+    assert not tracing.enabled()
+    assert not (tmp_path / "trace.json.parts").exists()
+    events = json.loads(output.read_text())["traceEvents"]
+    spans = {e["name"]: e for e in events if e["ph"] == "X"}
+    assert set(spans) == {"parent", "generation", "instance", "cli"}
+    assert spans["generation"]["pid"] == os.getpid()
+    assert spans["cli"]["pid"] == spans["instance"]["pid"] != os.getpid()
+    # Nested spans lie within their parents
+    assert spans["instance"]["ts"] <= spans["cli"]["ts"]
+    assert spans["cli"]["ts"] + spans["cli"]["dur"] <= spans["instance"]["ts"] + spans["instance"]["dur"]
+    names = [e["args"]["name"] for e in events if e["name"] == "process_name"]
+    assert any(n.startswith("parent") for n in names) and any(n.startswith("child") for n in names)
+
+
+def test_harness_events_from_logs(tmp_path):
+    run_dir = tmp_path / "logs" / "run_evaluation" / "run1" / "claude-code"
+    logs = {
+        "a": ["2025-09-02 10:00:00,000 - INFO - Creating container for a...",
+              "2025-09-02 10:00:05,000 - INFO - Container for a started: 1",
+              "2025-09-02 10:00:06,000 - INFO - Eval script for a written to eval.sh",
+              "2025-09-02 10:01:00,000 - INFO - Grading answer for a...",
+              "2025-09-02 10:01:02,000 - INFO - report"],
+        "b": ["2025-09-02 10:00:30,000 - INFO - Creating container for b...",
+              "2025-09-02 10:00:40,000 - INFO - done"],
+    }
+    for instance_id, lines in logs.items():
+        (run_dir / instance_id).mkdir(parents=True)
+        (run_dir / instance_id / "run_instance.log").write_text("\n".join(lines) + "\n")
+
+    events = tracing.harness_events(tmp_path, "run1")
+    spans = [e for e in events if e["ph"] == "X"]
+    evals = {e["name"]: e for e in spans if e["name"].startswith("eval ")}
+    assert evals["eval a"]["dur"] == 62_000_000
+    # b overlaps a, so it runs on a second worker track
+    assert evals["eval a"]["tid"] != evals["eval b"]["tid"]
+    stages = [e["name"] for e in spans if e["tid"] == evals["eval a"]["tid"] and not e["name"].startswith("eval ")]
+    assert stages == ["create container", "apply patch", "run tests", "grade"]
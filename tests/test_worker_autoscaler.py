@@ -0,0 +1,42 @@
+import os
+import sys
+import argparse
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils import worker_autoscaler
+from utils.worker_autoscaler import AUTO, WorkerAutoscaler, parse_max_workers, parse_size
+
+
+def test_parse_max_workers():
+    assert parse_max_workers("auto") == AUTO
+    assert parse_max_workers("AUTO") == AUTO
+    assert parse_max_workers("4") == 4
+    with pytest.raises(argparse.ArgumentTypeError):
+        parse_max_workers("0")
+    with pytest.raises(argparse.ArgumentTypeError):
+        parse_max_workers("lots")
+
+
+def test_parse_docker_sizes():
+    assert parse_size("512MiB") == 512 * 1024 ** 2
+    assert parse_size("1.5GiB") == int(1.5 * 1024 ** 3)
+    assert parse_size("0B") == 0
+    assert parse_size("200G") == 200 * 1024 ** 3
+
+
+def test_recommend_respects_tightest_limit(monkeypatch, tmp_path):
+    monkeypatch.setattr(worker_autoscaler, "docker_root_dir", lambda: tmp_path)
+    monkeypatch.setattr(worker_autoscaler, "cpu_limit", lambda: 64.0)
+    monkeypatch.setattr(worker_autoscaler.os, "getloadavg", lambda: (0.0, 0.0, 0.0))
+    monkeypatch.setattr(worker_autoscaler, "free_disk", lambda path: 1000 * worker_autoscaler.GIB)
+    monkeypatch.setattr(worker_autoscaler, "available_memory", lambda: 14 * worker_autoscaler.GIB)
+
+    autoscaler = WorkerAutoscaler()
+    # (14 - 2) GiB / 3 GiB per container
+    assert autoscaler.recommend() == 4
+
+    # Larger observed containers shrink the pool on the next wave.
+    autoscaler.observed_peak = 4 * worker_autoscaler.GIB
+    assert autoscaler.recommend() == 2
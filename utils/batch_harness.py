@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""Evaluate the predictions of several runs in one harness process.
+
+``swebench.harness.run_evaluation`` keys predictions by instance ID, so one
+invocation can only grade one prediction per instance, and evaluating five
+prediction files meant five invocations, five worker-pool warm-ups and five
+image checks, each ending with a tail of idle workers. This script reads a
+batch file whose rows carry their own ``run_id`` and model, prepares the
+images once, grades every row in one shared worker pool, and then writes
+the usual ``<model>.<run_id>.json`` report for each run.
+
+With ``--reuse_containers``, the candidates for one instance (one per run)
+share a container: each patch is applied, the tests are run and graded,
+and the tree is reset to its pristine state before the next candidate.
+Each candidate's logs and report land where ``run_instance`` would have put
+them, so the per-run reports are unchanged. If the tree cannot be restored,
+the remaining candidates get a fresh container.
+
+With ``--executor local``, no Docker daemon is used: each row is graded by
+``utils.local_executor.LocalExecutor`` in a cached local environment, with
+the same log layout and reports.
+
+It is started by ``utils.evaluation_harness.execute_batch_evaluation`` with
+the report directory as its working directory (the harness writes its logs
+relative to it), and only needs swebench (plus this repository for the
+local executor).
+"""
+
+import argparse
+import inspect
+import json
+import platform
+import sys
+from collections import OrderedDict
+from pathlib import Path, PurePosixPath
+from typing import Dict, List
+
+try:  # swebench >= 4 moved make_test_spec around
+    from swebench.harness.utils import make_test_spec
+except ImportError:
+    from swebench.harness.test_spec.test_spec import make_test_spec
+from swebench.harness.reporting import make_run_report
+from swebench.harness.run_evaluation import run_instance
+from swebench.harness.utils import load_swebench_dataset, run_threadpool
+
+
+def read_batch(path: str) -> "OrderedDict[str, List[Dict]]":
+    """Rows of the batch file grouped by run ID, in file order."""
+    runs: "OrderedDict[str, List[Dict]]" = OrderedDict()
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                runs.setdefault(row["run_id"], []).append(row)
+    return runs
+
+
+def _prepare_images(client, instances: List[Dict], max_workers: int):
+    """Build the environment images once for the whole batch (older harness versions only)."""
+    try:
+        from swebench.harness.docker_build import build_env_images
+    except ImportError:
+        return  # images are pre-built and pulled on demand
+    build_env_images(client, instances, False, max_workers)
+
+
+def _run_instance_kwargs(keep_images: bool = False) -> Dict:
+    """Image policy arguments for older harness versions, which require them.
+
+    As with ``--cache_level env``, instance images are removed after use
+    unless an image budget manages the cache (``keep_images``).
+    """
+    parameters = inspect.signature(run_instance).parameters
+    policy = {"rm_image": not keep_images, "force_rebuild": False}
+    return {name: value for name, value in policy.items() if name in parameters}
+
+
+def _log_dir(row: Dict, instance_id: str) -> Path:
+    """Where ``run_instance`` keeps a row's logs and report."""
+    from swebench.harness.constants import RUN_EVALUATION_LOG_DIR
+
+    return (RUN_EVALUATION_LOG_DIR / row["run_id"]
+            / row.get("model_name_or_path", "None").replace("/", "__") / instance_id)
+
+
+def _git(container, command: str):
+    from swebench.harness.run_evaluation import CONTAINER_USER, CONTAINER_WORKDIR
+
+    result = container.exec_run(["/bin/bash", "-c", command], workdir=CONTAINER_WORKDIR, user=CONTAINER_USER)
+    return result.exit_code, result.output.decode("utf-8", errors="replace")
+
+
+def _apply_patch(container, patch_file, logger) -> bool:
+    """Apply the candidate the way ``run_instance`` does; True if it applied."""
+    from swebench.harness.constants import APPLY_PATCH_FAIL, APPLY_PATCH_PASS, CONTAINER_PATCH_FILE
+    from swebench.harness.docker_utils import copy_to_container
+    from swebench.harness.run_evaluation import GIT_APPLY_CMDS
+
+    copy_to_container(container, patch_file, PurePosixPath(CONTAINER_PATCH_FILE))
+    output = ""
+    for attempt, command in enumerate(GIT_APPLY_CMDS):
+        if attempt:
+            _git(container, "git checkout -- . ; git clean -fd")
+        code, output = _git(container, f"{command} {CONTAINER_PATCH_FILE}")
+        if code == 0:
+            logger.info(f"{APPLY_PATCH_PASS}:\n{output}")
+            return True
+        logger.info(f"Failed to apply patch to container: {command}")
+    if _git(container, f"git apply --check --reverse {CONTAINER_PATCH_FILE}")[0] == 0:
+        logger.info(f"{APPLY_PATCH_PASS}: verified already applied")
+        return True
+    logger.info(f"{APPLY_PATCH_FAIL}:\n{output}")
+    return False
+
+
+def run_candidates(test_spec, rows: List[Dict], client, timeout: int) -> Dict[str, bool]:
+    """Grade several candidate patches for one instance in one warm container.
+
+    Returns {run_id: resolved} for the candidates that produced a report.
+    Uses harness internals of swebench 5, imported here so that the default
+    mode keeps working with older harness versions.
+    """
+    from swebench.harness.constants import LOG_INSTANCE, LOG_REPORT, LOG_TEST_OUTPUT
+    from swebench.harness.docker_utils import cleanup_container, copy_to_container, exec_run_with_timeout
+    from swebench.harness.grading import get_eval_report
+    from swebench.harness.run_evaluation import create_container
+    from swebench.logger import close_logger, setup_logger
+
+    instance_id = test_spec.instance_id
+    container = pristine = None
+    results = {}
+    for row in rows:
+        log_dir = _log_dir(row, instance_id)
+        report_path = log_dir / LOG_REPORT
+        if report_path.exists():
+            results[row["run_id"]] = json.loads(report_path.read_text())[instance_id]["resolved"]
+            continue
+        logger = setup_logger(instance_id, log_dir / LOG_INSTANCE)
+        try:
+            if container is None:
+                container = create_container(test_spec, client, f"{rows[0]['run_id']}.warm", logger)
+                container.start()
+                pristine = _git(container, "git status --porcelain")[1]
+                logger.info(f"Warm container for {instance_id} started: {container.id}")
+            else:
+                logger.info(f"Reusing warm container {container.name} for {instance_id}")
+
+            patch_file = Path(log_dir / "patch.diff")
+            patch_file.write_text(row["model_patch"] or "")
+            if not _apply_patch(container, patch_file, logger):
+                continue
+            eval_file = Path(log_dir / "eval.sh")
+            eval_file.write_text(test_spec.eval_script)
+            copy_to_container(container, eval_file, PurePosixPath("/eval.sh"))
+            test_output, timed_out, runtime = exec_run_with_timeout(container, "/bin/bash /eval.sh", timeout)
+            logger.info(f"Test runtime: {runtime:_.2f} seconds")
+            test_output_path = log_dir / LOG_TEST_OUTPUT
+            with open(test_output_path, "w") as f:
+                f.write(test_output)
+                if timed_out:
+                    f.write(f"\n\nTimeout error: {timeout} seconds exceeded.")
+                    logger.info(f"Test timed out after {timeout} seconds.")
+                    continue
+            report = get_eval_report(test_spec=test_spec, prediction=row,
+                                     test_log_path=test_output_path, include_tests_status=True)
+            report_path.write_text(json.dumps(report, indent=4))
+            results[row["run_id"]] = report[instance_id]["resolved"]
+            logger.info(f"Result for {instance_id}: resolved: {results[row['run_id']]}")
+        except Exception as e:
+            logger.error(f"Error in evaluating model for {instance_id}: {e}")
+            cleanup_container(client, container, logger)
+            container = None
+        finally:
+            if container is not None:
+                # Back to the pristine tree for the next candidate.
+                _git(container, "git reset --hard HEAD && git clean -fd")
+                if _git(container, "git status --porcelain")[1] != pristine:
+                    logger.info("Could not restore the pristine tree; the next candidate gets a new container")
+                    cleanup_container(client, container, logger)
+                    container = None
+            close_logger(logger)
+    if container is not None:
+        cleanup_container(client, container, None)
+    return results
+
+
+def run_local(executor, instance: Dict, test_spec, rows: List[Dict], timeout: int) -> Dict[str, bool]:
+    """Grade candidates with the local executor; returns {run_id: resolved} like ``run_candidates``."""
+    from swebench.harness.constants import LOG_REPORT
+
+    results = {}
+    for row in rows:
+        log_dir = _log_dir(row, instance["instance_id"])
+        if (log_dir / LOG_REPORT).exists():
+            report = json.loads((log_dir / LOG_REPORT).read_text())
+        else:
+            report = executor.run(instance, test_spec, row, log_dir, timeout)
+        if report:
+            results[row["run_id"]] = report[instance["instance_id"]]["resolved"]
+    return results
+
+
+def main(batch: str, dataset_name: str, split: str, max_workers: int, timeout: int,
+         open_file_limit: int = 4096, reuse_containers: bool = False, executor: str = "docker",
+         keep_images: bool = False):
+    runs = read_batch(batch)
+    wanted = {row["instance_id"] for rows in runs.values() for row in rows}
+    dataset = {i["instance_id"]: i for i in load_swebench_dataset(dataset_name, split, list(wanted))}
+    unknown = wanted - set(dataset)
+    if unknown:
+        raise ValueError(f"Prediction IDs not found in {dataset_name}: {' '.join(sorted(unknown))}")
+
+    if platform.system() == "Linux":
+        import resource
+        resource.setrlimit(resource.RLIMIT_NOFILE, (open_file_limit, open_file_limit))
+    specs = {instance_id: make_test_spec(dataset[instance_id]) for instance_id in sorted(wanted)}
+    local = client = None
+    if executor == "local":
+        sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+        from utils.local_executor import LocalExecutor, missing_env_specs
+
+        local = LocalExecutor()
+        missing = missing_env_specs([dataset[i] for i in wanted], local.specs)
+        if missing:
+            raise ValueError(f"No local environment spec for: {', '.join(missing)} (add them to local_envs.json)")
+        reuse_containers = False
+    else:
+        import docker
+
+        client = docker.from_env()
+        _prepare_images(client, [dataset[i] for i in sorted(wanted)], max_workers)
+
+    extra = _run_instance_kwargs(keep_images)
+    candidates: Dict[str, List[Dict]] = {}
+    for rows in runs.values():
+        for row in rows:
+            if row.get("model_patch"):
+                candidates.setdefault(row["instance_id"], []).append(row)
+    payloads = []
+    for instance_id in sorted(candidates):
+        # Multimodal instances stage binary assets per candidate; they keep run_instance.
+        if reuse_containers and len(candidates[instance_id]) > 1 and \
+                not getattr(specs[instance_id], "image_assets", None):
+            payloads.append((instance_id, candidates[instance_id]))
+        else:
+            # Rows of the same instance run back to back, while its image is warm.
+            payloads.extend((instance_id, [row]) for row in candidates[instance_id])
+    print(f"Running {sum(len(rows) for rows in candidates.values())} predictions from {len(runs)} run(s) "
+          f"on {len(wanted)} instances with {max_workers} workers"
+          + (f" ({sum(len(p[1]) > 1 for p in payloads)} warm containers)" if reuse_containers else "")
+          + (" in local environments" if local else "") + "...")
+
+    def grade(instance_id, rows):
+        if local:
+            return run_local(local, dataset[instance_id], specs[instance_id], rows, timeout)
+        if len(rows) > 1:
+            return run_candidates(specs[instance_id], rows, client, timeout)
+        return run_instance(test_spec=specs[instance_id], pred=rows[0], client=client,
+                            run_id=rows[0]["run_id"], timeout=timeout, **extra)
+
+    run_threadpool(grade, payloads, max_workers)
+    print("All instances run.")
+
+    for run_id, rows in runs.items():
+        predictions = {row["instance_id"]: row for row in rows}
+        # Each run is scored against its own instances, as with --instance_ids.
+        make_run_report(predictions, [dataset[i] for i in predictions], run_id, client)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate a batch of runs in one harness process")
+    parser.add_argument("--batch", required=True, help="JSONL rows with run_id, instance_id, "
+                                                       "model_name_or_path and model_patch")
+    parser.add_argument("--dataset_name", default="princeton-nlp/SWE-bench_Lite")
+    parser.add_argument("--split", default="test")
+    parser.add_argument("--max_workers", type=int, default=2)
+    parser.add_argument("--timeout", type=int, default=600)
+    parser.add_argument("--open_file_limit", type=int, default=4096)
+    parser.add_argument("--reuse_containers", action="store_true",
+                        help="Grade all candidates for an instance in one container, resetting the tree between them")
+    parser.add_argument("--keep_images", action="store_true",
+                        help="Keep instance images after use (an image budget manages them)")
+    parser.add_argument("--executor", choices=["docker", "local"], default="docker",
+                        help="Run the tests in Docker containers or in cached local environments")
+    main(**vars(parser.parse_args()))
@@ -1,9 +1,10 @@
-import os
 import json
-import subprocess
 from typing import Dict, List, Optional
 from dotenv import load_dotenv
 
+from utils.cli_probe import require_cli
+from utils.cli_session import DEFAULT_IDLE_TIMEOUT, run_cli_session
+
 load_dotenv()
 
 class ClaudeCodeInterface:
@@ -11,74 +12,29 @@ class ClaudeCodeInterface:
 
     def __init__(self):
         """Ensure the Claude CLI is available on the system."""
-        try:
-            result = subprocess.run([
-                "claude", "--version"
-            ], capture_output=True, text=True)
-            if result.returncode != 0:
-                raise RuntimeError(
-                    "Claude CLI not found. Please ensure 'claude' is installed and in PATH"
-                )
-        except FileNotFoundError:
-            raise RuntimeError(
-                "Claude CLI not found. Please ensure 'claude' is installed and in PATH"
-            )
+        require_cli("claude", "Claude")
 
-    def execute_code_cli(self, prompt: str, cwd: str, model: str = None) -> Dict[str, any]:
+    def execute_code_cli(self, prompt: str, cwd: str, model: str = None,
+                         timeout: float = 600,
+                         idle_timeout: Optional[float] = DEFAULT_IDLE_TIMEOUT,
+                         transcript: Optional[str] = None) -> Dict[str, any]:
         """Execute Claude Code via CLI and capture the response.
 
         Args:
             prompt: The prompt to send to Claude.
             cwd: Working directory to execute in.
             model: Optional model to use (e.g., 'opus-4.1', 'sonnet-3.7').
+            timeout: Seconds the session may run before it is killed.
+            idle_timeout: Seconds without output or workspace edits before the
+                session is treated as stalled and ended (None disables).
+            transcript: Path prefix for the full stdout/stderr logs; the
+                result itself only holds a bounded excerpt of each.
         """
-        try:
-            # Save the current directory
-            original_cwd = os.getcwd()
-
-            # Change to the working directory
-            os.chdir(cwd)
-
-            # Build command with optional model parameter
-            cmd = ["claude", "--dangerously-skip-permissions"]
-            if model:
-                cmd.extend(["--model", model])
-
-            # Execute claude command with the prompt via stdin
-            result = subprocess.run(
-                cmd,
-                input=prompt,
-                capture_output=True,
-                text=True,
-                timeout=600,  # 10 minute timeout
-            )
-
-            # Restore original directory
-            os.chdir(original_cwd)
-
-            return {
-                "success": result.returncode == 0,
-                "stdout": result.stdout,
-                "stderr": result.stderr,
-                "returncode": result.returncode,
-            }
-
-        except subprocess.TimeoutExpired:
-            os.chdir(original_cwd)
-            return {
-                "success": False,
-                "stdout": "",
-                "stderr": "Command timed out after 10 minutes",
-                "returncode": -1,
-            }
-        except Exception as e:
-            os.chdir(original_cwd)
-            return {
-                "success": False,
-                "stdout": "",
-                "stderr": str(e),
-                "returncode": -1,
-            }
+        cmd = ["claude", "--dangerously-skip-permissions"]
+        if model:
+            cmd.extend(["--model", model])
+        return run_cli_session(cmd, prompt, cwd, timeout=timeout, idle_timeout=idle_timeout,
+                               transcript=transcript)
 
     def extract_file_changes(self, response: str) -> List[Dict[str, str]]:
         """Extract file changes from Claude's response."""
@@ -0,0 +1,94 @@
+"""Cached availability checks for the code model CLIs.
+
+Every interface used to run ``<cli> --version`` when constructed, and the
+agent ran it once more before that, so each start paid for launching the
+CLI (a Node.js process for claude/codex/gemini) several times. Probe
+results are cached in memory and on disk, keyed by the resolved binary
+path together with its size and mtime, so an upgraded or replaced CLI is
+re-probed automatically.
+"""
+
+import json
+import os
+import shutil
+import subprocess
+from pathlib import Path
+from typing import Dict, Optional
+
+CACHE_ENV = "SWE_BENCH_CACHE_DIR"
+
+_memory: Dict[str, Dict] = {}
+
+
+def cache_dir() -> Path:
+    """Cache directory shared by the tools (``$SWE_BENCH_CACHE_DIR`` or the XDG cache directory)."""
+    base = os.environ.get(CACHE_ENV)
+    if not base:
+        xdg = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+        base = os.path.join(xdg, "swe_bench")
+    return Path(base)
+
+
+def cache_file() -> Path:
+    """Probe cache location, inside ``cache_dir()``."""
+    return cache_dir() / "cli_probes.json"
+
+
+def _load() -> Dict[str, Dict]:
+    try:
+        with open(cache_file()) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save(cache: Dict[str, Dict]):
+    path = cache_file()
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = path.with_name(path.name + f".{os.getpid()}.tmp")
+        with open(tmp_file, "w") as f:
+            json.dump(cache, f, indent=2)
+        os.replace(tmp_file, path)
+    except OSError:
+        pass  # caching is best effort
+
+
+def probe_cli(command: str) -> Optional[str]:
+    """Version string reported by ``command --version``, or None if it is unavailable."""
+    path = shutil.which(command)
+    if not path:
+        return None
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    key = os.path.realpath(path)
+    fingerprint = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+    entry = _memory.get(key)
+    if entry is None or entry["fingerprint"] != fingerprint:
+        cache = _load()
+        entry = cache.get(key)
+        if entry is None or entry.get("fingerprint") != fingerprint:
+            try:
+                result = subprocess.run([path, "--version"], capture_output=True,
+                                        text=True, timeout=60)
+                ok = result.returncode == 0
+                version = (result.stdout or result.stderr).strip() if ok else None
+            except (OSError, subprocess.TimeoutExpired):
+                ok, version = False, None
+            entry = {"fingerprint": fingerprint, "ok": ok, "version": version}
+            cache[key] = entry
+            _save(cache)
+        _memory[key] = entry
+
+    return (entry.get("version") or command) if entry.get("ok") else None
+
+
+def require_cli(command: str, display_name: str):
+    """Raise RuntimeError unless ``command`` is installed and answers ``--version``."""
+    if probe_cli(command) is None:
+        raise RuntimeError(
+            f"{display_name} CLI not found. Please ensure '{command}' is installed and in PATH"
+        )
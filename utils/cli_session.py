@@ -0,0 +1,249 @@
+"""Run a code model CLI session under a stall watchdog.
+
+Sessions sometimes hang - on an interactive prompt, a test run that never
+finishes, a wedged network call - and used to hold their slot until the
+hard timeout. ``run_cli_session`` runs the CLI in its own process group and
+watches two activity signals: bytes on its stdout/stderr, and changes to the
+files in the workspace (periodic stat snapshots of the tree, ``.git``
+excluded). When neither has moved for ``idle_timeout`` seconds the whole
+process group is killed and the result is marked ``stalled``, so the caller
+can salvage whatever diff the session already made.
+
+Some CLIs only print once they finish, so the idle window should be long
+enough to cover an agent reading code without editing anything.
+
+Output is never held in memory as a whole: each stream's raw bytes go
+straight to a transcript file (when a path is given) and only a bounded
+head and tail of it are kept for error messages.
+"""
+
+import os
+import signal
+import subprocess
+import threading
+import time
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+DEFAULT_IDLE_TIMEOUT = 300.0
+POLL_INTERVAL = 5.0
+# Bytes of each stream kept in memory from its start and from its end.
+EXCERPT_BYTES = 8192
+
+
+def workspace_state(root: str) -> Tuple[int, int, int]:
+    """(file count, newest mtime in ns, total size) of the tree under ``root``, skipping ``.git``."""
+    count = newest = total = 0
+    stack = [root]
+    while stack:
+        path = stack.pop()
+        try:
+            entries = os.scandir(path)
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name != ".git":
+                            stack.append(entry.path)
+                        continue
+                    stat = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                count += 1
+                total += stat.st_size
+                newest = max(newest, stat.st_mtime_ns)
+    return count, newest, total
+
+
+def _session_kwargs() -> dict:
+    """Popen arguments that put the CLI and its children in their own process group."""
+    if os.name == "nt":
+        return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {"start_new_session": True}
+
+
+def _kill(process: subprocess.Popen):
+    """Kill the session and anything it started (test runners, servers, ...)."""
+    try:
+        if os.name == "nt":
+            process.kill()
+        else:
+            os.killpg(process.pid, signal.SIGKILL)
+    except OSError:
+        pass
+
+
+class _Activity:
+    def __init__(self):
+        self.last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def touch(self):
+        with self._lock:
+            self.last = time.monotonic()
+
+    def idle(self) -> float:
+        with self._lock:
+            return time.monotonic() - self.last
+
+
+class Transcript:
+    """One output stream of a session: written through to a file, head and tail kept in memory."""
+
+    def __init__(self, path: Optional[Path] = None, excerpt_bytes: int = EXCERPT_BYTES):
+        self.path = Path(path) if path else None
+        self.excerpt_bytes = excerpt_bytes
+        self.size = 0
+        self._head = bytearray()
+        self._tail = bytearray()
+        self._file = open(self.path, "wb") if self.path else None
+
+    def write(self, chunk: bytes):
+        if self._file:
+            self._file.write(chunk)
+        self.size += len(chunk)
+        room = self.excerpt_bytes - len(self._head)
+        if room > 0:
+            self._head += chunk[:room]
+            chunk = chunk[room:]
+        if chunk:
+            self._tail += chunk
+            if len(self._tail) > self.excerpt_bytes:
+                del self._tail[:len(self._tail) - self.excerpt_bytes]
+
+    def close(self):
+        f, self._file = self._file, None
+        if f:
+            f.close()
+
+    @property
+    def truncated(self) -> bool:
+        return self.size > len(self._head) + len(self._tail)
+
+    def excerpt(self) -> str:
+        """The whole stream when it fits in the excerpt, else its head and tail."""
+        head = self._head.decode("utf-8", errors="replace")
+        tail = self._tail.decode("utf-8", errors="replace")
+        if not self.truncated:
+            return head + tail
+        omitted = self.size - len(self._head) - len(self._tail)
+        where = f", full transcript in {self.path}" if self.path else ""
+        return f"{head}\n... [{omitted} bytes omitted{where}] ...\n{tail}"
+
+    def open(self) -> BinaryIO:
+        """Read the full transcript back (only when it was written to a file)."""
+        if not self.path:
+            raise ValueError("transcript was not written to a file")
+        return open(self.path, "rb")
+
+
+def _pump(stream, transcript: Transcript, activity: _Activity):
+    try:
+        while True:
+            chunk = stream.read1(65536)
+            if not chunk:
+                break
+            transcript.write(chunk)
+            activity.touch()
+    finally:
+        stream.close()
+
+
+def _feed(stream, data: bytes):
+    try:
+        stream.write(data)
+    except (BrokenPipeError, OSError):
+        pass
+    finally:
+        try:
+            stream.close()
+        except OSError:
+            pass
+
+
+def run_cli_session(cmd: List[str], prompt: str, cwd: str, timeout: float = 600,
+                    idle_timeout: Optional[float] = DEFAULT_IDLE_TIMEOUT,
+                    poll_interval: float = POLL_INTERVAL,
+                    transcript: Optional[str] = None) -> Dict[str, any]:
+    """Run ``cmd`` in ``cwd`` with ``prompt`` on stdin, ending it early if it stalls.
+
+    Returns the same fields the interfaces always returned (success, stdout,
+    stderr, returncode) plus ``timed_out``, ``stalled`` and ``seconds``.
+    ``stdout``/``stderr`` are bounded excerpts; with ``transcript`` set the
+    full streams are written to ``<transcript>.stdout.log`` and
+    ``<transcript>.stderr.log``, named in ``stdout_file``/``stderr_file``.
+    ``idle_timeout`` of None or 0 disables stall detection.
+    """
+    start = time.monotonic()
+    try:
+        process = subprocess.Popen(
+            cmd, cwd=cwd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE, **_session_kwargs(),
+        )
+    except OSError as e:
+        return {"success": False, "stdout": "", "stderr": str(e), "returncode": -1,
+                "timed_out": False, "stalled": False, "seconds": 0.0}
+
+    activity = _Activity()
+    stdout = Transcript(f"{transcript}.stdout.log" if transcript else None)
+    stderr = Transcript(f"{transcript}.stderr.log" if transcript else None)
+    threads = [
+        threading.Thread(target=_feed, args=(process.stdin, prompt.encode("utf-8")), daemon=True),
+        threading.Thread(target=_pump, args=(process.stdout, stdout, activity), daemon=True),
+        threading.Thread(target=_pump, args=(process.stderr, stderr, activity), daemon=True),
+    ]
+    for thread in threads:
+        thread.start()
+
+    watch = bool(idle_timeout)
+    snapshot = workspace_state(cwd) if watch else None
+    timed_out = stalled = False
+    while True:
+        try:
+            process.wait(timeout=poll_interval)
+            break
+        except subprocess.TimeoutExpired:
+            pass
+        if time.monotonic() - start >= timeout:
+            timed_out = True
+            _kill(process)
+            break
+        if watch:
+            state = workspace_state(cwd)
+            if state != snapshot:
+                snapshot = state
+                activity.touch()
+            if activity.idle() >= idle_timeout:
+                stalled = True
+                _kill(process)
+                break
+
+    process.wait()
+    for thread in threads[1:]:
+        thread.join(timeout=5)
+    stdout.close()
+    stderr.close()
+
+    out = stdout.excerpt()
+    err = stderr.excerpt()
+    seconds = time.monotonic() - start
+    if timed_out:
+        err += f"\nCommand timed out after {timeout:.0f} seconds"
+    elif stalled:
+        err += (f"\nSession stalled: no output or workspace changes for "
+                f"{idle_timeout:.0f} seconds; ended after {seconds:.0f} seconds")
+    return {
+        "success": process.returncode == 0 and not (timed_out or stalled),
+        "stdout": out,
+        "stderr": err.strip(),
+        "returncode": process.returncode if not (timed_out or stalled) else -1,
+        "timed_out": timed_out,
+        "stalled": stalled,
+        "seconds": seconds,
+        "stdout_file": str(stdout.path) if stdout.path else None,
+        "stderr_file": str(stderr.path) if stderr.path else None,
+        "stdout_bytes": stdout.size,
+        "stderr_bytes": stderr.size,
+    }
@@ -1,61 +1,36 @@
-import os
-import subprocess
-from typing import Dict, List
+from typing import Dict, List, Optional
+
+from utils.cli_probe import require_cli
+from utils.cli_session import DEFAULT_IDLE_TIMEOUT, run_cli_session
 
 class CodexCodeInterface:
     """Interface for interacting with the Codex CLI."""
 
     def __init__(self):
         """Ensure the Codex CLI is available on the system."""
-        try:
-            result = subprocess.run(["codex", "--version"], capture_output=True, text=True)
-            if result.returncode != 0:
-                raise RuntimeError(
-                    "Codex CLI not found. Please ensure 'codex' is installed and in PATH"
-                )
-        except FileNotFoundError:
-            raise RuntimeError(
-                "Codex CLI not found. Please ensure 'codex' is installed and in PATH"
-            )
+        require_cli("codex", "Codex")
+
+    def execute_code_cli(self, prompt: str, cwd: str, model: str = None,
+                         timeout: float = 600,
+                         idle_timeout: Optional[float] = DEFAULT_IDLE_TIMEOUT,
+                         transcript: Optional[str] = None) -> Dict[str, any]:
+        """Execute Codex via CLI and capture the response.
 
-    def execute_code_cli(self, prompt: str, cwd: str, model: str = None) -> Dict[str, any]:
-        """Execute Codex via CLI and capture the response."""
-        try:
-            original_cwd = os.getcwd()
-            os.chdir(cwd)
-            cmd = ["codex"]
-            if model:
-                cmd.extend(["--model", model])
-            result = subprocess.run(
-                cmd,
-                input=prompt,
-                capture_output=True,
-                text=True,
-                timeout=600,
-            )
-            os.chdir(original_cwd)
-            return {
-                "success": result.returncode == 0,
-                "stdout": result.stdout,
-                "stderr": result.stderr,
-                "returncode": result.returncode,
-            }
-        except subprocess.TimeoutExpired:
-            os.chdir(original_cwd)
-            return {
-                "success": False,
-                "stdout": "",
-                "stderr": "Command timed out after 10 minutes",
-                "returncode": -1,
-            }
-        except Exception as e:
-            os.chdir(original_cwd)
-            return {
-                "success": False,
-                "stdout": "",
-                "stderr": str(e),
-                "returncode": -1,
-            }
+        Args:
+            prompt: The prompt to send to Codex.
+            cwd: Working directory to execute in.
+            model: Optional model to use.
+            timeout: Seconds the session may run before it is killed.
+            idle_timeout: Seconds without output or workspace edits before the
+                session is treated as stalled and ended (None disables).
+            transcript: Path prefix for the full stdout/stderr logs; the
+                result itself only holds a bounded excerpt of each.
+        """
+        cmd = ["codex"]
+        if model:
+            cmd.extend(["--model", model])
+        return run_cli_session(cmd, prompt, cwd, timeout=timeout, idle_timeout=idle_timeout,
+                               transcript=transcript)
 
     def extract_file_changes(self, response: str) -> List[Dict[str, str]]:
         """Extract file changes from Codex's response (placeholder)."""
@@ -0,0 +1,139 @@
+"""Per-file repository indexes cached per (repo, commit), updated incrementally.
+
+The retrieval index (``file_index``) and the symbol index
+(``symbol_index``) both store one entry per source file of a checkout. Such
+indexes are cached on disk under ``<cache dir>/<kind>/<repo>/<commit>.json.gz``.
+A commit without a cached index is derived from the cached index of another
+commit of the same repo: only the files in the ``git diff`` between the two
+commits are analyzed again.
+"""
+
+import gzip
+import json
+import multiprocessing
+import os
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from utils.cli_probe import cache_dir
+
+# Other cached commits of the repo tried as the base of an incremental build.
+MAX_BASES = 5
+# Files to analyze before a process pool is worth starting.
+POOL_THRESHOLD = 200
+
+
+def git_output(repo_path: str, *args: str) -> Optional[str]:
+    result = subprocess.run(["git", *args], cwd=repo_path, capture_output=True, text=True)
+    return result.stdout if result.returncode == 0 else None
+
+
+def changed_files(repo_path: str, old: str, new: str) -> Optional[List[str]]:
+    """Paths that differ between two commits, or None if either is not in the clone."""
+    out = git_output(repo_path, "diff", "--name-only", "--no-renames", "-z", old, new)
+    return None if out is None else [p for p in out.split("\0") if p]
+
+
+def tracked_files(repo_path: str, suffixes: Tuple[str, ...]) -> List[str]:
+    out = git_output(repo_path, "ls-files", "-z") or ""
+    return [p for p in out.split("\0") if p.endswith(suffixes)]
+
+
+def analyze_files(repo_path: str, paths: List[str], analyze: Callable[[str, str], Any],
+                  workers: int = 1) -> Dict[str, Any]:
+    """``analyze(repo_path, path)`` for each path, dropping files it returns None for.
+
+    With ``workers`` > 1 and enough files, runs in a process pool
+    (``analyze`` must then be a module-level function). The workers are
+    spawned rather than forked: the agent runs other threads, and a forked
+    child can inherit a lock one of them held.
+    """
+    if workers > 1 and len(paths) >= POOL_THRESHOLD:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            results = pool.map(partial(analyze, repo_path), paths,
+                               chunksize=max(len(paths) // (workers * 4), 1))
+            entries = dict(zip(paths, results))
+    else:
+        entries = {path: analyze(repo_path, path) for path in paths}
+    return {path: entry for path, entry in entries.items() if entry is not None}
+
+
+def build_entries(repo_path: str, commit: str, suffixes: Tuple[str, ...],
+                  analyze: Callable[[str, str], Any],
+                  base: Optional[Tuple[str, Dict[str, Any]]] = None,
+                  workers: int = 1) -> Dict[str, Any]:
+    """Entries for every tracked source file of the checkout at ``commit``.
+
+    ``base`` is a (commit, entries) pair of another commit; when given, only
+    files changed since that commit are analyzed.
+    """
+    if base is not None:
+        changed = changed_files(repo_path, base[0], commit)
+        if changed is not None:
+            entries = dict(base[1])
+            for path in changed:
+                entries.pop(path, None)
+            present = [p for p in changed if p.endswith(suffixes)
+                       and os.path.isfile(os.path.join(repo_path, p))]
+            entries.update(analyze_files(repo_path, present, analyze, workers))
+            return entries
+    return analyze_files(repo_path, tracked_files(repo_path, suffixes), analyze, workers)
+
+
+class CommitIndexStore:
+    """On-disk cache of one kind of per-commit index."""
+
+    def __init__(self, kind: str, version: int):
+        self.kind = kind
+        self.version = version
+
+    def path(self, repo: str, commit: str) -> Path:
+        return cache_dir() / self.kind / repo.replace("/", "__") / f"{commit}.json.gz"
+
+    def load(self, repo: str, commit: str) -> Optional[Dict[str, Any]]:
+        try:
+            with gzip.open(self.path(repo, commit), "rt", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError, EOFError):
+            return None
+        return data.get("entries") if data.get("version") == self.version else None
+
+    def save(self, repo: str, commit: str, entries: Dict[str, Any]):
+        path = self.path(repo, commit)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = path.with_name(path.name + f".{os.getpid()}.tmp")
+        with gzip.open(tmp_file, "wt", encoding="utf-8") as f:
+            json.dump({"version": self.version, "repo": repo, "commit": commit, "entries": entries}, f)
+        os.replace(tmp_file, path)
+
+    def cached_commits(self, repo: str) -> List[str]:
+        """Cached commits of ``repo``, most recently written first."""
+        folder = self.path(repo, "x").parent
+        if not folder.is_dir():
+            return []
+        files = sorted(folder.glob("*.json.gz"), key=lambda p: p.stat().st_mtime, reverse=True)
+        return [p.name[:-len(".json.gz")] for p in files]
+
+    def nearest(self, repo_path: str, repo: str, commit: str,
+                in_memory: Iterable[Tuple[str, Dict[str, Any]]] = ()) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """The (commit, entries) with the fewest files changed relative to ``commit``.
+
+        ``in_memory`` indexes are considered alongside the most recent cached ones.
+        """
+        candidates: Dict[str, Optional[Dict[str, Any]]] = dict(in_memory)
+        for other in self.cached_commits(repo)[:MAX_BASES]:
+            candidates.setdefault(other, None)
+        candidates.pop(commit, None)
+
+        best, best_changes = None, None
+        for other in candidates:
+            changed = changed_files(repo_path, other, commit)
+            if changed is not None and (best_changes is None or len(changed) < best_changes):
+                best, best_changes = other, len(changed)
+        if best is None:
+            return None
+        entries = candidates[best] if candidates[best] is not None else self.load(repo, best)
+        return (best, entries) if entries is not None else None
@@ -0,0 +1,39 @@
+"""Process-wide cache of loaded SWE-bench datasets.
+
+Generation, image prewarming and the image cache all need the instances of
+the same dataset. Loading it through ``datasets`` takes seconds even when
+the files are already on disk, so each (dataset, split) is loaded once per
+process and the list of instance dicts is shared by every caller.
+"""
+
+import threading
+from typing import Dict, List, Optional, Tuple
+
+_loaded: Dict[Tuple[str, str], List[Dict]] = {}
+_lock = threading.Lock()
+
+
+def load_instances(dataset_name: str, split: str = "test") -> List[Dict]:
+    """All instances of ``dataset_name``/``split``, loaded at most once per process."""
+    key = (dataset_name, split)
+    # Held while loading so a concurrent caller (the prewarm thread) waits
+    # for the first load instead of starting its own.
+    with _lock:
+        if key not in _loaded:
+            from datasets import load_dataset
+
+            _loaded[key] = [dict(item) for item in load_dataset(dataset_name, split=split)]
+        return _loaded[key]
+
+
+def select_instances(dataset_name: str, limit: Optional[int] = None,
+                     split: str = "test") -> List[Dict]:
+    """The first ``limit`` instances (all of them when no limit is given)."""
+    instances = load_instances(dataset_name, split)
+    return instances[:limit] if limit else instances
+
+
+def cached_instances(dataset_name: str, split: str = "test") -> Optional[List[Dict]]:
+    """Instances if this process has already loaded the dataset, else None."""
+    with _lock:
+        return _loaded.get((dataset_name, split))
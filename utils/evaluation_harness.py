@@ -0,0 +1,151 @@
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from utils import tracing
+
+
+def build_harness_command(predictions_path: str, dataset_name: str, run_id: str,
+                          max_workers: int, report_dir: Path, timeout: int = 600,
+                          cache_level: str = "env",
+                          instance_ids: Optional[Iterable[str]] = None) -> List[str]:
+    """Build the command line for ``swebench.harness.run_evaluation``."""
+    cmd = [
+        sys.executable, "-m", "swebench.harness.run_evaluation",
+        "--predictions_path", str(predictions_path),
+        "--dataset_name", dataset_name,
+        "--split", "test",
+        "--run_id", run_id,
+        "--max_workers", str(max_workers),
+        "--timeout", str(timeout),
+        "--cache_level", cache_level,
+        "--report_dir", str(report_dir),
+    ]
+    if instance_ids:
+        cmd.append("--instance_ids")
+        cmd.extend(instance_ids)
+    return cmd
+
+
+def run_harness(cmd: List[str], cwd: Path) -> List[str]:
+    """Run the harness, echoing its output in real time.
+
+    Returns the captured output lines so callers can fall back to parsing
+    them when the structured report is missing.
+    """
+    process = subprocess.Popen(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        bufsize=1,
+        cwd=str(cwd),
+    )
+
+    output_lines = []
+    for line in iter(process.stdout.readline, ''):
+        print(line, end='')
+        output_lines.append(line)
+
+    process.wait()
+    return output_lines
+
+
+def execute_evaluation(predictions_path: str, dataset_name: str, run_id: str,
+                       instance_ids: List[str], max_workers, report_dir: Path,
+                       image_budget: Optional[int] = None) -> List[str]:
+    """Evaluate a predictions file, honouring ``--max-workers auto`` and the image budget."""
+    from utils.image_cache import ImageCacheManager
+    from utils.worker_autoscaler import AUTO, run_harness_autoscaled
+
+    # With a budget, instance images are kept between runs and evicted by
+    # the cache manager instead of being removed by the harness.
+    image_cache = None
+    cache_level = "env"
+    if image_budget:
+        image_cache = ImageCacheManager(report_dir, image_budget)
+        image_cache.before_evaluation(dataset_name, instance_ids)
+        cache_level = "instance"
+
+    start_time = time.time()
+    with tracing.span("harness", cat="evaluation", run_id=run_id, instances=len(instance_ids)):
+        if max_workers == AUTO:
+            output_lines = run_harness_autoscaled(
+                predictions_path, dataset_name, run_id, report_dir, instance_ids,
+                cache_level=cache_level,
+            )
+        else:
+            cmd = build_harness_command(
+                predictions_path, dataset_name, run_id, max_workers, report_dir,
+                cache_level=cache_level,
+            )
+            print(f"Running: {' '.join(cmd)}")
+            output_lines = run_harness(cmd, report_dir)
+    tracing.record_harness(report_dir, run_id, since=start_time)
+
+    if image_cache:
+        image_cache.after_evaluation(time.time() - start_time)
+    return output_lines
+
+
+def execute_batch_evaluation(runs: List[Dict], dataset_name: str, max_workers, report_dir: Path,
+                             batch_id: str, image_budget: Optional[int] = None,
+                             timeout: int = 600, reuse_containers: bool = False,
+                             executor: str = "docker") -> List[str]:
+    """Evaluate several runs' predictions in one harness process with one worker pool.
+
+    ``runs`` holds ``{"run_id", "predictions"}`` dicts whose predictions are
+    in harness format (``instance_id``, ``model_name_or_path``,
+    ``model_patch``). Each run gets its own ``<model>.<run_id>.json`` report
+    in ``report_dir``, as if it had been evaluated alone. With
+    ``reuse_containers`` the candidates for one instance share a warm container;
+    ``executor="local"`` runs the tests without Docker (see ``utils.local_executor``).
+    """
+    from utils.image_cache import ImageCacheManager
+    from utils.worker_autoscaler import AUTO, WorkerAutoscaler
+
+    batch_file = Path(report_dir) / f"{batch_id}.jsonl"
+    instance_ids = []
+    with open(batch_file, "w") as f:
+        for run in runs:
+            for pred in run["predictions"]:
+                f.write(json.dumps(dict(pred, run_id=run["run_id"])) + "\n")
+                instance_ids.append(pred["instance_id"])
+    instance_ids = list(dict.fromkeys(instance_ids))
+
+    image_cache = None
+    if image_budget and executor == "docker":
+        image_cache = ImageCacheManager(report_dir, image_budget)
+        image_cache.before_evaluation(dataset_name, instance_ids)
+    if max_workers == AUTO:
+        autoscaler = WorkerAutoscaler()
+        max_workers = autoscaler.recommend()
+        print(f"⚙️  Auto workers: {autoscaler.describe()}")
+
+    cmd = [
+        sys.executable, str(Path(__file__).with_name("batch_harness.py")),
+        "--batch", str(batch_file),
+        "--dataset_name", dataset_name,
+        "--max_workers", str(max_workers),
+        "--timeout", str(timeout),
+        "--executor", executor,
+    ]
+    if reuse_containers:
+        cmd.append("--reuse_containers")
+    if image_cache:
+        # Like --cache_level instance: the cache manager evicts instead
+        cmd.append("--keep_images")
+    start_time = time.time()
+    with tracing.span("harness batch", cat="evaluation", runs=len(runs), instances=len(instance_ids),
+                      executor=executor):
+        print(f"Running: {' '.join(cmd)}")
+        output_lines = run_harness(cmd, report_dir)
+    for run in runs:
+        tracing.record_harness(report_dir, run["run_id"], since=start_time)
+
+    if image_cache:
+        image_cache.after_evaluation(time.time() - start_time)
+    return output_lines
@@ -0,0 +1,158 @@
+"""Failure classes, deferred retries and a circuit breaker for generation runs.
+
+A failed instance used to become an empty prediction whatever went wrong,
+so an expired CLI login at instance 20 turned the remaining instances into
+instant failures and a meaningless score. Failures are now classified:
+
+* ``infra_transient`` - the workspace could not be set up (clone/checkout,
+  disk, network to GitHub); worth retrying later.
+* ``backend_transient`` - the model backend failed in a way that usually
+  clears up (rate limits, overload, 5xx, dropped connections, an
+  unexplained CLI crash); worth retrying later.
+* ``backend_fatal`` - the backend cannot work until someone intervenes
+  (expired login, bad API key, exhausted credit, missing CLI).
+* ``agent`` - the session ran and its result stands (no patch, a stalled
+  or timed-out session, an invalid diff); never retried.
+
+Transient failures go to a ``RetryQueue`` and are retried after the rest of
+the run, with exponential backoff. Backend-fatal failures are retried too,
+but first they feed a ``CircuitBreaker``: after several in a row it opens,
+dispatch pauses with an alert, and after too many pauses the run stops
+instead of burning through the remaining instances.
+"""
+
+import heapq
+import re
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+INFRA_TRANSIENT = "infra_transient"
+BACKEND_TRANSIENT = "backend_transient"
+BACKEND_FATAL = "backend_fatal"
+AGENT = "agent"
+
+RETRYABLE = (INFRA_TRANSIENT, BACKEND_TRANSIENT, BACKEND_FATAL)
+
+_FATAL = re.compile(
+    r"invalid[ _-]?api[ _-]?key|api key (is )?(invalid|missing|not (set|found))|authenticat(ion|e) (failed|error|required)"
+    r"|unauthori[sz]ed|\b401\b|\b403\b|forbidden|not logged in|please (run|use) \S*\s*/?login|login (required|expired)"
+    r"|(oauth |access |auth )?token (has )?(expired|revoked)|credit balance is too low|insufficient[_ ]quota"
+    r"|billing|subscription|command not found|no such file or directory.*(claude|codex|gemini)",
+    re.IGNORECASE,
+)
+_TRANSIENT = re.compile(
+    r"rate[ _-]?limit|too many requests|\b429\b|overloaded|\b529\b|\b50[0234]\b|internal server error"
+    r"|service unavailable|bad gateway|gateway time-?out|econnreset|econnrefused|etimedout|enotfound|eai_again"
+    r"|socket hang up|connection (reset|refused|error|closed)|network (error|is unreachable)|fetch failed"
+    r"|temporarily unavailable|try again later",
+    re.IGNORECASE,
+)
+# How much of the output's end is searched for an explanation.
+TAIL_CHARS = 4000
+
+
+def classify_cli_failure(result: Dict) -> str:
+    """Failure class of an unsuccessful, uninterrupted CLI session."""
+    if result.get("returncode") in (126, 127):
+        return BACKEND_FATAL
+    text = f"{result.get('stderr', '')[-TAIL_CHARS:]}\n{result.get('stdout', '')[-TAIL_CHARS:]}"
+    if _FATAL.search(text):
+        return BACKEND_FATAL
+    return BACKEND_TRANSIENT  # including crashes without a recognizable message
+
+
+def classify_exception(error: BaseException) -> str:
+    """Failure class of an exception raised while processing an instance."""
+    if isinstance(error, (OSError, TimeoutError)):
+        return INFRA_TRANSIENT
+    if _FATAL.search(str(error)):
+        return BACKEND_FATAL
+    if _TRANSIENT.search(str(error)):
+        return BACKEND_TRANSIENT
+    return AGENT
+
+
+class RetryQueue:
+    """Instances deferred for another attempt, each ready after an exponential backoff."""
+
+    def __init__(self, max_attempts: int = 3, backoff: float = 30.0, max_backoff: float = 600.0):
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.attempts: Dict[str, int] = {}
+        self._heap: List[Tuple[float, int, Dict]] = []
+        self._counter = 0
+
+    def defer(self, instance: Dict, now: Optional[float] = None) -> bool:
+        """Queue the instance for another attempt; False when it has used all its attempts."""
+        instance_id = instance["instance_id"]
+        attempts = self.attempts.get(instance_id, 0) + 1
+        self.attempts[instance_id] = attempts
+        if attempts >= self.max_attempts:
+            return False
+        delay = min(self.backoff * 2 ** (attempts - 1), self.max_backoff)
+        self._counter += 1
+        heapq.heappush(self._heap, ((now if now is not None else time.time()) + delay, self._counter, instance))
+        return True
+
+    def pop(self) -> Tuple[float, Dict]:
+        """(time it is ready, instance) for the earliest ready instance."""
+        ready, _, instance = heapq.heappop(self._heap)
+        return ready, instance
+
+    def remaining(self) -> List[Dict]:
+        return [instance for _, _, instance in sorted(self._heap)]
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+
+class CircuitBreaker:
+    """Pauses dispatch after ``threshold`` consecutive backend-fatal failures.
+
+    Each pause lasts ``cooldown`` seconds (doubling on each further trip);
+    after ``max_trips`` pauses the breaker stays open and the run should stop.
+    """
+
+    def __init__(self, threshold: int = 3, cooldown: float = 300.0, max_trips: int = 3,
+                 sleep=time.sleep):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.max_trips = max_trips
+        self.sleep = sleep
+        self.consecutive = 0
+        self.trips = 0
+        self.last_error = ""
+
+    def record(self, failure: Optional[str], error: str = ""):
+        """Record an instance's result (None or a failure class)."""
+        if failure == BACKEND_FATAL:
+            self.consecutive += 1
+            self.last_error = error
+        elif failure != BACKEND_TRANSIENT and failure != INFRA_TRANSIENT:
+            # The backend answered; transient hiccups neither close nor open the circuit.
+            self.consecutive = 0
+
+    @property
+    def open(self) -> bool:
+        return self.consecutive >= self.threshold
+
+    @property
+    def exhausted(self) -> bool:
+        return self.open and self.trips >= self.max_trips
+
+    def pause(self, on_alert=None):
+        """Alert and wait out the cooldown, then let one instance probe the backend."""
+        self.trips += 1
+        wait = self.cooldown * 2 ** (self.trips - 1)
+        message = (f"🛑 Backend failing: {self.consecutive} consecutive fatal errors "
+                   f"(last: {self.last_error.strip()[:300] or 'unknown'}). "
+                   f"Pausing dispatch for {wait / 60:.0f} min (pause {self.trips} of {self.max_trips}); "
+                   f"fix the backend (e.g. log in again) and the run will resume.")
+        print(message, file=sys.stderr, flush=True)
+        if on_alert:
+            on_alert(message)
+        self.sleep(wait)
+        # Half-open: one more fatal failure reopens the circuit.
+        self.consecutive = self.threshold - 1
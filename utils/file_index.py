@@ -0,0 +1,153 @@
+"""BM25 retrieval of the files an issue most likely concerns.
+
+Agents spend much of each session grepping for the files relevant to the
+issue, and that search repeats for every instance of the same repo. A
+``FileIndex`` is a BM25 index over the source files of one repo at one
+base commit; each file's document is made of the words in its path,
+the names it defines and its docstrings. Ranking the problem statement
+against it gives a short list of candidate files for the prompt's
+``{candidate_files}`` placeholder.
+
+Indexes are cached per (repo, commit) and built incrementally from the
+index of a nearby commit (see ``commit_index``).
+"""
+
+import math
+import os
+import re
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from utils.commit_index import CommitIndexStore, build_entries
+
+SOURCE_SUFFIXES = (".py", ".pyi", ".pyx")
+MAX_FILE_BYTES = 1_000_000
+DEFAULT_TOP_K = 10
+# A path word counts this many times as much as a word in the file's text.
+PATH_WEIGHT = 3
+K1, B = 1.2, 0.75
+
+STOPWORDS = frozenset("""
+a an and are as at be but by can cls def do for from has have if import in is it its
+not of on or py return self should so that the this to was when which with
+""".split())
+
+_WORD = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+_CAMEL = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+_DEFINITION = re.compile(r"^[ \t]*(?:async[ \t]+)?(?:def|class)[ \t]+(\w+)|^(\w+)[ \t]*(?::[^=\n]*)?=(?!=)", re.M)
+_DOCSTRING = re.compile(r'"""(.*?)"""|\'\'\'(.*?)\'\'\'', re.S)
+
+STORE = CommitIndexStore("file_index", version=2)
+_recent: Dict[str, "FileIndex"] = {}  # repo -> last index used in this process
+_lock = threading.Lock()
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased words, with identifiers also split at underscores and camelCase."""
+    tokens = []
+    for word in _WORD.findall(text):
+        parts = [p.lower() for piece in word.split("_") for p in _CAMEL.findall(piece)]
+        if len(parts) > 1:
+            tokens.append(word.strip("_").lower())
+        tokens.extend(parts)
+    return [t for t in tokens if len(t) > 1 and t not in STOPWORDS]
+
+
+def document_terms(path: str, text: str) -> Dict[str, int]:
+    """Term counts of one file: its path, the names it defines and its docstrings."""
+    terms = Counter()
+    for token in tokenize(path):
+        terms[token] += PATH_WEIGHT
+    for match in _DEFINITION.finditer(text):
+        terms.update(tokenize(match.group(1) or match.group(2)))
+    for match in _DOCSTRING.finditer(text):
+        terms.update(tokenize(match.group(1) or match.group(2) or ""))
+    return dict(terms)
+
+
+def read_terms(repo_path: str, path: str) -> Optional[Dict[str, int]]:
+    try:
+        full = os.path.join(repo_path, path)
+        if os.path.getsize(full) > MAX_FILE_BYTES:
+            return document_terms(path, "")
+        with open(full, encoding="utf-8", errors="replace") as f:
+            return document_terms(path, f.read())
+    except OSError:
+        return None
+
+
+class FileIndex:
+    """BM25 index over the source files of one repo at one commit."""
+
+    def __init__(self, repo: str, commit: str, docs: Dict[str, Dict[str, int]]):
+        self.repo = repo
+        self.commit = commit
+        self.docs = docs
+        self._postings: Optional[Dict[str, List[Tuple[str, int]]]] = None
+
+    @classmethod
+    def build(cls, repo_path: str, repo: str, commit: str,
+              base: Optional["FileIndex"] = None) -> "FileIndex":
+        """Index the checkout at ``repo_path`` (which must be clean and at ``commit``).
+
+        With ``base``, only files changed since ``base.commit`` are read.
+        """
+        docs = build_entries(repo_path, commit, SOURCE_SUFFIXES, read_terms,
+                             (base.commit, base.docs) if base else None)
+        return cls(repo, commit, docs)
+
+    def rank(self, query: str, k: int = DEFAULT_TOP_K) -> List[Tuple[str, float]]:
+        """The ``k`` best-matching files for ``query`` with their BM25 scores."""
+        if not self.docs:
+            return []
+        if self._postings is None:
+            postings: Dict[str, List[Tuple[str, int]]] = {}
+            for path, terms in self.docs.items():
+                for term, count in terms.items():
+                    postings.setdefault(term, []).append((path, count))
+            self._postings = postings
+            self._lengths = {path: sum(terms.values()) for path, terms in self.docs.items()}
+            self._average = sum(self._lengths.values()) / len(self._lengths)
+
+        n = len(self.docs)
+        scores: Dict[str, float] = {}
+        for term in set(tokenize(query)):
+            matches = self._postings.get(term)
+            if not matches:
+                continue
+            idf = math.log(1 + (n - len(matches) + 0.5) / (len(matches) + 0.5))
+            for path, count in matches:
+                norm = K1 * (1 - B + B * self._lengths[path] / self._average)
+                scores[path] = scores.get(path, 0.0) + idf * count * (K1 + 1) / (count + norm)
+        best = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return best[:k]
+
+    def save(self):
+        STORE.save(self.repo, self.commit, self.docs)
+
+
+def load_index(repo_path: str, repo: str, commit: str) -> FileIndex:
+    """The index of ``repo`` at ``commit``: from memory, from disk, or built and cached."""
+    with _lock:
+        index = _recent.get(repo)
+        if index is None or index.commit != commit:
+            docs = STORE.load(repo, commit)
+            index = FileIndex(repo, commit, docs) if docs is not None else None
+        if index is None:
+            recent = [(_recent[repo].commit, _recent[repo].docs)] if repo in _recent else []
+            base = STORE.nearest(repo_path, repo, commit, recent)
+            index = FileIndex.build(repo_path, repo, commit,
+                                    FileIndex(repo, base[0], base[1]) if base else None)
+            try:
+                index.save()
+            except OSError as e:
+                print(f"Warning: Could not cache file index: {e}")
+        _recent[repo] = index
+        return index
+
+
+def candidate_files(repo_path: str, instance: Dict, k: int = DEFAULT_TOP_K) -> List[str]:
+    """Paths of the ``k`` files most relevant to the instance's problem statement."""
+    index = load_index(repo_path, instance["repo"], instance["base_commit"])
+    return [path for path, _ in index.rank(instance.get("problem_statement", ""), k)]
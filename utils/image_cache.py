@@ -0,0 +1,352 @@
+"""Disk-budgeted management of SWE-bench evaluation images.
+
+The harness on its own can either rebuild instance images on every run
+(``--cache_level env``) or keep every image forever (``--cache_level
+instance``). ``ImageCacheManager`` keeps instance images between runs and
+records, per environment and instance image, when it was last used and how
+long it took to build. When Docker's image storage exceeds the configured
+budget it evicts the images that were used least recently and are cheapest
+to rebuild, never touching images the current evaluation needs.
+"""
+
+import argparse
+import json
+import os
+import re
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+IMAGE_PREFIXES = ("sweb.env.", "sweb.eval.")
+
+# One second of build time buys this many seconds of recency, so an image
+# that takes ten minutes to build outlives a one-minute image used at the
+# same moment by about 2.5 hours.
+BUILD_COST_WEIGHT = 15.0
+
+BUDGET_ENV_VAR = "SWE_BENCH_IMAGE_BUDGET"
+
+_LOG_TIMESTAMP = re.compile(r"^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}),(\d{3})")
+
+
+def resolve_image_budget(value: Optional[str] = None) -> Optional[int]:
+    """Budget in bytes from ``--image-budget`` or ``$SWE_BENCH_IMAGE_BUDGET`` (e.g. ``200G``)."""
+    from utils.worker_autoscaler import parse_size
+
+    value = value or os.environ.get(BUDGET_ENV_VAR)
+    if not value:
+        return None
+    budget = parse_size(value)
+    if budget <= 0:
+        raise ValueError(f"invalid image budget {value!r} (expected a size such as 200G)")
+    return budget
+
+
+def parse_image_budget(value: str) -> str:
+    """argparse type for ``--image-budget``; the value is resolved later by ``resolve_image_budget``."""
+    try:
+        resolve_image_budget(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return value
+
+
+def _is_swebench_image(tag: str) -> bool:
+    # Published images carry a registry namespace, e.g. swebench/sweb.eval.x86_64.<id>:latest.
+    return tag.rsplit("/", 1)[-1].startswith(IMAGE_PREFIXES)
+
+
+def _image_kind(name: str) -> str:
+    return "env" if name.rsplit("/", 1)[-1].startswith("sweb.env.") else "instance"
+
+
+def _build_log_seconds(log_path: Path) -> Optional[float]:
+    """Elapsed time between the first and last timestamped line of a build log."""
+    first = last = None
+    try:
+        with open(log_path, errors="replace") as f:
+            for line in f:
+                match = _LOG_TIMESTAMP.match(line)
+                if match:
+                    stamp = datetime.strptime(match.group(1), "%Y-%m-%d %H:%M:%S")
+                    stamp = stamp.timestamp() + int(match.group(2)) / 1000
+                    if first is None:
+                        first = stamp
+                    last = stamp
+    except OSError:
+        return None
+    if first is None:
+        return None
+    return last - first
+
+
+def resolve_image_keys(dataset_name: str, instance_ids: Iterable[str]) -> Dict[str, Dict[str, str]]:
+    """Map instance IDs to the image names the harness will use.
+
+    Older harnesses build an env and an instance image per instance; from
+    swebench 5 each instance runs in a single prebuilt ``image``.
+    """
+    try:  # swebench >= 5
+        from swebench.harness.utils import make_test_spec
+    except ImportError:
+        try:
+            from swebench.harness.test_spec import make_test_spec
+        except ImportError:
+            from swebench.harness.test_spec.test_spec import make_test_spec
+    from utils.dataset_cache import cached_instances
+
+    instances = cached_instances(dataset_name)
+    if instances is None:
+        from swebench.harness.utils import load_swebench_dataset
+
+        instances = load_swebench_dataset(dataset_name, "test")
+
+    wanted = set(instance_ids)
+    keys = {}
+    for instance in instances:
+        if instance["instance_id"] in wanted:
+            spec = make_test_spec(instance)
+            if hasattr(spec, "instance_image_key"):
+                keys[instance["instance_id"]] = {
+                    "env": spec.env_image_key,
+                    "instance": spec.instance_image_key,
+                }
+            else:
+                keys[instance["instance_id"]] = {"instance": spec.image}
+    return keys
+
+
+class ImageCacheManager:
+    """Track SWE-bench image usage and keep image storage under a disk budget."""
+
+    def __init__(self, state_dir: Path, budget_bytes: Optional[int] = None):
+        self.state_file = Path(state_dir) / "image_cache.json"
+        self.build_log_dir = Path(state_dir) / "logs" / "build_images"
+        self.budget_bytes = budget_bytes
+        self.state = self._load_state()
+        self._client = None
+        self._pinned: Set[str] = set()
+        self._present_before: Set[str] = set()
+        self._active = False
+        self._run_hits = 0
+        self._run_misses = 0
+
+    # -- persistence -----------------------------------------------------
+
+    def _load_state(self) -> Dict:
+        if self.state_file.exists():
+            try:
+                with open(self.state_file) as f:
+                    state = json.load(f)
+                state.setdefault("images", {})
+                state.setdefault("hits", 0)
+                state.setdefault("misses", 0)
+                return state
+            except (OSError, json.JSONDecodeError) as exc:
+                print(f"Warning: Ignoring unreadable image cache state: {exc}")
+        return {"images": {}, "hits": 0, "misses": 0}
+
+    def save(self):
+        """Atomically write the cache state."""
+        tmp_file = self.state_file.with_suffix(".json.tmp")
+        with open(tmp_file, "w") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp_file, self.state_file)
+
+    def _record(self, name: str) -> Dict:
+        return self.state["images"].setdefault(name, {
+            "kind": _image_kind(name),
+            "size": 0,
+            "last_used": 0.0,
+            "build_seconds": None,
+            "hits": 0,
+            "misses": 0,
+        })
+
+    # -- docker ----------------------------------------------------------
+
+    @property
+    def client(self):
+        if self._client is None:
+            import docker
+            self._client = docker.from_env()
+        return self._client
+
+    def present_images(self) -> Dict[str, int]:
+        """SWE-bench images currently in Docker, mapped to the bytes removing them would free."""
+        usage = self.client.df()
+        images = {}
+        for image in usage.get("Images") or []:
+            shared = max(image.get("SharedSize") or 0, 0)
+            unique = max((image.get("Size") or 0) - shared, 0)
+            for tag in image.get("RepoTags") or []:
+                if _is_swebench_image(tag):
+                    images[tag] = unique
+        return images
+
+    def storage_used(self) -> int:
+        """Total bytes of image layers stored by Docker."""
+        return self.client.df().get("LayersSize") or 0
+
+    # -- evaluation hooks ------------------------------------------------
+
+    def before_evaluation(self, dataset_name: str, instance_ids: List[str]):
+        """Record hits/misses for the images a run needs and make room for it."""
+        try:
+            keys = resolve_image_keys(dataset_name, instance_ids)
+            present = self.present_images()
+        except Exception as exc:
+            print(f"⚠️ Image cache disabled for this run: {exc}")
+            return
+
+        now = time.time()
+        self._active = True
+        self._present_before = set(present)
+        self._pinned = set()
+        self._run_hits = self._run_misses = 0
+
+        for image_keys in keys.values():
+            for name in image_keys.values():
+                if name in self._pinned:
+                    continue
+                self._pinned.add(name)
+                record = self._record(name)
+                if name in present:
+                    record["hits"] += 1
+                    self._run_hits += 1
+                else:
+                    record["misses"] += 1
+                    self._run_misses += 1
+                record["last_used"] = now
+
+        self.state["hits"] += self._run_hits
+        self.state["misses"] += self._run_misses
+        total = self._run_hits + self._run_misses
+        if total:
+            print(f"🗄️  Image cache: {self._run_hits}/{total} images warm "
+                  f"({self._run_hits / total * 100:.0f}% hit rate)")
+
+        self.enforce_budget(pinned=self._pinned)
+        self.save()
+
+    def after_evaluation(self, eval_time: float = 0.0):
+        """Record sizes and build costs of the images the run built, then enforce the budget."""
+        if not self._active:
+            return
+        self._active = False
+        try:
+            present = self.present_images()
+        except Exception as exc:
+            print(f"⚠️ Could not inspect Docker images: {exc}")
+            return
+
+        built = [name for name in present if name not in self._present_before]
+        fallback_cost = eval_time / len(built) if built else 0.0
+        for name, size in present.items():
+            record = self._record(name)
+            record["size"] = size
+            if name in built:
+                kind_dir = "env" if record["kind"] == "env" else "instances"
+                log_name = name.split(":")[0]
+                seconds = _build_log_seconds(self.build_log_dir / kind_dir / log_name / "build_image.log")
+                record["build_seconds"] = seconds if seconds is not None else fallback_cost
+            if name in self._pinned:
+                record["last_used"] = time.time()
+
+        # Forget images that were removed outside of this manager.
+        for name in list(self.state["images"]):
+            if name not in present and name not in self._pinned:
+                del self.state["images"][name]
+
+        # The run's images are now the most recently used, so they go last.
+        self.enforce_budget()
+        self.save()
+
+    # -- eviction --------------------------------------------------------
+
+    def _priority(self, record: Dict) -> float:
+        return record.get("last_used", 0.0) + BUILD_COST_WEIGHT * (record.get("build_seconds") or 0.0)
+
+    def eviction_order(self, pinned: Optional[Set[str]] = None) -> List[str]:
+        """Tracked images from first to last candidate for eviction."""
+        pinned = pinned or set()
+        candidates = [
+            (self._priority(record), name)
+            for name, record in self.state["images"].items()
+            if name not in pinned
+        ]
+        return [name for _, name in sorted(candidates)]
+
+    def enforce_budget(self, pinned: Optional[Set[str]] = None) -> int:
+        """Evict images until storage fits the budget; returns bytes freed."""
+        if not self.budget_bytes:
+            return 0
+
+        used = self.storage_used()
+        if used <= self.budget_bytes:
+            return 0
+
+        present = self.present_images()
+        freed = 0
+        for name in self.eviction_order(pinned):
+            if used - freed <= self.budget_bytes:
+                break
+            # Env images with dependent instance images free nothing.
+            if not present.get(name):
+                continue
+            try:
+                self.client.images.remove(name)
+            except Exception as exc:
+                print(f"  Could not evict {name}: {exc}")
+                continue
+            freed += present[name]
+            del self.state["images"][name]
+            print(f"  Evicted {name} ({present[name] / 1024 ** 3:.1f} GiB)")
+
+        if freed:
+            print(f"🧹 Freed {freed / 1024 ** 3:.1f} GiB of evaluation images "
+                  f"(budget {self.budget_bytes / 1024 ** 3:.0f} GiB)")
+        return freed
+
+    # -- reporting -------------------------------------------------------
+
+    def stats(self) -> Dict:
+        images = self.state["images"]
+        lookups = self.state["hits"] + self.state["misses"]
+        return {
+            "images": len(images),
+            "env_images": sum(1 for r in images.values() if r["kind"] == "env"),
+            "instance_images": sum(1 for r in images.values() if r["kind"] == "instance"),
+            "tracked_bytes": sum(r.get("size", 0) for r in images.values()),
+            "hits": self.state["hits"],
+            "misses": self.state["misses"],
+            "hit_rate": self.state["hits"] / lookups if lookups else None,
+            "build_seconds": sum(r.get("build_seconds") or 0 for r in images.values()),
+        }
+
+    def show_stats(self):
+        stats = self.stats()
+        print("\n" + "="*60)
+        print("EVALUATION IMAGE CACHE")
+        print("="*60)
+        print(f"Tracked images: {stats['images']} "
+              f"({stats['env_images']} env, {stats['instance_images']} instance)")
+        print(f"Tracked size: {stats['tracked_bytes'] / 1024 ** 3:.1f} GiB")
+        if self.budget_bytes:
+            print(f"Budget: {self.budget_bytes / 1024 ** 3:.0f} GiB")
+        if stats["hit_rate"] is None:
+            print("Hit rate: no evaluations recorded yet")
+        else:
+            print(f"Hit rate: {stats['hit_rate'] * 100:.1f}% "
+                  f"({stats['hits']} hits, {stats['misses']} misses)")
+        print(f"Rebuild cost of cached images: {stats['build_seconds'] / 60:.1f} min")
+
+        order = self.eviction_order()
+        if order:
+            print("\nNext eviction candidates:")
+            for name in order[:5]:
+                record = self.state["images"][name]
+                last_used = datetime.fromtimestamp(record["last_used"]).strftime("%Y-%m-%d %H:%M")
+                print(f"  {name}  last used {last_used}, "
+                      f"build {record.get('build_seconds') or 0:.0f}s")
@@ -0,0 +1,273 @@
+"""Background prewarming of SWE-bench environment and instance images.
+
+Image builds normally happen at the start of Docker evaluation, after all
+patches have been generated. The prewarmer runs the harness's
+``prepare_images`` entry point for the selected instances while generation
+is still in progress, so evaluation starts against images that already exist.
+From swebench 5, ``prepare_images`` only builds from a task repo and dataset
+instances name a published image that evaluation would otherwise pull, so the
+prewarm pulls those images instead (``python utils/image_prewarm.py``).
+"""
+
+import argparse
+import importlib.util
+import os
+import subprocess
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional, Set
+
+# How long a run waits for the prewarm before evaluating without it.
+WAIT_TIMEOUT = 30 * 60
+
+# Where the harness keeps its image preparation entry point, newest layout first.
+PREPARE_IMAGES_MODULES = (
+    "swebench.image_builder.prepare_images",  # swebench >= 5, builds from task repos only
+    "swebench.harness.prepare_images",
+)
+
+
+def select_instance_ids(dataset_name: str, limit: Optional[int] = None,
+                        split: str = "test") -> List[str]:
+    """Instance IDs a run with the same ``--limit`` will process."""
+    from utils.dataset_cache import select_instances
+
+    return [item["instance_id"] for item in select_instances(dataset_name, limit, split)]
+
+
+def prepare_images_module() -> Optional[str]:
+    """The first of ``PREPARE_IMAGES_MODULES`` the installed harness provides, or None."""
+    for name in PREPARE_IMAGES_MODULES:
+        try:
+            if importlib.util.find_spec(name) is not None:
+                return name
+        except ImportError:
+            continue
+    return None
+
+
+def build_prewarm_command(dataset_name: str, instance_ids: List[str],
+                          max_workers: int = 1) -> List[str]:
+    """Build the command line that prepares the images of ``instance_ids``."""
+    module = prepare_images_module()
+    if module is None:
+        raise RuntimeError("the installed swebench has no prepare_images entry point")
+    if module == PREPARE_IMAGES_MODULES[0]:
+        cmd = [
+            sys.executable, str(Path(__file__).resolve()),
+            "--dataset_name", dataset_name,
+            "--max_workers", str(max_workers),
+        ]
+    else:
+        cmd = [
+            sys.executable, "-m", module,
+            "--dataset_name", dataset_name,
+            "--split", "test",
+            "--max_workers", str(max_workers),
+        ]
+    if instance_ids:
+        cmd.append("--instance_ids")
+        cmd.extend(instance_ids)
+    return cmd
+
+
+def _docker_client():
+    import docker
+
+    return docker.from_env()
+
+
+def _instance_images(dataset_name: str, instance_ids: List[str]) -> Set[str]:
+    """Instance image names the harness uses for ``instance_ids``."""
+    from utils.image_cache import _image_kind, resolve_image_keys
+
+    return {name for keys in resolve_image_keys(dataset_name, instance_ids).values()
+            for name in keys.values() if _image_kind(name) == "instance"}
+
+
+def _present_images(client) -> Set[str]:
+    return {tag for image in client.images.list() for tag in image.tags}
+
+
+def pull_images(dataset_name: str, instance_ids: List[str], max_workers: int = 1) -> int:
+    """Pull the published images of ``instance_ids`` that are not present; returns the failures."""
+    from utils.image_cache import resolve_image_keys
+
+    client = _docker_client()
+    wanted = sorted({name for keys in resolve_image_keys(dataset_name, instance_ids).values()
+                     for name in keys.values()})
+    missing = [name for name in wanted if name not in _present_images(client)]
+    print(f"{len(wanted) - len(missing)}/{len(wanted)} images present; pulling {len(missing)}")
+
+    def pull(name: str) -> bool:
+        try:
+            client.images.pull(name)
+        except Exception as e:
+            print(f"Failed to pull {name}: {e}", flush=True)
+            return False
+        print(f"Pulled {name}", flush=True)
+        return True
+
+    with ThreadPoolExecutor(max_workers=max(max_workers, 1)) as pool:
+        return sum(not ok for ok in pool.map(pull, missing))
+
+
+def _low_priority_kwargs() -> dict:
+    """Popen arguments that start the child at reduced CPU priority."""
+    if os.name == "nt":
+        return {"creationflags": subprocess.BELOW_NORMAL_PRIORITY_CLASS}
+    return {"preexec_fn": lambda: os.nice(10)}
+
+
+class ImagePrewarmer:
+    """Build the images needed by a set of instances in a low-priority child process.
+
+    Concurrency is bounded by ``max_workers`` (one image build at a time by
+    default) so the prewarm never competes seriously with the agents that are
+    generating patches.
+    """
+
+    def __init__(self, dataset_name: str, instance_ids: Optional[List[str]] = None,
+                 limit: Optional[int] = None, max_workers: int = 1,
+                 log_dir: Optional[Path] = None):
+        self.dataset_name = dataset_name
+        self.instance_ids = instance_ids
+        self.limit = limit
+        self.max_workers = max_workers
+        self.log_dir = log_dir or Path.cwd() / "logs"
+        self.log_file: Optional[Path] = None
+        self.returncode: Optional[int] = None
+        self._process: Optional[subprocess.Popen] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._stopped = False
+        self._present_before: Optional[Set[str]] = None
+
+    def _run(self):
+        try:
+            if self.instance_ids is None:
+                self.instance_ids = select_instance_ids(self.dataset_name, self.limit)
+        except Exception as e:
+            print(f"⚠️ Image prewarm skipped: could not load {self.dataset_name}: {e}")
+            self.returncode = -1
+            return
+
+        self.log_dir.mkdir(exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.log_file = self.log_dir / f"prewarm_{timestamp}.log"
+        try:
+            self._present_before = _present_images(_docker_client())
+        except Exception as e:
+            print(f"⚠️ Could not list Docker images; prewarmed images will be kept: {e}")
+
+        with open(self.log_file, "w") as log:
+            try:
+                cmd = build_prewarm_command(self.dataset_name, self.instance_ids, self.max_workers)
+                with self._lock:
+                    if self._stopped:
+                        self.returncode = -1
+                        return
+                    self._process = subprocess.Popen(
+                        cmd, stdout=log, stderr=subprocess.STDOUT, **_low_priority_kwargs()
+                    )
+                self.returncode = self._process.wait()
+            except (OSError, RuntimeError) as e:
+                log.write(f"Failed to start prewarm: {e}\n")
+                self.returncode = -1
+
+    def start(self):
+        """Start prewarming in the background and return immediately."""
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        print(f"🔥 Prewarming evaluation images in the background "
+              f"(max {self.max_workers} concurrent build(s))")
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def stop(self):
+        """Terminate the prewarm child, if any, and wait for the background thread."""
+        with self._lock:
+            self._stopped = True
+            process = self._process
+        if process is not None and process.poll() is None:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+
+    def wait(self, timeout: Optional[float] = WAIT_TIMEOUT) -> bool:
+        """Wait up to ``timeout`` seconds for the prewarm; returns True if it succeeded.
+
+        A prewarm still running after the timeout is stopped, so it does not
+        build the same images as the evaluation that follows.
+        """
+        if self._thread is None:
+            return False
+        if self.running:
+            print("⏳ Waiting for image prewarm to finish before evaluation...")
+        self._thread.join(timeout)
+        if self.running:
+            self.stop()
+            print("⚠️ Image prewarm did not finish in time and was stopped; "
+                  "evaluation will build any missing images")
+            return False
+        if self.returncode == 0:
+            print(f"✅ Evaluation images ready ({len(self.instance_ids or [])} instances)")
+            return True
+        print(f"⚠️ Image prewarm exited with code {self.returncode}; see {self.log_file}")
+        return False
+
+    def run(self) -> bool:
+        """Prewarm in the foreground."""
+        self.start()
+        return self.wait(timeout=None)
+
+    def remove_images(self) -> int:
+        """Remove the instance images this prewarm added; for runs without an image budget.
+
+        Evaluation removes the instance images it builds itself, but prewarmed
+        ones already existed when it started, so they would pile up otherwise.
+        """
+        if self._present_before is None or not self.instance_ids:
+            return 0
+        try:
+            client = _docker_client()
+            added = (_instance_images(self.dataset_name, self.instance_ids)
+                     & _present_images(client)) - self._present_before
+        except Exception as e:
+            print(f"⚠️ Could not remove prewarmed images: {e}")
+            return 0
+        removed = 0
+        for name in sorted(added):
+            try:
+                client.images.remove(name)
+                removed += 1
+            except Exception as e:
+                print(f"  Could not remove {name}: {e}")
+        if removed:
+            print(f"🧹 Removed {removed} prewarmed instance image(s)")
+        return removed
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Pull the published images of SWE-bench instances")
+    parser.add_argument("--dataset_name", required=True)
+    parser.add_argument("--max_workers", type=int, default=1)
+    parser.add_argument("--instance_ids", nargs="+", required=True)
+    args = parser.parse_args(argv)
+    failed = pull_images(args.dataset_name, args.instance_ids, args.max_workers)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    # Run as a script by build_prewarm_command; make the repo's packages importable.
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    sys.exit(main())
@@ -0,0 +1,284 @@
+"""Docker-free evaluation executor that runs tests in local virtualenvs.
+
+The Docker harness needs a daemon, and on hosts without one (rootless or
+nested CI) nothing can be scored; for fast test suites the container
+start-up also costs more than the tests. ``LocalExecutor`` grades a
+prediction on the host instead:
+
+* one virtualenv per (repo, version), built once from a shared wheelhouse
+  (``pip wheel`` fills it, installs are ``--no-index``), as described by
+  ``local_envs.json`` (or ``$SWE_BENCH_LOCAL_ENVS``). Only repos with an
+  entry there are graded: without the repo's dependencies its tests cannot
+  even be imported, and those failures would read as unresolved instances;
+* one pristine checkout per (repo, base commit), cloned from a cached
+  mirror and copied per prediction with ``cp --reflink=auto`` (copy-on-write
+  where the filesystem supports it);
+* the instance's own eval script, with the container's paths, conda
+  activation and installs replaced by the checkout and the virtualenv.
+
+Logs and ``report.json`` are written where the Docker harness writes them and
+graded with the harness's own ``get_eval_report``, so run reports have the
+same format. The environment only approximates the instance image; compare
+a sample against Docker with ``eval --executor local --parity-check N``.
+Model patches run unsandboxed on the host.
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import re
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from utils.cli_probe import cache_dir
+
+ENVS_FILE_ENV = "SWE_BENCH_LOCAL_ENVS"
+DEFAULT_ENVS_FILE = Path(__file__).resolve().parent.parent / "local_envs.json"
+CONTAINER_ROOT = "/testbed"
+READY = "swe_bench_ready"
+
+# Eval script lines that only make sense inside the instance image.
+_CONTAINER_ONLY = re.compile(
+    r"^\s*(source /opt/miniconda3/bin/activate\b|conda activate\b|git config --global\b"
+    r"|(python3? -m )?pip3? install\b|python3? setup\.py (install|develop)\b)"
+)
+_HEREDOC = re.compile(r"<<-?\s*['\"]?(\w+)['\"]?")
+
+
+def load_env_specs(path: Optional[str] = None) -> Dict:
+    path = path or os.environ.get(ENVS_FILE_ENV) or DEFAULT_ENVS_FILE
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def env_spec(specs: Dict, repo: str, version: str) -> Optional[Dict]:
+    """The environment spec for (repo, version), or None if the repo has no entry.
+
+    The repo's exact version is preferred over its ``*`` entry; the
+    top-level ``*`` only supplies defaults for the fields an entry leaves out.
+    """
+    entries = specs.get(repo, {})
+    spec = entries.get(str(version), entries.get("*"))
+    if spec is None:
+        return None
+    return dict(specs.get("*", {}), **spec)
+
+
+def missing_env_specs(instances: Iterable[Dict], specs: Optional[Dict] = None) -> List[str]:
+    """``repo version`` of each instance environment that has no spec."""
+    specs = load_env_specs() if specs is None else specs
+    return sorted({f"{i['repo']} {i['version']}" for i in instances
+                   if env_spec(specs, i["repo"], i["version"]) is None})
+
+
+def localize_eval_script(script: str, checkout: str, venv: str, pythonpath: List[str]) -> str:
+    """Rewrite a container eval script to run in ``checkout`` with ``venv`` active."""
+    body = script.split("\n")
+    lines = [body.pop(0)] if body and body[0].startswith("#!") else []
+    lines += [
+        f"source {venv}/bin/activate",
+        f"export PYTHONPATH={':'.join(pythonpath)}${{PYTHONPATH:+:$PYTHONPATH}}",
+    ]
+    heredoc = None
+    for line in body:
+        if heredoc is not None:
+            # Patch bodies pass through untouched.
+            lines.append(line)
+            if line.strip() == heredoc:
+                heredoc = None
+            continue
+        if _CONTAINER_ONLY.match(line):
+            continue
+        match = _HEREDOC.search(line)
+        if match:
+            heredoc = match.group(1)
+        lines.append(line.replace(CONTAINER_ROOT, checkout))
+    return "\n".join(lines)
+
+
+@contextmanager
+def _file_lock(path: Path) -> Iterator[None]:
+    """Exclusive lock shared by threads and processes building the same cache entry."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _run(cmd: List[str], cwd: Optional[Path] = None):
+    result = subprocess.run(cmd, cwd=str(cwd) if cwd else None, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{' '.join(cmd[:4])} failed: {(result.stderr or result.stdout)[-2000:]}")
+    return result.stdout
+
+
+class LocalExecutor:
+    """Grades predictions in cached local environments instead of containers."""
+
+    def __init__(self, root: Optional[Path] = None, specs: Optional[Dict] = None, repo_url=None):
+        self.root = Path(root) if root else cache_dir() / "local_eval"
+        self.specs = load_env_specs() if specs is None else specs
+        self.repo_url = repo_url or (lambda repo: f"https://github.com/{repo}.git")
+
+    def pristine(self, repo: str, commit: str) -> Path:
+        """A cached checkout of ``repo`` at ``commit`` (never modified once built)."""
+        name = repo.replace("/", "__")
+        path = self.root / "checkouts" / name / commit
+        if (path / ".git" / READY).exists():
+            return path
+        mirror = self.root / "repos" / f"{name}.git"
+        with _file_lock(path.with_name(f"{commit}.lock")):
+            if (path / ".git" / READY).exists():
+                return path
+            with _file_lock(mirror.with_name(f"{name}.lock")):
+                if not mirror.exists():
+                    _run(["git", "clone", "--mirror", "--quiet", self.repo_url(repo), str(mirror)])
+                elif subprocess.run(["git", "cat-file", "-e", f"{commit}^{{commit}}"], cwd=str(mirror),
+                                    capture_output=True).returncode != 0:
+                    _run(["git", "fetch", "--quiet", "origin"], cwd=mirror)
+            shutil.rmtree(path, ignore_errors=True)
+            _run(["git", "clone", "--shared", "--no-checkout", "--quiet", str(mirror), str(path)])
+            _run(["git", "checkout", "--quiet", "--detach", commit], cwd=path)
+            (path / ".git" / READY).write_text(commit)
+        return path
+
+    def environment(self, repo: str, version: str, pristine: Path) -> Path:
+        """The virtualenv for (repo, version), built on first use."""
+        spec = env_spec(self.specs, repo, version)
+        if spec is None:
+            raise RuntimeError(f"no local environment spec for {repo} {version} in local_envs.json")
+        digest = hashlib.sha256(json.dumps(spec, sort_keys=True).encode("utf-8")).hexdigest()[:10]
+        venv = self.root / "envs" / f"{repo.replace('/', '__')}__{version}__{digest}"
+        if (venv / READY).exists():
+            return venv
+        with _file_lock(venv.with_name(f"{venv.name}.lock")):
+            if (venv / READY).exists():
+                return venv
+            print(f"🐍 Building local environment for {repo} {version}...")
+            # Built in place: virtualenvs hard-code their own path.
+            shutil.rmtree(venv, ignore_errors=True)
+            _run([spec.get("python") or sys.executable, "-m", "venv", str(venv)])
+            requirements = list(spec.get("packages", []))
+            for name in spec.get("requirements", []):
+                requirements += ["-r", str(pristine / name)]
+            if requirements:
+                wheelhouse = self.root / "wheelhouse"
+                wheelhouse.mkdir(parents=True, exist_ok=True)
+                pip = [str(venv / "bin" / "python"), "-m", "pip", "--disable-pip-version-check"]
+                install = pip + ["install", "--no-index", "--find-links", str(wheelhouse)] + requirements
+                try:
+                    _run(install)
+                except RuntimeError:
+                    # Some wheels are not cached yet: fill the wheelhouse, then install from it.
+                    _run(pip + ["wheel", "--quiet", "--wheel-dir", str(wheelhouse),
+                                "--find-links", str(wheelhouse)] + requirements)
+                    _run(install)
+            (venv / READY).write_text(json.dumps(spec))
+        return venv
+
+    def checkout(self, pristine: Path, dest: Path):
+        """Copy-on-write copy of a pristine checkout (a plain copy where reflinks are unsupported)."""
+        if subprocess.run(["cp", "-a", "--reflink=auto", str(pristine), str(dest)],
+                          capture_output=True).returncode != 0:
+            shutil.rmtree(dest, ignore_errors=True)
+            shutil.copytree(pristine, dest, symlinks=True)
+
+    def run(self, instance: Dict, test_spec, pred: Dict, log_dir: Path, timeout: int) -> Optional[Dict]:
+        """Grade one prediction; writes the harness's log files and returns its report (None on error)."""
+        from swebench.harness.constants import (APPLY_PATCH_FAIL, APPLY_PATCH_PASS, LOG_INSTANCE,
+                                                LOG_REPORT, LOG_TEST_OUTPUT)
+        from swebench.harness.grading import get_eval_report
+        from swebench.harness.run_evaluation import GIT_APPLY_CMDS
+
+        instance_id = instance["instance_id"]
+        log_dir.mkdir(parents=True, exist_ok=True)
+        with open(log_dir / LOG_INSTANCE, "w") as log:
+            try:
+                pristine = self.pristine(instance["repo"], instance["base_commit"])
+                venv = self.environment(instance["repo"], instance["version"], pristine)
+            except (OSError, RuntimeError) as e:
+                log.write(f"Could not prepare the local environment: {e}\n")
+                print(f"⚠️ {instance_id}: could not prepare the local environment: {e}")
+                return None
+
+            with tempfile.TemporaryDirectory(prefix=f"swe_local_{instance_id}_") as tmp:
+                work = Path(tmp) / "testbed"
+                self.checkout(pristine, work)
+                patch_file = log_dir / "patch.diff"
+                patch_file.write_text(pred["model_patch"] or "")
+                applied, output = False, ""
+                for attempt, command in enumerate(GIT_APPLY_CMDS):
+                    if attempt:
+                        subprocess.run("git checkout -- . ; git clean -fd", shell=True, cwd=work,
+                                       capture_output=True)
+                    result = subprocess.run(f"{command} {patch_file}", shell=True, cwd=work,
+                                            capture_output=True, text=True)
+                    output = result.stdout + result.stderr
+                    if result.returncode == 0:
+                        applied = True
+                        break
+                if not applied and subprocess.run(["git", "apply", "--check", "--reverse", str(patch_file)],
+                                                  cwd=work, capture_output=True).returncode == 0:
+                    applied, output = True, "verified already applied"
+                if not applied:
+                    log.write(f"{APPLY_PATCH_FAIL}:\n{output}\n")
+                    return None
+                log.write(f"{APPLY_PATCH_PASS}:\n{output}\n")
+
+                spec = env_spec(self.specs, instance["repo"], instance["version"]) or {}
+                pythonpath = [str(work / p) for p in spec.get("pythonpath", [".", "src"]) if (work / p).is_dir()]
+                eval_file = log_dir / "eval.sh"
+                eval_file.write_text(localize_eval_script(test_spec.eval_script, str(work), str(venv), pythonpath))
+                process = subprocess.Popen(["bash", str(eval_file)], cwd=work, stdout=subprocess.PIPE,
+                                           stderr=subprocess.STDOUT, start_new_session=True)
+                timed_out = False
+                try:
+                    test_output = process.communicate(timeout=timeout)[0]
+                except subprocess.TimeoutExpired:
+                    os.killpg(process.pid, signal.SIGKILL)
+                    test_output = process.communicate()[0]
+                    timed_out = True
+
+            test_output_path = log_dir / LOG_TEST_OUTPUT
+            with open(test_output_path, "w") as f:
+                f.write(test_output.decode("utf-8", errors="replace"))
+                if timed_out:
+                    f.write(f"\n\nTimeout error: {timeout} seconds exceeded.")
+                    log.write(f"Test timed out after {timeout} seconds.\n")
+                    return None
+            report = get_eval_report(test_spec=test_spec, prediction=pred,
+                                     test_log_path=test_output_path, include_tests_status=True)
+            (log_dir / LOG_REPORT).write_text(json.dumps(report, indent=4))
+            log.write(f"Result for {instance_id}: resolved: {report[instance_id]['resolved']}\n")
+            return report
+
+
+def parity_summary(local: Dict[str, Dict[str, bool]], docker: Dict[str, Dict[str, bool]]) -> Dict:
+    """Compare resolved outcomes ({run_id: {instance_id: resolved}}) of the two executors."""
+    compared, mismatches = 0, []
+    for run_id, outcomes in docker.items():
+        for instance_id, resolved in sorted(outcomes.items()):
+            compared += 1
+            local_resolved = local.get(run_id, {}).get(instance_id, False)
+            if local_resolved != resolved:
+                mismatches.append({"run_id": run_id, "instance_id": instance_id,
+                                   "local": local_resolved, "docker": resolved})
+    return {
+        "compared": compared,
+        "agreed": compared - len(mismatches),
+        "agreement": (compared - len(mismatches)) / compared if compared else None,
+        "mismatches": mismatches,
+    }
@@ -1,7 +1,11 @@
 """Model registry for Claude Code, Codex, and Gemini backends."""
 
+import os
 from typing import Dict
 
+# Backend used when --backend is not given.
+DEFAULT_BACKEND = os.environ.get("CODE_SWE_BACKEND", "claude")
+
 # Gemini models
 GEMINI_MODELS: Dict[str, str] = {
     # Gemini 3 Series
@@ -0,0 +1,235 @@
+"""Instances-by-runs matrix of evaluation outcomes stored as bitsets.
+
+Every evaluated run becomes one row of packed bits over a stable instance
+index (instance IDs are only ever appended, so existing rows stay valid as
+new instances appear): one bitset of the instances the run attempted and
+one of the instances it resolved. Set questions - the oracle over all
+runs, what model A solves that model B does not, which instances nothing
+has solved - are then bitwise ORs/ANDs over a few kilobytes per run.
+
+The matrix is persisted to ``evaluation_results/outcome_matrix.npz`` and
+refreshed incrementally from the harness reports referenced by the run
+ledger's ``evaluation_report`` field.
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from utils.run_ledger import prediction_key
+
+MATRIX_NAME = "outcome_matrix.npz"
+
+# Set bits per byte value.
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint16)
+
+
+def popcount(bits: np.ndarray) -> np.ndarray:
+    """Number of set bits along the last axis of a packed bitset array."""
+    return _POPCOUNT[bits].sum(axis=-1, dtype=np.int64)
+
+
+def read_report(path: str) -> Optional[Tuple[List[str], List[str]]]:
+    """Submitted and resolved instance IDs from a harness ``<model>.<run_id>.json`` report."""
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError) as exc:
+        print(f"Warning: Could not read evaluation report {path}: {exc}")
+        return None
+    resolved = data.get("resolved_ids") or []
+    submitted = data.get("submitted_ids") or data.get("completed_ids") or resolved
+    return list(submitted), list(resolved)
+
+
+class OutcomeMatrix:
+    """Per-run attempted/resolved bitsets over a persistent instance index."""
+
+    def __init__(self, state_dir: Path):
+        self.matrix_file = Path(state_dir) / MATRIX_NAME
+        self.instance_ids: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.run_keys: List[str] = []
+        self.rows: Dict[str, int] = {}
+        self.report_mtimes = np.zeros(0, dtype=np.int64)
+        self.attempted = np.zeros((0, 0), dtype=np.uint8)
+        self.resolved = np.zeros((0, 0), dtype=np.uint8)
+        self._load()
+
+    # -- persistence -----------------------------------------------------
+
+    def _load(self):
+        if not self.matrix_file.exists():
+            return
+        try:
+            with np.load(self.matrix_file, allow_pickle=False) as data:
+                self.instance_ids = data["instance_ids"].tolist()
+                self.run_keys = data["run_keys"].tolist()
+                self.report_mtimes = data["report_mtimes"]
+                self.attempted = data["attempted"]
+                self.resolved = data["resolved"]
+        except (OSError, ValueError, KeyError) as exc:
+            print(f"Warning: Rebuilding unreadable outcome matrix: {exc}")
+            self.instance_ids, self.run_keys = [], []
+            self.report_mtimes = np.zeros(0, dtype=np.int64)
+            self.attempted = self.resolved = np.zeros((0, 0), dtype=np.uint8)
+        self.index = {instance_id: i for i, instance_id in enumerate(self.instance_ids)}
+        self.rows = {key: i for i, key in enumerate(self.run_keys)}
+
+    def save(self):
+        """Atomically write the matrix."""
+        self.matrix_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.matrix_file.with_name(MATRIX_NAME + f".{os.getpid()}.tmp")
+        with open(tmp_file, "wb") as f:
+            np.savez(
+                f,
+                instance_ids=np.array(self.instance_ids, dtype=str),
+                run_keys=np.array(self.run_keys, dtype=str),
+                report_mtimes=self.report_mtimes,
+                attempted=self.attempted,
+                resolved=self.resolved,
+            )
+        os.replace(tmp_file, self.matrix_file)
+
+    # -- building --------------------------------------------------------
+
+    @property
+    def width(self) -> int:
+        """Bytes per packed row."""
+        return (len(self.instance_ids) + 7) // 8
+
+    def _index_ids(self, instance_ids: Iterable[str]) -> np.ndarray:
+        """Positions of ``instance_ids`` in the index, appending unseen IDs."""
+        positions = []
+        for instance_id in instance_ids:
+            if instance_id not in self.index:
+                self.index[instance_id] = len(self.instance_ids)
+                self.instance_ids.append(instance_id)
+            positions.append(self.index[instance_id])
+        return np.array(positions, dtype=np.int64)
+
+    def _pack(self, positions: np.ndarray) -> np.ndarray:
+        row = np.zeros(self.width * 8, dtype=bool)
+        row[positions] = True
+        return np.packbits(row)
+
+    def _grow(self):
+        """Pad existing rows with zero bytes after the index has grown."""
+        extra = self.width - self.attempted.shape[1]
+        if extra > 0:
+            padding = ((0, 0), (0, extra))
+            self.attempted = np.pad(self.attempted, padding)
+            self.resolved = np.pad(self.resolved, padding)
+
+    def add_runs(self, runs: List[Tuple[str, List[str], List[str], int]]):
+        """Insert or replace rows for (key, submitted IDs, resolved IDs, report mtime) tuples."""
+        positions = [(self._index_ids(submitted), self._index_ids(resolved))
+                     for _, submitted, resolved, _ in runs]
+        self._grow()
+
+        new_keys, new_attempted, new_resolved, new_mtimes = [], [], [], []
+        for (key, _, _, mtime_ns), (attempted_positions, resolved_positions) in zip(runs, positions):
+            attempted_row = self._pack(attempted_positions)
+            resolved_row = self._pack(resolved_positions)
+            row = self.rows.get(key)
+            if row is None:
+                self.rows[key] = len(self.run_keys) + len(new_keys)
+                new_keys.append(key)
+                new_attempted.append(attempted_row)
+                new_resolved.append(resolved_row)
+                new_mtimes.append(mtime_ns)
+            else:
+                self.attempted[row] = attempted_row
+                self.resolved[row] = resolved_row
+                self.report_mtimes[row] = mtime_ns
+
+        if new_keys:
+            # One allocation for the whole batch rather than one per run.
+            self.run_keys.extend(new_keys)
+            self.attempted = np.vstack([self.attempted.reshape(-1, self.width)] + new_attempted)
+            self.resolved = np.vstack([self.resolved.reshape(-1, self.width)] + new_resolved)
+            self.report_mtimes = np.append(self.report_mtimes, np.array(new_mtimes, dtype=np.int64))
+
+    def add_run(self, key: str, submitted: List[str], resolved: List[str], mtime_ns: int = 0):
+        """Insert or replace the row for ``key``."""
+        self.add_runs([(key, submitted, resolved, mtime_ns)])
+
+    def sync(self, entries: Iterable[Dict]) -> bool:
+        """Add rows for entries whose evaluation report is new or has changed; returns True if any did."""
+        pending = {}
+        for entry in entries:
+            report = entry.get("evaluation_report")
+            if not report:
+                continue
+            try:
+                mtime_ns = os.stat(report).st_mtime_ns
+            except OSError:
+                continue
+            key = prediction_key(entry)
+            row = self.rows.get(key)
+            if row is not None and self.report_mtimes[row] == mtime_ns:
+                continue
+            outcome = read_report(report)
+            if outcome is not None:
+                pending[key] = (key, outcome[0], outcome[1], mtime_ns)
+
+        if not pending:
+            return False
+        self.add_runs(list(pending.values()))
+        try:
+            self.save()
+        except OSError as exc:
+            print(f"Warning: Could not write outcome matrix: {exc}")
+        return True
+
+    # -- queries ---------------------------------------------------------
+
+    def row_indices(self, keys: Iterable[str]) -> np.ndarray:
+        return np.array([self.rows[k] for k in keys if k in self.rows], dtype=np.int64)
+
+    def union(self, rows: np.ndarray, matrix: Optional[np.ndarray] = None) -> np.ndarray:
+        matrix = self.resolved if matrix is None else matrix
+        if not len(rows):
+            return np.zeros(self.width, dtype=np.uint8)
+        return np.bitwise_or.reduce(matrix[rows], axis=0)
+
+    def intersection(self, rows: np.ndarray, matrix: Optional[np.ndarray] = None) -> np.ndarray:
+        matrix = self.resolved if matrix is None else matrix
+        if not len(rows):
+            return np.zeros(self.width, dtype=np.uint8)
+        return np.bitwise_and.reduce(matrix[rows], axis=0)
+
+    def ids(self, bits: np.ndarray) -> List[str]:
+        """Instance IDs whose bits are set."""
+        positions = np.flatnonzero(np.unpackbits(bits)[:len(self.instance_ids)])
+        return [self.instance_ids[i] for i in positions]
+
+    def oracle(self, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Instances resolved by at least one of ``rows`` (default: every run)."""
+        rows = np.arange(len(self.run_keys)) if rows is None else rows
+        return self.union(rows)
+
+    def never_solved(self, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Instances attempted by some run in ``rows`` but resolved by none."""
+        rows = np.arange(len(self.run_keys)) if rows is None else rows
+        return self.union(rows, self.attempted) & ~self.union(rows)
+
+    def difference(self, rows_a: np.ndarray, rows_b: np.ndarray) -> np.ndarray:
+        """Instances some run in A resolved that no run in B resolved, among those B attempted."""
+        return self.union(rows_a) & ~self.union(rows_b) & self.union(rows_b, self.attempted)
+
+    def win_loss(self, groups: Dict[str, np.ndarray]) -> Tuple[List[str], np.ndarray]:
+        """Pairwise table: ``wins[i, j]`` = instances group i solves and group j does not.
+
+        Only instances both groups attempted are counted, so groups evaluated on
+        different subsets are compared on their overlap.
+        """
+        labels = list(groups)
+        solved = np.stack([self.union(groups[g]) for g in labels])
+        attempted = np.stack([self.union(groups[g], self.attempted) for g in labels])
+        both = attempted[:, None, :] & attempted[None, :, :]
+        wins = popcount(solved[:, None, :] & ~solved[None, :, :] & both)
+        return labels, wins
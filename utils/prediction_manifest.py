@@ -0,0 +1,167 @@
+"""Cached metadata for prediction files.
+
+Listing runs used to parse every ``predictions_*.jsonl`` just to count its
+instances. The manifest stores per-file metadata (instance count, model,
+backend, non-empty patch count and patch hashes) keyed by path, size and
+mtime, and only re-reads files that are new or have changed since the
+last refresh, in parallel when there are many of them.
+"""
+
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+MANIFEST_NAME = ".manifest.json"
+MANIFEST_VERSION = 1
+
+# Below this many stale files, a process pool costs more than it saves.
+PARALLEL_THRESHOLD = 8
+
+
+def backend_from_model(model: Optional[str]) -> Optional[str]:
+    """Backend recorded in a prediction's model field (``claude-code`` -> ``claude``)."""
+    if model and model.endswith("-code"):
+        return model[:-len("-code")]
+    return None
+
+
+def reserve_prediction_file(directory: Path, timestamp: str) -> Path:
+    """Create a new, uniquely named ``predictions_<timestamp>[_<n>].jsonl`` file.
+
+    The file is created exclusively, so writers started in the same second
+    get distinct files instead of appending to each other's.
+    """
+    suffix = 0
+    while True:
+        name = f"predictions_{timestamp}" + (f"_{suffix}" if suffix else "")
+        path = Path(directory) / f"{name}.jsonl"
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return path
+        except FileExistsError:
+            suffix += 1
+
+
+def summarize_predictions_file(path: str) -> Dict:
+    """Read a predictions JSONL file and return its manifest entry."""
+    instance_count = 0
+    nonempty_count = 0
+    model = None
+    patch_hashes = {}
+    try:
+        with open(path, "rb") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                obj = json.loads(line)
+                instance_count += 1
+                if model is None:
+                    model = obj.get("model")
+                patch = obj.get("prediction") or ""
+                if patch.strip():
+                    nonempty_count += 1
+                    patch_hashes[obj.get("instance_id", "")] = hashlib.sha1(
+                        patch.encode("utf-8")
+                    ).hexdigest()
+                else:
+                    patch_hashes[obj.get("instance_id", "")] = None
+    except (OSError, ValueError) as exc:
+        return {"error": str(exc)}
+
+    return {
+        "instance_count": instance_count,
+        "nonempty_count": nonempty_count,
+        "model": model,
+        "backend": backend_from_model(model),
+        "patch_hashes": patch_hashes,
+    }
+
+
+class PredictionManifest:
+    """Incrementally refreshed metadata for the files in ``predictions/``."""
+
+    def __init__(self, predictions_dir: Path):
+        self.predictions_dir = Path(os.path.abspath(predictions_dir))
+        self.manifest_file = self.predictions_dir / MANIFEST_NAME
+        self.entries: Dict[str, Dict] = self._load()
+
+    def _load(self) -> Dict[str, Dict]:
+        if not self.manifest_file.exists():
+            return {}
+        try:
+            with open(self.manifest_file) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if data.get("version") != MANIFEST_VERSION:
+            return {}
+        return data.get("files", {})
+
+    def save(self):
+        """Atomically write the manifest."""
+        tmp_file = self.manifest_file.with_name(MANIFEST_NAME + f".{os.getpid()}.tmp")
+        with open(tmp_file, "w") as f:
+            json.dump({"version": MANIFEST_VERSION, "files": self.entries}, f)
+        os.replace(tmp_file, self.manifest_file)
+
+    def _is_fresh(self, path: Path, stat: os.stat_result) -> bool:
+        entry = self.entries.get(str(path))
+        return (entry is not None
+                and entry.get("size") == stat.st_size
+                and entry.get("mtime_ns") == stat.st_mtime_ns)
+
+    def refresh(self, paths: Optional[Iterable[Path]] = None) -> Dict[str, Dict]:
+        """Bring entries for ``paths`` (default: every predictions file) up to date."""
+        full_scan = paths is None
+        if full_scan:
+            paths = [
+                f for f in self.predictions_dir.glob("predictions_*.jsonl")
+                if not f.name.endswith("_eval.jsonl")
+            ]
+
+        stale: List[Path] = []
+        stats = {}
+        for path in paths:
+            path = Path(os.path.abspath(path))
+            try:
+                stats[path] = path.stat()
+            except OSError:
+                continue
+            if not self._is_fresh(path, stats[path]):
+                stale.append(path)
+
+        changed = bool(stale)
+        if stale:
+            if len(stale) >= PARALLEL_THRESHOLD:
+                with ProcessPoolExecutor() as pool:
+                    summaries = list(pool.map(summarize_predictions_file, map(str, stale)))
+            else:
+                summaries = [summarize_predictions_file(str(p)) for p in stale]
+
+            for path, summary in zip(stale, summaries):
+                summary["size"] = stats[path].st_size
+                summary["mtime_ns"] = stats[path].st_mtime_ns
+                self.entries[str(path)] = summary
+
+        if full_scan:
+            current = {str(p) for p in stats}
+            for key in list(self.entries):
+                if key not in current:
+                    del self.entries[key]
+                    changed = True
+
+        if changed:
+            try:
+                self.save()
+            except OSError as exc:
+                print(f"Warning: Could not write prediction manifest: {exc}")
+
+        return {str(p): self.entries[str(p)] for p in stats}
+
+    def get(self, path: Path) -> Optional[Dict]:
+        """Up-to-date manifest entry for a single file, or None if it is missing."""
+        path = Path(os.path.abspath(path))
+        return self.refresh([path]).get(str(path))
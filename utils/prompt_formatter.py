@@ -1,6 +1,6 @@
 import tempfile
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
 class PromptFormatter:
     """Format SWE-bench issues into prompts for Claude Code."""
@@ -43,8 +43,25 @@ Important notes:
 Base directory: {base_path}
 """
     
-    def format_issue(self, instance: Dict) -> str:
-        """Format a SWE-bench instance into a prompt for Claude Code."""
+    @property
+    def wants_candidate_files(self) -> bool:
+        """Whether the template has a ``{candidate_files}`` placeholder to fill."""
+        return "{candidate_files}" in self.base_template
+
+    @property
+    def wants_symbol_index(self) -> bool:
+        """Whether the template refers to the ``{symbol_index}`` lookup file."""
+        return "{symbol_index}" in self.base_template
+
+    def format_issue(self, instance: Dict, candidate_files: Optional[List[str]] = None,
+                     symbol_index: Optional[str] = None) -> str:
+        """Format a SWE-bench instance into a prompt for Claude Code.
+
+        ``candidate_files`` fills the optional ``{candidate_files}``
+        placeholder, one path per line; ``symbol_index`` is the name of the
+        lookup file for ``{symbol_index}``. Without one, the paragraph that
+        refers to it is left out of the prompt.
+        """
         # Extract key information from the instance
         repo_name = instance.get("repo", "")
         issue_title = instance.get("problem_statement", "").split('\n')[0]
@@ -57,13 +74,19 @@ Base directory: {base_path}
         # Format the prompt
         base_path = Path(tempfile.gettempdir()) / f"swe_bench_{instance_id}"
 
-        prompt = self.base_template.format(
+        template = self.base_template
+        if not symbol_index:
+            template = "\n\n".join(paragraph for paragraph in template.split("\n\n")
+                                    if "{symbol_index}" not in paragraph)
+        prompt = template.format(
             repo_name=repo_name,
             issue_title=issue_title,
             issue_description=issue_description,
             base_path=str(base_path),
             instance_id=instance_id,
             base_commit=base_commit,
+            candidate_files="\n".join(f"- {path}" for path in candidate_files or []) or "(none found)",
+            symbol_index=symbol_index or "",
         )
         
         # Add any hints if available
@@ -72,9 +95,10 @@ Base directory: {base_path}
             
         return prompt
     
-    def format_for_cli(self, instance: Dict) -> str:
+    def format_for_cli(self, instance: Dict, candidate_files: Optional[List[str]] = None,
+                       symbol_index: Optional[str] = None) -> str:
         """Format the prompt for Claude Code CLI execution."""
-        base_prompt = self.format_issue(instance)
+        base_prompt = self.format_issue(instance, candidate_files, symbol_index)
 
         # Return the raw prompt without escaping for CLI input
         return base_prompt
@@ -0,0 +1,194 @@
+"""Single-writer sink for a run's predictions, result files and ledger rows.
+
+Every prediction used to reopen the predictions file in append mode and
+every result got its own open/write/close, so concurrent producers could
+interleave partial lines. A ``ResultsSink`` owns all of a run's writes:
+producers enqueue already-serialized records and one writer thread applies
+them in group commits - whatever arrived within ``interval`` seconds (or
+``max_batch`` records) is written with one ``write`` and one ``fsync`` per
+file, and ledger rows go in one transaction.
+
+Each JSONL record is written whole or not at all: records are serialized
+before they are queued, a group is appended to an ``O_APPEND`` descriptor,
+and a line left torn by a crash is truncated away the next time the file is
+opened. Whole-file results are written to a temporary file and renamed.
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_INTERVAL = 1.0
+DEFAULT_MAX_BATCH = 256
+
+_STOP = object()
+
+
+def _write_all(fd: int, data: bytes):
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
+
+def repair_tail(path: str) -> int:
+    """Truncate a torn last line (no trailing newline); returns the bytes removed."""
+    try:
+        with open(path, "rb+") as f:
+            size = f.seek(0, os.SEEK_END)
+            if size == 0:
+                return 0
+            f.seek(size - 1)
+            if f.read(1) == b"\n":
+                return 0
+            # Walk back to the last complete line.
+            end, chunk = size, 65536
+            while end > 0:
+                start = max(0, end - chunk)
+                f.seek(start)
+                newline = f.read(end - start).rfind(b"\n")
+                if newline >= 0:
+                    keep = start + newline + 1
+                    break
+                end = start
+            else:
+                keep = 0
+            f.truncate(keep)
+            return size - keep
+    except FileNotFoundError:
+        return 0
+
+
+def atomic_write(path: str, data: bytes):
+    """Replace ``path`` with ``data`` so readers see the old or the new file, never a mix."""
+    tmp = f"{path}.tmp{os.getpid()}"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        _write_all(fd, data)
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    os.replace(tmp, path)
+
+
+class ResultsSink:
+    """Queue-fed writer thread; call ``close`` (or use it as a context manager) to drain it."""
+
+    def __init__(self, ledger=None, interval: float = DEFAULT_INTERVAL,
+                 max_batch: int = DEFAULT_MAX_BATCH):
+        self.ledger = ledger
+        self.interval = interval
+        self.max_batch = max_batch
+        self.commits = 0
+        self.records = 0
+        self.error: Optional[BaseException] = None
+        self._queue: "queue.Queue" = queue.Queue()
+        self._repaired = set()
+        self._thread = threading.Thread(target=self._run, name="results-sink", daemon=True)
+        self._thread.start()
+
+    # -- producers -------------------------------------------------------
+
+    def append(self, path, record: Dict):
+        """Append ``record`` as one line of the JSONL file at ``path``."""
+        self._queue.put(("jsonl", str(path), (json.dumps(record) + "\n").encode("utf-8")))
+
+    def write_json(self, path, data, indent: Optional[int] = 2):
+        """Write ``data`` as the whole JSON file at ``path``."""
+        self._queue.put(("file", str(path), json.dumps(data, indent=indent).encode("utf-8")))
+
+    def record_instance(self, instance_id: str, seconds: float, outcome: str,
+                        backend: Optional[str] = None, model: Optional[str] = None):
+        """Queue a ``RunLedger.record_instance`` row."""
+        self._queue.put(("ledger", None, (instance_id, seconds, outcome, backend, model)))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Commit everything queued so far now; False if that did not finish within ``timeout``."""
+        done = threading.Event()
+        self._queue.put(("flush", None, done))
+        return done.wait(timeout)
+
+    def close(self):
+        """Commit what is queued, stop the writer and raise the first write error, if any."""
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self) -> "ResultsSink":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # -- writer ----------------------------------------------------------
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.interval
+            # Gather a group: until the interval ends, the batch is full, or someone waits on it.
+            while batch[-1] is not _STOP and batch[-1][0] != "flush" and len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._commit([item for item in batch if item is not _STOP])
+            if batch[-1] is _STOP:
+                return
+
+    def _commit(self, batch: List[Tuple]):
+        lines: Dict[str, List[bytes]] = {}
+        files: Dict[str, bytes] = {}
+        rows, waiters = [], []
+        for kind, path, payload in batch:
+            if kind == "jsonl":
+                lines.setdefault(path, []).append(payload)
+            elif kind == "file":
+                files[path] = payload  # the last version of a file wins
+            elif kind == "ledger":
+                rows.append(payload)
+            else:
+                waiters.append(payload)
+
+        for path, records in lines.items():
+            try:
+                self._append(path, b"".join(records))
+                self.records += len(records)
+            except OSError as e:
+                print(f"⚠️ Could not write {len(records)} record(s) to {path}: {e}")
+                self.error = self.error or e
+        for path, data in files.items():
+            try:
+                atomic_write(path, data)
+            except OSError as e:
+                print(f"⚠️ Could not write {path}: {e}")
+                self.error = self.error or e
+        if rows and self.ledger is not None:
+            try:
+                self.ledger.record_instances(rows)
+            except Exception as e:
+                print(f"Warning: Could not record instance history: {e}")
+        if lines or files or rows:
+            self.commits += 1
+        for done in waiters:
+            done.set()
+
+    def _append(self, path: str, data: bytes):
+        if path not in self._repaired:
+            removed = repair_tail(path)
+            if removed:
+                print(f"⚠️ Dropped a torn {removed}-byte line at the end of {path}")
+            self._repaired.add(path)
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            _write_all(fd, data)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
@@ -0,0 +1,298 @@
+"""Indexed, concurrency-safe ledger of benchmark runs.
+
+Run entries used to live only in ``benchmark_scores.log`` (one JSON object
+per line), which every status lookup re-parsed and every evaluation update
+rewrote in place. The ledger keeps the same entries in a SQLite database in
+WAL mode, keyed by prediction file name, so lookups are index hits and
+updates are atomic upserts that concurrent evaluations cannot lose.
+
+Lines appended to the legacy JSONL log (by older checkouts, for example)
+are imported incrementally and transparently; ``export_jsonl`` writes the
+ledger back out in the legacy format.
+"""
+
+import json
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    prediction_key TEXT NOT NULL UNIQUE,
+    timestamp TEXT,
+    evaluation_status TEXT,
+    seq INTEGER NOT NULL,
+    entry TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_seq ON runs(seq);
+CREATE TABLE IF NOT EXISTS instance_runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    instance_id TEXT NOT NULL,
+    backend TEXT,
+    model TEXT,
+    timestamp TEXT,
+    seconds REAL,
+    outcome TEXT
+);
+CREATE INDEX IF NOT EXISTS instance_runs_instance ON instance_runs(instance_id);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def prediction_key(entry: Dict) -> str:
+    """Ledger key for an entry: the prediction file name, or the timestamp for failed runs."""
+    prediction_file = entry.get("prediction_file")
+    if prediction_file and prediction_file != "None":
+        return Path(prediction_file).name
+    return f"none:{entry.get('timestamp', '')}"
+
+
+class RunLedger:
+    """SQLite-backed store of benchmark run entries."""
+
+    def __init__(self, log_file: Path, db_file: Optional[Path] = None):
+        self.log_file = Path(log_file)
+        self.db_file = Path(db_file) if db_file else self.log_file.with_suffix(".db")
+        self._initialized = False
+
+    def exists(self) -> bool:
+        return self.db_file.exists() or self.log_file.exists()
+
+    @contextmanager
+    def _connect(self, write: bool = False) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(str(self.db_file), timeout=30, isolation_level=None)
+        try:
+            if not self._initialized:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(SCHEMA)
+                self._initialized = True
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._import_legacy(conn)
+            if write:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    yield conn
+                    conn.execute("COMMIT")
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+            else:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _next_seq(conn: sqlite3.Connection) -> int:
+        return conn.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM runs").fetchone()[0]
+
+    @classmethod
+    def _upsert(cls, conn: sqlite3.Connection, entry: Dict, replace: bool = True):
+        """Insert ``entry``; an existing entry for its key is replaced, or kept when ``replace`` is False."""
+        conflict = """DO UPDATE SET
+                timestamp = excluded.timestamp,
+                evaluation_status = excluded.evaluation_status,
+                seq = excluded.seq,
+                entry = excluded.entry""" if replace else "DO NOTHING"
+        conn.execute(
+            f"""
+            INSERT INTO runs (prediction_key, timestamp, evaluation_status, seq, entry)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(prediction_key) {conflict}
+            """,
+            (prediction_key(entry), entry.get("timestamp"), entry.get("evaluation_status"),
+             cls._next_seq(conn), json.dumps(entry)),
+        )
+
+    def _import_legacy(self, conn: sqlite3.Connection):
+        """Import lines appended to the legacy JSONL log since the last import."""
+        if not self.log_file.exists():
+            return
+
+        row = conn.execute("SELECT value FROM meta WHERE key = 'legacy_offset'").fetchone()
+        offset = int(row[0]) if row else 0
+        size = self.log_file.stat().st_size
+        # The log was rewritten (shrank): re-read it from the start, but only
+        # for entries the ledger lacks, so stale legacy lines cannot overwrite
+        # fields the ledger has updated since (e.g. completed evaluations).
+        rewritten = size < offset
+        if rewritten:
+            offset = 0
+        if size == offset:
+            return
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Another process may have imported while we waited for the lock.
+            row = conn.execute("SELECT value FROM meta WHERE key = 'legacy_offset'").fetchone()
+            if row and size >= int(row[0]):
+                offset = int(row[0])
+                rewritten = False
+            with open(self.log_file, "rb") as f:
+                f.seek(offset)
+                for raw in f:
+                    if not raw.endswith(b"\n"):
+                        # Partially written line; pick it up next time.
+                        break
+                    offset += len(raw)
+                    line = raw.decode("utf-8", errors="replace").strip()
+                    if not line:
+                        continue
+                    try:
+                        self._upsert(conn, json.loads(line), replace=not rewritten)
+                    except json.JSONDecodeError:
+                        print(f"Warning: Skipping invalid JSON line: {line}")
+            conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('legacy_offset', ?)",
+                (str(offset),),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    # -- writes ----------------------------------------------------------
+
+    def record(self, entry: Dict):
+        """Insert or replace the entry for its prediction file."""
+        with self._connect(write=True) as conn:
+            self._upsert(conn, entry)
+
+    def update(self, prediction_file, fields: Dict) -> bool:
+        """Atomically merge ``fields`` into the entry for ``prediction_file``."""
+        key = Path(str(prediction_file)).name
+        with self._connect(write=True) as conn:
+            row = conn.execute(
+                "SELECT entry FROM runs WHERE prediction_key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return False
+            entry = json.loads(row[0])
+            entry.update(fields)
+            self._upsert(conn, entry)
+        return True
+
+    def record_instance(self, instance_id: str, seconds: float, outcome: str,
+                        backend: Optional[str] = None, model: Optional[str] = None):
+        """Append one instance's generation time and outcome to the per-instance history."""
+        self.record_instances([(instance_id, seconds, outcome, backend, model)])
+
+    def record_instances(self, rows: Iterable[Tuple]):
+        """Append (instance_id, seconds, outcome, backend, model) rows in one transaction."""
+        with self._connect(write=True) as conn:
+            conn.executemany(
+                "INSERT INTO instance_runs (instance_id, backend, model, timestamp, seconds, outcome) "
+                "VALUES (?, ?, ?, datetime('now', 'localtime'), ?, ?)",
+                [(instance_id, backend, model, seconds, outcome)
+                 for instance_id, seconds, outcome, backend, model in rows],
+            )
+
+    # -- reads -----------------------------------------------------------
+
+    def get(self, prediction_file) -> Optional[Dict]:
+        if not self.exists():
+            return None
+        key = Path(str(prediction_file)).name
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT entry FROM runs WHERE prediction_key = ?", (key,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def status(self, prediction_file) -> str:
+        """Evaluation status of a prediction file, or ``unknown``."""
+        if not self.exists():
+            return "unknown"
+        key = Path(str(prediction_file)).name
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT evaluation_status FROM runs WHERE prediction_key = ?", (key,)
+            ).fetchone()
+        return (row[0] or "unknown") if row else "unknown"
+
+    def entries(self, last: Optional[int] = None) -> List[Dict]:
+        """Entries in the order their runs were first logged, optionally only the last N."""
+        if not self.exists():
+            return []
+        with self._connect() as conn:
+            if last:
+                rows = conn.execute(
+                    "SELECT entry FROM runs ORDER BY id DESC LIMIT ?", (last,)
+                ).fetchall()
+                rows.reverse()
+            else:
+                rows = conn.execute("SELECT entry FROM runs ORDER BY id").fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def snapshot(self, last: Optional[int] = None) -> Tuple[List[Tuple[int, Dict]], int]:
+        """Current (id, entry) pairs, optionally only the last N, plus the high-water mark for ``changes_since``."""
+        if not self.exists():
+            return [], 0
+        with self._connect() as conn:
+            seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM runs").fetchone()[0]
+            if last:
+                rows = conn.execute(
+                    "SELECT id, entry FROM runs ORDER BY id DESC LIMIT ?", (last,)
+                ).fetchall()
+                rows.reverse()
+            else:
+                rows = conn.execute("SELECT id, entry FROM runs ORDER BY id").fetchall()
+        return [(row[0], json.loads(row[1])) for row in rows], seq
+
+    def changes_since(self, seq: int) -> Tuple[List[Tuple[int, Dict]], int]:
+        """Entries inserted or updated after ``seq``, as (id, entry) pairs, plus the new high-water mark."""
+        if not self.exists():
+            return [], seq
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, seq, entry FROM runs WHERE seq > ? ORDER BY seq", (seq,)
+            ).fetchall()
+        if rows:
+            seq = rows[-1][1]
+        return [(row[0], json.loads(row[2])) for row in rows], seq
+
+    def instance_durations(self, instance_ids: Iterable[str],
+                           backend: Optional[str] = None) -> Dict[str, float]:
+        """Mean historical generation seconds per instance, optionally for one backend."""
+        if not self.exists():
+            return {}
+        ids = list(instance_ids)
+        durations = {}
+        with self._connect() as conn:
+            # Stay well under SQLite's bound-parameter limit.
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                query = (f"SELECT instance_id, AVG(seconds) FROM instance_runs "
+                         f"WHERE instance_id IN ({', '.join('?' * len(chunk))})")
+                params = list(chunk)
+                if backend:
+                    query += " AND backend = ?"
+                    params.append(backend)
+                query += " GROUP BY instance_id"
+                durations.update(conn.execute(query, params).fetchall())
+        return durations
+
+    def instance_history(self, backend: Optional[str] = None) -> List[Tuple[str, Optional[str], float, str]]:
+        """(instance_id, model, seconds, outcome) for every recorded instance, optionally for one backend."""
+        if not self.exists():
+            return []
+        query = "SELECT instance_id, model, seconds, outcome FROM instance_runs"
+        params: List = []
+        if backend:
+            query += " WHERE backend = ?"
+            params.append(backend)
+        with self._connect() as conn:
+            return conn.execute(query + " ORDER BY id", params).fetchall()
+
+    def export_jsonl(self, path: Path, entries: Optional[Iterable[Dict]] = None) -> int:
+        """Write entries in the legacy JSON-lines format; returns the count written."""
+        count = 0
+        with open(path, "w") as f:
+            for entry in entries if entries is not None else self.entries():
+                f.write(json.dumps(entry) + "\n")
+                count += 1
+        return count
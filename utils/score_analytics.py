@@ -0,0 +1,249 @@
+"""Vectorized statistics over the run ledger and evaluation reports.
+
+Run entries are loaded into columnar NumPy arrays (one array per field,
+categorical fields such as model or dataset stored as integer codes), so
+grouped statistics, bootstrap confidence intervals and rolling windows are
+computed with a handful of array operations instead of Python loops over
+dicts. Per-instance outcomes live in ``utils.outcome_matrix``.
+"""
+
+import math
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+CATEGORIES = ("model", "backend", "dataset", "prompt_template")
+MISSING_LABEL = "-"
+
+# Bootstrap weights are drawn in chunks of at most this many cells so the
+# (resamples x runs) matrix never grows past a few tens of megabytes.
+BOOTSTRAP_CHUNK_CELLS = 4_000_000
+
+
+def _poisson_table(bits: int = 16) -> np.ndarray:
+    """Poisson(1) quantiles at the midpoints of 2**bits equal-probability bins.
+
+    Indexing this table with uniform random integers draws Poisson(1)
+    weights several times faster than ``Generator.poisson``, with the CDF
+    discretized to 1/65536.
+    """
+    cdf = np.cumsum([math.exp(-1) / math.factorial(k) for k in range(20)])
+    quantiles = (np.arange(1 << bits) + 0.5) / (1 << bits)
+    return np.searchsorted(cdf, quantiles).astype(np.float32)
+
+
+_POISSON_WEIGHTS = _poisson_table()
+
+
+def _encode(values: List[Optional[str]]) -> Tuple[np.ndarray, List[str]]:
+    """Dictionary-encode a categorical column as int32 codes plus sorted labels."""
+    strings = np.array([str(v) if v not in (None, "") else MISSING_LABEL for v in values],
+                       dtype=object)
+    if not len(strings):
+        return np.zeros(0, dtype=np.int32), []
+    labels, codes = np.unique(strings.astype(str), return_inverse=True)
+    return codes.astype(np.int32), labels.tolist()
+
+
+def _parse_timestamps(values: List[Optional[str]]) -> np.ndarray:
+    """Ledger timestamps (``YYYY-MM-DD HH:MM:SS``) as float epoch seconds, NaN if unparseable."""
+    try:
+        stamps = np.array([str(v).replace(" ", "T") for v in values], dtype="datetime64[s]")
+        out = stamps.astype(np.int64).astype(np.float64)
+        out[np.isnat(stamps)] = np.nan
+        return out
+    except ValueError:
+        pass  # at least one malformed value; parse individually
+
+    out = np.full(len(values), np.nan)
+    for i, value in enumerate(values):
+        try:
+            stamp = np.datetime64(str(value).replace(" ", "T"), "s")
+        except ValueError:
+            continue
+        if not np.isnat(stamp):
+            out[i] = stamp.astype(np.int64)
+    return out
+
+
+def _as_float(values: Iterable) -> np.ndarray:
+    return np.array([v if isinstance(v, (int, float)) and v is not True and v is not False
+                     else np.nan for v in values], dtype=np.float64)
+
+
+class RunTable:
+    """Columnar view of run ledger entries."""
+
+    def __init__(self, columns: Dict[str, np.ndarray], labels: Dict[str, List[str]],
+                 prediction_files: List[Optional[str]], reports: List[Optional[str]]):
+        self.columns = columns
+        self.labels = labels
+        self.prediction_files = prediction_files
+        self.reports = reports
+
+    @classmethod
+    def from_entries(cls, entries: List[Dict]) -> "RunTable":
+        columns = {
+            "timestamp": _parse_timestamps([e.get("timestamp") for e in entries]),
+            "num_instances": _as_float(e.get("num_instances") for e in entries),
+            "generation_score": _as_float(e.get("generation_score") for e in entries),
+            "evaluation_score": _as_float(e.get("evaluation_score") for e in entries),
+            "generation_time": _as_float(e.get("generation_time") for e in entries),
+            "evaluation_time": _as_float(e.get("evaluation_time") for e in entries),
+            "evaluated": np.array([e.get("evaluation_status") == "completed" for e in entries],
+                                  dtype=bool),
+        }
+        labels = {}
+        for name in CATEGORIES:
+            columns[name], labels[name] = _encode([e.get(name) for e in entries])
+        return cls(
+            columns, labels,
+            [e.get("prediction_file") for e in entries],
+            [e.get("evaluation_report") for e in entries],
+        )
+
+    def __len__(self) -> int:
+        return len(self.columns["evaluated"])
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def select(self, mask: np.ndarray) -> "RunTable":
+        """Rows where ``mask`` is true (label dictionaries are shared)."""
+        index = np.flatnonzero(mask)
+        return RunTable(
+            {name: column[index] for name, column in self.columns.items()},
+            self.labels,
+            [self.prediction_files[i] for i in index],
+            [self.reports[i] for i in index],
+        )
+
+    def scored(self) -> "RunTable":
+        """Evaluated runs that have both a score and an instance count."""
+        return self.select(
+            self["evaluated"]
+            & ~np.isnan(self["evaluation_score"])
+            & (np.nan_to_num(self["num_instances"]) > 0)
+        )
+
+    def resolved(self) -> np.ndarray:
+        """Resolved instance counts recovered from each run's score and size."""
+        return np.rint(self["evaluation_score"] * self["num_instances"] / 100.0)
+
+
+def _group_index(codes: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Stable sort order, group codes and group start offsets for ``reduceat``."""
+    order = np.argsort(codes, kind="stable")
+    sorted_codes = codes[order]
+    starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+    return order, sorted_codes[starts], starts
+
+
+def bootstrap_rate_ci(resolved: np.ndarray, instances: np.ndarray, starts: np.ndarray,
+                      n_boot: int = 1000, confidence: float = 0.95,
+                      seed: Optional[int] = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """Percentile CIs for the pooled resolve rate of each group of runs.
+
+    ``resolved`` and ``instances`` must be sorted by group with groups
+    beginning at ``starts``. Runs are resampled with Poisson(1) weights, which
+    approximates resampling whole runs with replacement within every group at
+    once, so run-to-run variance is reflected and the work is a few
+    ``reduceat`` calls per chunk of resamples. Within each resample, every
+    run's resolve rate is also drawn from its Jeffreys Beta(s + 1/2, f + 1/2)
+    posterior, so the instance-level variance is kept even for a group with a
+    single run (or with none or all of its instances resolved).
+    """
+    n_runs = len(resolved)
+    n_groups = len(starts)
+    if not n_runs or not n_boot:
+        return np.full(n_groups, np.nan), np.full(n_groups, np.nan)
+
+    rng = np.random.default_rng(seed)
+    instances32 = instances.astype(np.float32)
+    solves, failures = resolved + 0.5, np.maximum(instances - resolved, 0) + 0.5
+    rates = np.empty((n_boot, n_groups))
+    chunk = max(1, BOOTSTRAP_CHUNK_CELLS // n_runs)
+    for begin in range(0, n_boot, chunk):
+        size = min(chunk, n_boot - begin)
+        weights = _POISSON_WEIGHTS[rng.integers(0, len(_POISSON_WEIGHTS), size=(size, n_runs),
+                                                dtype=np.uint16)]
+        run_rates = rng.beta(solves, failures, size=(size, n_runs)).astype(np.float32)
+        solved = np.add.reduceat(weights * instances32 * run_rates, starts, axis=1)
+        attempted = np.add.reduceat(weights * instances32, starts, axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            rates[begin:begin + size] = solved / attempted
+
+    tail = (1.0 - confidence) / 2 * 100
+    low, high = np.nanpercentile(rates, [tail, 100 - tail], axis=0)
+    return low * 100, high * 100
+
+
+def grouped_stats(table: RunTable, by: str, n_boot: int = 1000,
+                  confidence: float = 0.95, seed: Optional[int] = 0) -> List[Dict]:
+    """Per-group run counts, score summaries and a bootstrap CI of the resolve rate."""
+    if by not in CATEGORIES:
+        raise ValueError(f"Cannot group by {by!r}; choose from {', '.join(CATEGORIES)}")
+
+    scored = table.scored()
+    if not len(scored):
+        return []
+
+    order, groups, starts = _group_index(scored[by])
+    counts = np.diff(np.r_[starts, len(order)])
+    scores = scored["evaluation_score"][order]
+    gen_scores = np.nan_to_num(scored["generation_score"][order])
+    instances = scored["num_instances"][order]
+    resolved = scored.resolved()[order]
+
+    score_sum = np.add.reduceat(scores, starts)
+    mean = score_sum / counts
+    sq_dev = np.add.reduceat((scores - np.repeat(mean, counts)) ** 2, starts)
+    std = np.sqrt(sq_dev / np.maximum(counts - 1, 1))
+    low, high = bootstrap_rate_ci(resolved, instances, starts, n_boot, confidence, seed)
+    solved = np.add.reduceat(resolved, starts)
+    attempted = np.add.reduceat(instances, starts)
+    low_score = np.minimum.reduceat(scores, starts)
+    high_score = np.maximum.reduceat(scores, starts)
+    mean_generation = np.add.reduceat(gen_scores, starts) / counts
+
+    labels = table.labels[by]
+    return [
+        {
+            by: labels[groups[i]],
+            "runs": int(counts[i]),
+            "instances": int(attempted[i]),
+            "resolved": int(solved[i]),
+            "rate": float(solved[i] / attempted[i] * 100),
+            "ci_low": float(low[i]),
+            "ci_high": float(high[i]),
+            "mean_score": float(mean[i]),
+            "std_score": float(std[i]) if counts[i] > 1 else 0.0,
+            "min_score": float(low_score[i]),
+            "max_score": float(high_score[i]),
+            "mean_generation": float(mean_generation[i]),
+        }
+        for i in range(len(groups))
+    ]
+
+
+def rolling_rates(table: RunTable, window: int) -> Dict[str, np.ndarray]:
+    """Pooled resolve rate over each trailing window of ``window`` evaluated runs.
+
+    Runs are ordered by timestamp; the first ``window - 1`` positions use
+    however many runs exist so far. Returns the ordered timestamps, per-run
+    scores and the rolling rates.
+    """
+    scored = table.scored()
+    order = np.argsort(np.nan_to_num(scored["timestamp"], nan=-np.inf), kind="stable")
+    resolved = np.cumsum(scored.resolved()[order])
+    instances = np.cumsum(scored["num_instances"][order])
+
+    lagged_resolved = np.r_[np.zeros(window), resolved][:len(resolved)]
+    lagged_instances = np.r_[np.zeros(window), instances][:len(instances)]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rates = (resolved - lagged_resolved) / (instances - lagged_instances) * 100
+    return {
+        "timestamp": scored["timestamp"][order],
+        "score": scored["evaluation_score"][order],
+        "rate": rates,
+    }
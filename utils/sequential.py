@@ -0,0 +1,123 @@
+"""Sequential (early-stopping) estimation of the resolve rate.
+
+``run --until-ci`` evaluates instances as they are generated and stops as
+soon as the resolve rate is known to within a target half-width. Because
+the interval is checked after every batch, an ordinary fixed-sample
+confidence interval would be too optimistic (checking repeatedly and
+stopping at the first narrow interval inflates the error rate).
+``ConfidenceSequence`` is the hedged betting confidence sequence of
+Waudby-Smith & Ramdas (2023): it holds simultaneously for every sample
+size, so stopping whenever it is narrow enough keeps the stated coverage,
+and it adapts to the observed variance, so low resolve rates need far
+fewer instances than a worst-case (p = 0.5) bound.
+
+Instances are visited in a randomized order stratified by repository, so
+every prefix of the order has roughly the dataset's repo mix and the
+running estimate is not skewed by whichever repos sort first.
+"""
+
+import math
+import random
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Candidate rates the interval is resolved over (0.1 percentage-point steps).
+GRID = np.linspace(0.0, 1.0, 1001)
+
+
+def parse_half_width(text: str) -> float:
+    """Parse ``--until-ci`` values such as ``±3%``, ``3%``, ``3`` or ``0.03`` into a fraction."""
+    match = re.fullmatch(r"\s*(?:±|\+-|\+/-)?\s*(\d+(?:\.\d+)?)\s*(%?)\s*", text)
+    if not match:
+        raise ValueError(f"invalid confidence target {text!r} (expected e.g. ±3%)")
+    value = float(match.group(1))
+    if match.group(2) or value >= 1:
+        value /= 100
+    if not 0 < value < 0.5:
+        raise ValueError(f"confidence target {text!r} must be between 0 and 50%")
+    return value
+
+
+def stratified_order(instances: List[Dict], seed: int, key: str = "repo") -> List[Dict]:
+    """Shuffle instances so every prefix keeps each repo's share of the dataset.
+
+    Instances are shuffled within their repo, and the k-th of a repo's n
+    instances is placed at position (k + u) / n on a common [0, 1) scale,
+    with one random offset u per repo; sorting by position interleaves
+    the repos in proportion to their size.
+    """
+    rng = random.Random(seed)
+    groups: Dict[str, List[Dict]] = defaultdict(list)
+    for instance in instances:
+        groups[instance.get(key, "")].append(instance)
+
+    keyed = []
+    for name in sorted(groups):
+        members = groups[name]
+        rng.shuffle(members)
+        offset = rng.random()
+        for k, instance in enumerate(members):
+            keyed.append(((k + offset) / len(members), rng.random(), instance))
+    keyed.sort(key=lambda item: item[:2])
+    return [instance for _, _, instance in keyed]
+
+
+class ConfidenceSequence:
+    """Anytime-valid two-sided confidence interval for a success rate.
+
+    For every candidate rate m on ``GRID`` two bettors wager on outcomes
+    landing above and below m; m is excluded once their (hedged) wealth
+    reaches 1 / alpha. Bet sizes follow the predictable plug-in rule, based
+    only on outcomes seen before each bet.
+    """
+
+    def __init__(self, confidence: float = 0.95, max_bet: float = 0.5):
+        self.alpha = 1 - confidence
+        self.max_bet = max_bet
+        self.successes = 0
+        self.trials = 0
+        self._mean = 0.5      # running mean / variance estimates with a 1/2, 1/4 prior
+        self._sq_dev = 0.25
+        self._log_up = np.zeros_like(GRID)
+        self._log_down = np.zeros_like(GRID)
+        self._low, self._high = 0.0, 1.0
+
+    def update(self, outcomes: Iterable[bool]):
+        """Add outcomes (True = resolved) in the order they were observed."""
+        threshold = math.log(1 / self.alpha)
+        with np.errstate(divide="ignore"):
+            cap_up = np.minimum(self.max_bet / GRID, 1e6)
+            cap_down = np.minimum(self.max_bet / (1 - GRID), 1e6)
+        for outcome in outcomes:
+            x = 1.0 if outcome else 0.0
+            t = self.trials + 1
+            variance = self._sq_dev / t
+            bet = math.sqrt(2 * math.log(2 / self.alpha) / (variance * t * math.log(t + 1)))
+            self._log_up += np.log1p(np.minimum(bet, cap_up) * (x - GRID))
+            self._log_down += np.log1p(-np.minimum(bet, cap_down) * (x - GRID))
+
+            self.trials = t
+            self.successes += int(x)
+            self._sq_dev += (x - self._mean) ** 2
+            self._mean = (0.5 + self.successes) / (t + 1)
+
+        # Hedged wealth: max(K+ / 2, K- / 2) >= 1 / alpha rejects m.
+        wealth = np.maximum(self._log_up, self._log_down) - math.log(2)
+        plausible = GRID[wealth < threshold]
+        if len(plausible):
+            # Running intersection keeps the sequence nested.
+            self._low = max(self._low, float(plausible[0]))
+            self._high = min(self._high, float(plausible[-1]))
+
+    @property
+    def rate(self) -> Optional[float]:
+        return self.successes / self.trials if self.trials else None
+
+    def interval(self) -> Tuple[float, float]:
+        return self._low, self._high
+
+    def half_width(self) -> float:
+        return (self._high - self._low) / 2
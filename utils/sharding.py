@@ -0,0 +1,192 @@
+"""Splitting one run across machines, and merging the shards back.
+
+``--shard i/n`` gives each machine the i-th of n disjoint parts of the
+selected instances. By default the partition is a pure function of the
+instance IDs: they are dealt round-robin in the order of a stable hash, so
+every machine computes the same partition whatever its history. To balance
+shards by generation time instead, one machine writes a shard plan
+(``--shard-plan FILE``) from its timing history - instances assigned
+longest-first to the least-loaded shard, with instances without history
+counted as the median known duration - and every machine runs from a copy
+of that file. ``plan_fingerprint`` identifies a partition.
+
+Each shard stamps its predictions with ``{"shard": "i/n", "plan": ...}``,
+and its first prediction also lists every instance of the split, so
+``merge_predictions`` can tell mixed plans, absent shards and missing
+instances from the files alone. It streams the shard files into one: shards
+keep the dataset order, so they are k-way merged back into that order; an
+instance present in several shards is written once, preferring a
+non-empty patch over an empty one and either over an error.
+"""
+
+import hashlib
+import heapq
+import json
+import os
+import re
+from statistics import median
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+def parse_shard(text: str) -> Tuple[int, int]:
+    """Parse ``i/n`` (1 <= i <= n) into (i, n)."""
+    match = re.fullmatch(r"\s*(\d+)\s*/\s*(\d+)\s*", text)
+    if not match:
+        raise ValueError(f"invalid shard {text!r} (expected i/n, e.g. 2/4)")
+    index, count = int(match.group(1)), int(match.group(2))
+    if not 1 <= index <= count:
+        raise ValueError(f"shard {text!r} must satisfy 1 <= i <= n")
+    return index, count
+
+
+def stable_hash(instance_id: str) -> int:
+    return int.from_bytes(hashlib.sha256(instance_id.encode("utf-8")).digest()[:8], "big")
+
+
+def assign_shards(instance_ids: Iterable[str], count: int,
+                  durations: Optional[Dict[str, float]] = None) -> Dict[str, int]:
+    """Shard number (1-based) for each instance, balancing historical durations.
+
+    Without durations every instance costs the same, so instances are dealt
+    round-robin in stable-hash order.
+    """
+    ids = list(dict.fromkeys(instance_ids))
+    durations = durations or {}
+    known = [durations[i] for i in ids if durations.get(i)]
+    default = median(known) if known else 1.0
+    cost = {i: durations.get(i) or default for i in ids}
+
+    loads = [(0.0, shard) for shard in range(1, count + 1)]
+    heapq.heapify(loads)
+    assignment = {}
+    for instance_id in sorted(ids, key=lambda i: (-cost[i], stable_hash(i), i)):
+        load, shard = heapq.heappop(loads)
+        assignment[instance_id] = shard
+        heapq.heappush(loads, (load + cost[instance_id], shard))
+    return assignment
+
+
+def plan_fingerprint(assignment: Dict[str, int]) -> str:
+    digest = hashlib.sha256()
+    for instance_id in sorted(assignment):
+        digest.update(f"{instance_id}\t{assignment[instance_id]}\n".encode("utf-8"))
+    return digest.hexdigest()[:12]
+
+
+def load_shard_plan(path: str, instance_ids: List[str], count: int,
+                    durations: Callable[[], Dict[str, float]]) -> Dict:
+    """The shard plan shared through ``path``, written from ``durations()`` if the file does not exist yet."""
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    plan = {"count": count, "assignment": assign_shards(instance_ids, count, durations())}
+    with open(path, "w") as f:
+        json.dump(plan, f, indent=2, sort_keys=True)
+    print(f"📝 Wrote shard plan {path}; run every shard with a copy of it")
+    return plan
+
+
+def select_shard(instances: List[Dict], index: int, count: int,
+                 plan: Optional[Dict] = None) -> Tuple[List[Dict], str]:
+    """The instances of shard ``index`` of ``count`` (in their original order) and the plan fingerprint.
+
+    Without ``plan`` the partition is the stable-hash one; with it, the
+    plan's assignment is used and must cover every selected instance.
+    """
+    ids = [i["instance_id"] for i in instances]
+    if plan is None:
+        assignment = assign_shards(ids, count)
+    else:
+        if plan.get("count") != count:
+            raise ValueError(f"the shard plan splits the run into {plan.get('count')} shards, not {count}")
+        uncovered = [i for i in ids if i not in plan.get("assignment", {})]
+        if uncovered:
+            raise ValueError(f"the shard plan does not cover {len(uncovered)} selected instance(s), "
+                             f"e.g. {uncovered[0]}")
+        assignment = {i: plan["assignment"][i] for i in ids}
+    shard = [i for i in instances if assignment[i["instance_id"]] == index]
+    return shard, plan_fingerprint(assignment)
+
+
+def read_predictions(path: str) -> Iterator[Tuple[int, Dict]]:
+    """(line number, prediction) for each record of a JSONL file, read lazily."""
+    with open(path) as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                yield line_no, json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"{path}:{line_no}: invalid JSON ({e})")
+
+
+def _quality(prediction: Dict) -> int:
+    if "error" in prediction:
+        return 0
+    return 2 if prediction.get("prediction") else 1
+
+
+def merge_predictions(paths: List[str], output: str, order: Optional[Dict[str, int]] = None,
+                      expected: Optional[Iterable[str]] = None) -> Dict:
+    """Merge shard prediction files into ``output``.
+
+    ``order`` maps instance IDs to dataset positions; when every shard
+    follows it, the output does too (otherwise shards are concatenated).
+    ``expected`` lists the instances the combined run should cover; by
+    default, those listed in the shards' stamps. Returns counts of written,
+    duplicate and missing instances, and the shards and plans the files
+    were stamped with.
+    """
+    # Pass 1: IDs only - choose the copy of each instance to keep.
+    chosen: Dict[str, Tuple[int, int, int]] = {}  # id -> (quality, file, line)
+    copies: Dict[str, int] = {}
+    shards, plans, planned = set(), set(), None
+    ordered = order is not None
+    for file_no, path in enumerate(paths):
+        last = -1
+        for line_no, prediction in read_predictions(path):
+            stamp = prediction.get("shard")
+            if stamp:
+                shards.add(stamp["shard"])
+                plans.add(stamp["plan"])
+                if "instances" in stamp:
+                    planned = (planned or set()) | set(stamp["instances"])
+            instance_id = prediction.get("instance_id", "")
+            copies[instance_id] = copies.get(instance_id, 0) + 1
+            candidate = (_quality(prediction), file_no, line_no)
+            best = chosen.get(instance_id)
+            if best is None or candidate[0] > best[0]:
+                chosen[instance_id] = candidate
+            if ordered:
+                position = order.get(instance_id)
+                if position is None or position < last:
+                    ordered = False
+                else:
+                    last = position
+
+    # Pass 2: stream the kept copies into the output.
+    def keyed(file_no: int, path: str):
+        for line_no, prediction in read_predictions(path):
+            key = order[prediction["instance_id"]] if ordered else file_no
+            yield key, file_no, line_no, prediction
+
+    streams = [keyed(file_no, path) for file_no, path in enumerate(paths)]
+    written = 0
+    with open(output, "w") as out:
+        for _, file_no, line_no, prediction in heapq.merge(*streams, key=lambda item: item[:3]):
+            if chosen[prediction.get("instance_id", "")][1:] == (file_no, line_no):
+                prediction.pop("shard", None)
+                out.write(json.dumps(prediction) + "\n")
+                written += 1
+
+    if expected is None and planned is not None:
+        expected = sorted(planned, key=lambda i: (order.get(i, len(order)), i) if order else i)
+    missing = [i for i in expected if i not in chosen] if expected is not None else []
+    return {
+        "written": written,
+        "duplicates": {i: n for i, n in copies.items() if n > 1},
+        "missing": missing,
+        "ordered": ordered,
+        "shards": sorted(shards),
+        "plans": sorted(plans),
+    }
@@ -0,0 +1,262 @@
+"""Representative fixed-size instance subsets.
+
+``--limit N`` takes the first N dataset rows, which over-represents the
+repos that sort first. ``SubsetBuilder`` picks N instances whose score is
+meant to track the full-dataset score instead:
+
+1. Each repo gets a share of the subset proportional to its size.
+2. Within a repo, instances are ordered by difficulty - the historical
+   resolve rate from the outcome matrix, or, for instances without
+   history, a rate predicted from problem-statement length and gold-patch
+   size (with too little history, a size rank on the same [0, 1] scale) -
+   and one instance is taken from each of the repo's equal-size
+   difficulty strata, preferring the historically faster ones.
+3. If past full runs exist, instances are swapped within repos while that
+   lowers the squared error between subset and full-dataset scores of
+   those runs.
+
+``validate`` reports how well the subset predicts past full runs,
+including a leave-one-run-out estimate that does not reuse the run being
+predicted, next to the error of the first-N selection.
+"""
+
+import math
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+# Instances with history needed before resolve rates are used as difficulty.
+MIN_HISTORY = 20
+
+
+def read_instance_file(path) -> List[str]:
+    """Instance IDs listed in a file, one per line; blank lines and ``#`` comments are skipped."""
+    ids = []
+    with open(path) as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if line and line not in ids:
+                ids.append(line)
+    return ids
+
+
+def write_instance_file(path, instance_ids: Iterable[str], header: Iterable[str] = ()):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        for line in header:
+            f.write(f"# {line}\n")
+        for instance_id in instance_ids:
+            f.write(f"{instance_id}\n")
+
+
+def select_by_ids(instances: List[Dict], instance_ids: List[str]) -> List[Dict]:
+    """Instances in ``instance_ids`` order; raises ValueError naming any IDs not in the dataset."""
+    by_id = {instance["instance_id"]: instance for instance in instances}
+    missing = [i for i in instance_ids if i not in by_id]
+    if missing:
+        shown = ", ".join(missing[:5]) + (" ..." if len(missing) > 5 else "")
+        raise ValueError(f"{len(missing)} instance ID(s) not in the dataset: {shown}")
+    return [by_id[i] for i in instance_ids]
+
+
+def _patch_lines(patch: str) -> int:
+    return sum(1 for line in patch.splitlines()
+               if line[:1] in "+-" and not line.startswith(("+++", "---")))
+
+
+def _allocate(sizes: Dict[str, int], total: int) -> Dict[str, int]:
+    """Proportional integer quotas (largest remainder), never exceeding a group's size."""
+    n = sum(sizes.values())
+    exact = {k: total * v / n for k, v in sizes.items()}
+    quotas = {k: min(int(math.floor(v)), sizes[k]) for k, v in exact.items()}
+    remainders = sorted(sizes, key=lambda k: (quotas[k] - exact[k], k))
+    while sum(quotas.values()) < total:
+        for k in remainders:
+            if sum(quotas.values()) >= total:
+                break
+            if quotas[k] < sizes[k]:
+                quotas[k] += 1
+    return quotas
+
+
+class SubsetBuilder:
+    """Choose subsets of a dataset's instances that predict its full score."""
+
+    def __init__(self, instances: List[Dict], matrix=None,
+                 durations: Optional[Dict[str, float]] = None, min_coverage: float = 0.9):
+        self.instances = instances
+        self.instance_ids = [i["instance_id"] for i in instances]
+        self.repos = np.array([i.get("repo", "") for i in instances])
+        self.statement_len = np.array([len(i.get("problem_statement") or "") for i in instances])
+        self.patch_lines = np.array([_patch_lines(i.get("patch") or "") for i in instances])
+        durations = durations or {}
+        self.durations = np.array([durations.get(i, np.nan) for i in self.instance_ids])
+
+        n = len(instances)
+        self.attempted = np.zeros((0, n), dtype=bool)
+        self.resolved = np.zeros((0, n), dtype=bool)
+        self.run_keys: List[str] = []
+        self.history_attempts = np.zeros(n, dtype=np.int64)
+        self.history_solves = np.zeros(n, dtype=np.int64)
+        if matrix is not None and matrix.run_keys:
+            self._load_runs(matrix, min_coverage)
+
+    def _load_runs(self, matrix, min_coverage: float):
+        """Keep matrix rows that attempted at least ``min_coverage`` of this dataset."""
+        columns = np.array([matrix.index.get(i, -1) for i in self.instance_ids])
+        known = columns >= 0
+        n_bits = len(matrix.instance_ids)
+        attempted = np.unpackbits(matrix.attempted, axis=1)[:, :n_bits].astype(bool)
+        resolved = np.unpackbits(matrix.resolved, axis=1)[:, :n_bits].astype(bool)
+
+        all_attempted = np.zeros((len(matrix.run_keys), len(self.instance_ids)), dtype=bool)
+        all_resolved = np.zeros_like(all_attempted)
+        all_attempted[:, known] = attempted[:, columns[known]]
+        all_resolved[:, known] = resolved[:, columns[known]]
+        self.history_attempts = all_attempted.sum(axis=0)
+        self.history_solves = (all_resolved & all_attempted).sum(axis=0)
+
+        full = all_attempted.mean(axis=1) >= min_coverage
+        self.attempted = all_attempted[full]
+        self.resolved = all_resolved[full] & self.attempted
+        self.run_keys = [k for k, keep in zip(matrix.run_keys, full) if keep]
+
+    def difficulty(self, exclude: Optional[int] = None) -> np.ndarray:
+        """Estimated resolve probability per instance (higher = easier).
+
+        ``exclude`` leaves one full run out of the history, for validation.
+        """
+        features = np.column_stack([
+            np.ones(len(self.instances)),
+            np.log1p(self.statement_len),
+            np.log1p(self.patch_lines),
+        ])
+        attempts, solves = self.history_attempts, self.history_solves
+        if exclude is not None:
+            attempts = attempts - self.attempted[exclude]
+            solves = solves - self.resolved[exclude]
+        known = attempts > 0
+        if known.sum() < MIN_HISTORY:
+            # Too little history to calibrate against: rank every instance by size alone,
+            # longer issues and bigger fixes counting as harder, scaled into [0, 1].
+            size = (features[:, 1] / max(features[:, 1].max(), 1e-9)
+                    + features[:, 2] / max(features[:, 2].max(), 1e-9))
+            ranks = np.unique(size, return_inverse=True)[1]
+            return 1.0 - ranks / max(ranks.max(), 1)
+
+        rate = np.where(known, solves / np.maximum(attempts, 1), np.nan)
+        # Predict unseen instances' rates from their size.
+        coef, *_ = np.linalg.lstsq(features[known], rate[known], rcond=None)
+        predicted = np.clip(features @ coef, 0.0, 1.0)
+        return np.where(known, rate, predicted)
+
+    # -- selection -------------------------------------------------------
+
+    def stratified(self, size: int, exclude: Optional[int] = None) -> np.ndarray:
+        """Repo-proportional, difficulty-stratified selection (steps 1 and 2)."""
+        size = min(size, len(self.instances))
+        difficulty = self.difficulty(exclude)
+        repos = sorted(set(self.repos.tolist()))
+        quotas = _allocate({r: int((self.repos == r).sum()) for r in repos}, size)
+        cost = np.where(np.isnan(self.durations), np.nanmedian(self.durations)
+                        if np.isfinite(self.durations).any() else 0.0, self.durations)
+
+        chosen = []
+        for repo in repos:
+            quota = quotas[repo]
+            if not quota:
+                continue
+            members = np.flatnonzero(self.repos == repo)
+            members = members[np.lexsort((members, difficulty[members]))]
+            for stratum in np.array_split(members, quota):
+                # The third of the stratum nearest its mean difficulty, cheapest first.
+                gap = np.abs(difficulty[stratum] - difficulty[stratum].mean())
+                near = stratum[np.argsort(gap, kind="stable")[:max(len(stratum) // 3, 1)]]
+                chosen.append(int(near[np.argmin(cost[near])]))
+        return np.array(sorted(chosen), dtype=np.int64)
+
+    def _errors(self, subset: np.ndarray, runs: np.ndarray) -> np.ndarray:
+        """Subset score minus full score (percentage points) for each run in ``runs``."""
+        attempted, resolved = self.attempted[runs], self.resolved[runs]
+        full = resolved.sum(axis=1) / np.maximum(attempted.sum(axis=1), 1)
+        part = resolved[:, subset].sum(axis=1) / np.maximum(attempted[:, subset].sum(axis=1), 1)
+        return (part - full) * 100
+
+    def refine(self, subset: np.ndarray, runs: np.ndarray, max_swaps: Optional[int] = None) -> np.ndarray:
+        """Greedy within-repo swaps that lower the squared error on ``runs`` (step 3)."""
+        if not len(runs) or not len(subset):
+            return subset
+        attempted = self.attempted[runs].astype(np.float64)
+        resolved = self.resolved[runs].astype(np.float64)
+        full = resolved.sum(axis=1) / np.maximum(attempted.sum(axis=1), 1)
+        subset = subset.copy()
+        max_swaps = len(subset) if max_swaps is None else max_swaps
+
+        for _ in range(max_swaps):
+            num = resolved[:, subset].sum(axis=1)
+            den = attempted[:, subset].sum(axis=1)
+            current = np.sum((num / np.maximum(den, 1) - full) ** 2)
+            best = (current * (1 - 1e-9), None, None)
+            in_subset = np.zeros(len(self.instances), dtype=bool)
+            in_subset[subset] = True
+            for repo in np.unique(self.repos[subset]):
+                out_pos = np.flatnonzero(self.repos[subset] == repo)
+                candidates = np.flatnonzero((self.repos == repo) & ~in_subset)
+                if not len(candidates):
+                    continue
+                leaving = subset[out_pos]
+                # runs x leaving x joining
+                new_num = (num[:, None, None] - resolved[:, leaving][:, :, None]
+                           + resolved[:, candidates][:, None, :])
+                new_den = (den[:, None, None] - attempted[:, leaving][:, :, None]
+                           + attempted[:, candidates][:, None, :])
+                loss = np.sum((new_num / np.maximum(new_den, 1) - full[:, None, None]) ** 2, axis=0)
+                i, j = np.unravel_index(np.argmin(loss), loss.shape)
+                if loss[i, j] < best[0]:
+                    best = (loss[i, j], out_pos[i], candidates[j])
+            if best[1] is None:
+                break
+            subset[best[1]] = best[2]
+        return np.sort(subset)
+
+    def build(self, size: int, refine: bool = True, exclude: Optional[int] = None) -> np.ndarray:
+        """Indices of the chosen instances, using every full run except ``exclude``."""
+        subset = self.stratified(size, exclude)
+        if refine:
+            runs = np.array([r for r in range(len(self.run_keys)) if r != exclude], dtype=np.int64)
+            subset = self.refine(subset, runs)
+        return subset
+
+    def ids(self, subset: np.ndarray) -> List[str]:
+        return [self.instance_ids[i] for i in subset]
+
+    # -- validation ------------------------------------------------------
+
+    def validate(self, size: int) -> Dict:
+        """Mean absolute error (percentage points) of subset scores against past full runs.
+
+        ``<method>_fit_mae`` scores subsets built from all runs on those same
+        runs; ``<method>_loo_mae`` predicts each run with a subset built
+        without it, which is the honest estimate. ``method`` is the selection
+        with the lower held-out error (plain stratification unless there are
+        at least two full runs to validate refinement with).
+        """
+        all_runs = np.arange(len(self.run_keys))
+        result = {"runs": len(all_runs), "size": min(size, len(self.instances)),
+                  "method": "stratified"}
+        if not len(all_runs):
+            return result
+
+        result["first_n_mae"] = float(np.abs(self._errors(np.arange(result["size"]), all_runs)).mean())
+        for method, refine in (("stratified", False), ("refined", True)):
+            subset = self.build(size, refine)
+            result[f"{method}_fit_mae"] = float(np.abs(self._errors(subset, all_runs)).mean())
+            if len(all_runs) >= 2:
+                held_out = [abs(self._errors(self.build(size, refine, exclude=r), np.array([r]))[0])
+                            for r in all_runs]
+                result[f"{method}_loo_mae"] = float(np.mean(held_out))
+        if result.get("refined_loo_mae", np.inf) < result.get("stratified_loo_mae", np.inf):
+            result["method"] = "refined"
+        return result
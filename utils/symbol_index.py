@@ -0,0 +1,148 @@
+"""AST symbol index of a checkout, written into the workspace for the agent.
+
+Agents find definitions with repeated ``grep -rn "def foo"`` searches, which
+are slow on big repos such as django and sympy. The symbol index lists every
+module, class, function and method of the checkout with its file and line
+span, plus each module's imports, parsed with ``ast`` in a process pool.
+It is cached per (repo, commit) and built incrementally from the index of a
+nearby commit (see ``commit_index``).
+
+``write_symbol_index`` puts it into the workspace as one tab-separated
+lookup file, listed in ``.git/info/exclude`` so it never ends up in the
+extracted patch. Prompt templates point agents at it through the
+``{symbol_index}`` placeholder.
+"""
+
+import ast
+import os
+import threading
+from typing import Dict, List, Optional
+
+from utils.commit_index import CommitIndexStore, build_entries
+
+SOURCE_SUFFIXES = (".py", ".pyi")
+MAX_FILE_BYTES = 2_000_000
+LOOKUP_FILE = ".swe_symbols.tsv"
+
+STORE = CommitIndexStore("symbol_index", version=1)
+_recent: Dict[str, tuple] = {}  # repo -> (commit, entries) last used in this process
+_lock = threading.Lock()
+
+
+def module_name(path: str) -> str:
+    """Dotted module name of a source path (``pkg/sub/__init__.py`` -> ``pkg.sub``)."""
+    parts = os.path.splitext(path)[0].split("/")
+    if parts[-1] == "__init__" and len(parts) > 1:
+        parts = parts[:-1]
+    return ".".join(parts)
+
+
+def _resolve_import(module: str, is_package: bool, node: ast.ImportFrom) -> str:
+    if not node.level:
+        return node.module or ""
+    package = module.split(".") if is_package else module.split(".")[:-1]
+    base = package[:len(package) - (node.level - 1)] if node.level > 1 else package
+    return ".".join(base + ([node.module] if node.module else []))
+
+
+def _definitions(body: List[ast.stmt], prefix: str, in_class: bool, defs: List[list]):
+    for node in body:
+        if isinstance(node, ast.ClassDef):
+            name = f"{prefix}.{node.name}"
+            defs.append(["class", name, node.lineno, node.end_lineno])
+            _definitions(node.body, name, True, defs)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            # Functions nested in functions are local helpers and are not listed.
+            defs.append(["method" if in_class else "def", f"{prefix}.{node.name}",
+                         node.lineno, node.end_lineno])
+        elif isinstance(node, (ast.If, ast.Try)):
+            # Definitions under ``if TYPE_CHECKING:`` / ``try: ... except ImportError:``
+            for block in (node.body, node.orelse, getattr(node, "finalbody", []),
+                          *[h.body for h in getattr(node, "handlers", [])]):
+                _definitions(block, prefix, in_class, defs)
+
+
+def file_symbols(repo_path: str, path: str) -> Optional[Dict]:
+    """Definitions (kind, qualified name, first and last line) and imports of one file."""
+    module = module_name(path)
+    entry = {"module": module, "lines": 0, "defs": [], "imports": []}
+    try:
+        full = os.path.join(repo_path, path)
+        if os.path.getsize(full) > MAX_FILE_BYTES:
+            return entry
+        with open(full, "rb") as f:
+            source = f.read()
+        tree = ast.parse(source, filename=path)
+    except OSError:
+        return None
+    except (SyntaxError, ValueError):
+        return entry  # e.g. Python 2 files in older checkouts
+    entry["lines"] = source.count(b"\n") + 1
+
+    _definitions(tree.body, module, False, entry["defs"])
+    is_package = os.path.basename(path).startswith("__init__.")
+    imports = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            imports.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            target = _resolve_import(module, is_package, node)
+            if target:
+                imports.add(target)
+    entry["imports"] = sorted(imports)
+    return entry
+
+
+def load_symbols(repo_path: str, repo: str, commit: str, workers: Optional[int] = None) -> Dict[str, Dict]:
+    """Per-file symbols of ``repo`` at ``commit``: from memory, from disk, or built and cached."""
+    with _lock:
+        if repo in _recent and _recent[repo][0] == commit:
+            return _recent[repo][1]
+        entries = STORE.load(repo, commit)
+        if entries is None:
+            base = STORE.nearest(repo_path, repo, commit, [_recent[repo]] if repo in _recent else [])
+            entries = build_entries(repo_path, commit, SOURCE_SUFFIXES, file_symbols, base,
+                                    workers=workers or os.cpu_count() or 1)
+            try:
+                STORE.save(repo, commit, entries)
+            except OSError as e:
+                print(f"Warning: Could not cache symbol index: {e}")
+        _recent[repo] = (commit, entries)
+        return entries
+
+
+def format_lookup(repo: str, commit: str, entries: Dict[str, Dict]) -> str:
+    lines = [
+        f"# Symbol index of {repo} at {commit[:12]}",
+        "# name<TAB>kind<TAB>path:first-last line; module lines end with the modules they import",
+    ]
+    for path in sorted(entries):
+        entry = entries[path]
+        lines.append(f"{entry['module']}\tmodule\t{path}:1-{entry['lines']}"
+                     + (f"\timports {', '.join(entry['imports'])}" if entry["imports"] else ""))
+        for kind, name, first, last in entry["defs"]:
+            lines.append(f"{name}\t{kind}\t{path}:{first}-{last}")
+    return "\n".join(lines) + "\n"
+
+
+def _exclude(repo_path: str, name: str):
+    """List ``name`` in ``.git/info/exclude`` so ``git add``/``git diff`` ignore it."""
+    exclude = os.path.join(repo_path, ".git", "info", "exclude")
+    os.makedirs(os.path.dirname(exclude), exist_ok=True)
+    try:
+        with open(exclude) as f:
+            if f"/{name}" in f.read().split("\n"):
+                return
+    except FileNotFoundError:
+        pass
+    with open(exclude, "a") as f:
+        f.write(f"\n/{name}\n")
+
+
+def write_symbol_index(repo_path: str, repo: str, commit: str, workers: Optional[int] = None) -> str:
+    """Write the lookup file into the checkout and return its name (relative to the checkout)."""
+    entries = load_symbols(repo_path, repo, commit, workers)
+    _exclude(repo_path, LOOKUP_FILE)
+    with open(os.path.join(repo_path, LOOKUP_FILE), "w") as f:
+        f.write(format_lookup(repo, commit, entries))
+    return LOOKUP_FILE
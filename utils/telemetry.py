@@ -0,0 +1,249 @@
+"""Live progress metrics for patch generation runs.
+
+``RunTelemetry`` tracks throughput, in-flight sessions, queue depth,
+failure rate and per-phase latencies while ``run_on_dataset`` works
+through a dataset, and estimates the time remaining from each selected
+instance's historical generation time in the run ledger. The metrics are
+written atomically to a Prometheus textfile (for node_exporter's textfile
+collector) and can also be served over HTTP for direct scraping.
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+PREFIX = "swebench"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class RunTelemetry:
+    """Progress counters for one generation run, exported in Prometheus text format."""
+
+    def __init__(self, run_id: str, instance_ids: List[str], backend: str,
+                 model: Optional[str] = None, textfile: Optional[Path] = None,
+                 port: Optional[int] = None, history: Optional[Dict[str, float]] = None,
+                 refresh_interval: float = 15.0):
+        self.run_id = run_id
+        self.backend = backend
+        self.model = model
+        self.textfile = Path(textfile) if textfile else None
+        self.port = port
+        self.history = history or {}
+        self.refresh_interval = refresh_interval
+
+        self.pending = list(instance_ids)
+        self.in_flight: Dict[str, float] = {}
+        self.completed = 0
+        self.failed = 0
+        self.deferred = 0
+        self.failures: Dict[str, int] = {}
+        self.circuit_open = False
+        self.phase_seconds: Dict[str, float] = {}
+        self.phase_counts: Dict[str, int] = {}
+        self.started = time.time()
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._refresher = None
+        self._server = None
+
+    # -- lifecycle -------------------------------------------------------
+
+    def start(self):
+        """Begin periodic textfile refreshes and, if a port was given, serve ``/metrics``."""
+        if self.port is not None:
+            self._server = ThreadingHTTPServer(("127.0.0.1", self.port), self._handler())
+            # Port 0 binds any free port; report the one actually used.
+            self.port = self._server.server_address[1]
+            threading.Thread(target=self._server.serve_forever, daemon=True).start()
+            print(f"📡 Serving metrics on http://127.0.0.1:{self.port}/metrics")
+        if self.textfile:
+            self._stop.clear()
+            self._refresher = threading.Thread(target=self._refresh_loop, daemon=True)
+            self._refresher.start()
+        self.write()
+
+    def stop(self):
+        self._stop.set()
+        if self._refresher:
+            self._refresher.join(timeout=self.refresh_interval)
+            self._refresher = None
+        self.write()
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def _refresh_loop(self):
+        # Rates and the ETA move even when no instance finishes.
+        while not self._stop.wait(self.refresh_interval):
+            self.write()
+
+    def _handler(self):
+        telemetry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = telemetry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return MetricsHandler
+
+    # -- events ----------------------------------------------------------
+
+    def start_instance(self, instance_id: str):
+        with self._lock:
+            if instance_id in self.pending:
+                self.pending.remove(instance_id)
+            self.in_flight[instance_id] = time.time()
+        self.write()
+
+    def finish_instance(self, instance_id: str, success: bool, failure: Optional[str] = None) -> float:
+        """Mark an instance done; returns its wall time in seconds."""
+        with self._lock:
+            started = self.in_flight.pop(instance_id, time.time())
+            if success:
+                self.completed += 1
+            else:
+                self.failed += 1
+            if failure:
+                self.failures[failure] = self.failures.get(failure, 0) + 1
+        self.write()
+        return time.time() - started
+
+    def defer_instance(self, instance_id: str, failure: str) -> float:
+        """Put a failed instance back in the queue for a retry; returns the attempt's seconds."""
+        with self._lock:
+            started = self.in_flight.pop(instance_id, time.time())
+            self.pending.append(instance_id)
+            self.deferred += 1
+            self.failures[failure] = self.failures.get(failure, 0) + 1
+        self.write()
+        return time.time() - started
+
+    def set_circuit(self, is_open: bool):
+        with self._lock:
+            self.circuit_open = is_open
+        self.write()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Time a phase of the current instance (clone, cli, extract, ...)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.phase_seconds[name] = self.phase_seconds.get(name, 0.0) + elapsed
+                self.phase_counts[name] = self.phase_counts.get(name, 0) + 1
+
+    # -- derived values --------------------------------------------------
+
+    def eta_seconds(self) -> Optional[float]:
+        """Seconds left: historical time for each remaining instance, this run's mean for the rest."""
+        with self._lock:
+            done = self.completed + self.failed
+            elapsed = time.time() - self.started
+            observed = elapsed / done if done else None
+            known = [self.history[i] for i in self.pending if i in self.history]
+            fallback = observed
+            if fallback is None and self.history:
+                fallback = sum(self.history.values()) / len(self.history)
+            unknown = len(self.pending) - len(known)
+            if unknown and fallback is None:
+                return None
+            remaining = sum(known) + unknown * (fallback or 0.0)
+            # Credit time already spent on the instances in flight.
+            for instance_id, started in self.in_flight.items():
+                expected = self.history.get(instance_id, fallback) or 0.0
+                remaining += max(expected - (time.time() - started), 0.0)
+            return remaining
+
+    def progress_line(self) -> str:
+        """One-line human summary: done/total, throughput, failures and ETA."""
+        eta = self.eta_seconds()
+        with self._lock:
+            done = self.completed + self.failed
+            total = done + len(self.pending) + len(self.in_flight)
+            rate = done / max(time.time() - self.started, 1e-9) * 3600
+            failed = self.failed
+        eta_text = f"{eta / 60:.0f}m" if eta is not None else "?"
+        return f"[{done}/{total}] {rate:.1f} instances/h, {failed} failed, ETA {eta_text}"
+
+    def render(self) -> str:
+        """Current metrics in Prometheus text exposition format."""
+        eta = self.eta_seconds()
+        with self._lock:
+            elapsed = max(time.time() - self.started, 1e-9)
+            done = self.completed + self.failed
+            labels = f'run="{_escape(self.run_id)}",backend="{_escape(self.backend)}"'
+            lines = []
+
+            def metric(name, kind, help_text, samples):
+                lines.append(f"# HELP {PREFIX}_{name} {help_text}")
+                lines.append(f"# TYPE {PREFIX}_{name} {kind}")
+                for sample in samples:
+                    suffix, extra, value = sample if len(sample) == 3 else ("",) + sample
+                    label_text = labels + (f",{extra}" if extra else "")
+                    lines.append(f"{PREFIX}_{name}{suffix}{{{label_text}}} {value}")
+
+            metric("run_info", "gauge", "Run metadata.",
+                   [(f'model="{_escape(self.model or "")}"', 1)])
+            metric("run_start_timestamp_seconds", "gauge", "Unix time the run started.",
+                   [("", f"{self.started:.3f}")])
+            metric("instances_total", "counter", "Instances finished, by outcome.",
+                   [('outcome="completed"', self.completed), ('outcome="failed"', self.failed)])
+            metric("failures_total", "counter", "Failed attempts, by failure class (retried ones included).",
+                   [(f'class="{_escape(c)}"', n) for c, n in sorted(self.failures.items())])
+            metric("retries_total", "counter", "Failed attempts deferred for a retry.",
+                   [("", self.deferred)])
+            metric("circuit_open", "gauge", "1 while dispatch is paused after repeated fatal backend errors.",
+                   [("", int(self.circuit_open))])
+            metric("queue_depth", "gauge", "Instances not yet started.",
+                   [("", len(self.pending))])
+            metric("inflight_sessions", "gauge", "Instances currently being processed.",
+                   [("", len(self.in_flight))])
+            metric("instances_per_hour", "gauge", "Finished instances per hour since the run started.",
+                   [("", f"{done / elapsed * 3600:.3f}")])
+            metric("failure_ratio", "gauge", "Fraction of finished instances that failed.",
+                   [("", f"{self.failed / done:.4f}" if done else "0")])
+            metric("eta_seconds", "gauge", "Estimated seconds until the run finishes.",
+                   [("", f"{eta:.1f}" if eta is not None else "NaN")])
+            phases = sorted(self.phase_seconds)
+            metric("phase_seconds", "summary", "Seconds spent per processing phase.",
+                   [sample for p in phases for sample in (
+                       ("_sum", f'phase="{p}"', f"{self.phase_seconds[p]:.3f}"),
+                       ("_count", f'phase="{p}"', self.phase_counts[p]),
+                   )])
+        return "\n".join(lines) + "\n"
+
+    def write(self):
+        """Atomically replace the textfile so collectors never read a partial file."""
+        if not self.textfile:
+            return
+        tmp_file = self.textfile.with_name(f".{self.textfile.name}.{os.getpid()}.tmp")
+        try:
+            self.textfile.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_file, "w") as f:
+                f.write(self.render())
+            os.replace(tmp_file, self.textfile)
+        except OSError as exc:
+            print(f"Warning: Could not write metrics to {self.textfile}: {exc}")
@@ -0,0 +1,133 @@
+"""Per-instance time budgets for agent sessions, derived from run history.
+
+Every backend used to give each CLI session a fixed 600 s. Easy instances
+finish in a fraction of that while some legitimately need longer, so the
+fixed cap both held slots for sessions that had stopped making progress
+and killed ones that would have succeeded. ``TimeBudgets`` sets each
+instance's budget from the per-instance history in the run ledger:
+
+* a percentile of the durations of completed sessions (a patch or an
+  empty diff, not errors) times a safety margin,
+* taken from the instance's own history when there is any, otherwise from
+  its repo's, otherwise from the whole backend's, preferring sessions of
+  the same model at each level when there are enough of them,
+* raised past the previous limit when the instance's latest session ran
+  out of time, since its true duration is then unknown,
+* and clamped to a floor and ceiling.
+
+``run_deadline`` scales the whole run's time limit with the budgets of the
+instances it will process and the number of concurrent workers.
+"""
+
+import math
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_BUDGET = 600.0
+
+# Outcomes whose duration is the session's real length.
+COMPLETED = ("patch", "empty")
+# Outcomes where the session hit its limit (its real length is unknown).
+TRUNCATED = ("timeout",)
+
+# Sessions needed before a repo or backend level is trusted.
+MIN_SAMPLES = 5
+
+
+def repo_of(instance_id: str) -> str:
+    """Repo part of a SWE-bench instance ID (``django__django-11133`` -> ``django__django``)."""
+    return instance_id.rsplit("-", 1)[0]
+
+
+def _percentile(values: List[float], q: float) -> float:
+    """Linear-interpolated percentile (0-100) of a non-empty list."""
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    low = math.floor(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+class TimeBudgets:
+    """Time limits for agent sessions, per instance."""
+
+    def __init__(self, history: Iterable[Tuple[str, Optional[str], float, str]] = (),
+                 model: Optional[str] = None, percentile: float = 90.0, margin: float = 1.5,
+                 floor: float = 120.0, ceiling: float = 1800.0, default: float = DEFAULT_BUDGET,
+                 timeout_growth: float = 1.5):
+        self.model = model
+        self.percentile = percentile
+        self.margin = margin
+        self.floor = floor
+        self.ceiling = max(ceiling, floor)
+        self.default = default
+        self.timeout_growth = timeout_growth
+
+        # level -> key -> [(model, seconds)]
+        self._completed: Dict[str, Dict[str, List[Tuple[Optional[str], float]]]] = {
+            "instance": {}, "repo": {}, "all": {},
+        }
+        self._last_timeout: Dict[str, float] = {}
+        for instance_id, row_model, seconds, outcome in history:
+            if seconds is None:
+                continue
+            if outcome in COMPLETED:
+                sample = (row_model, float(seconds))
+                self._completed["instance"].setdefault(instance_id, []).append(sample)
+                self._completed["repo"].setdefault(repo_of(instance_id), []).append(sample)
+                self._completed["all"].setdefault("", []).append(sample)
+                self._last_timeout.pop(instance_id, None)
+            elif outcome in TRUNCATED:
+                self._last_timeout[instance_id] = float(seconds)
+
+    @classmethod
+    def from_ledger(cls, ledger, backend: Optional[str] = None, **kwargs) -> "TimeBudgets":
+        try:
+            history = ledger.instance_history(backend)
+        except Exception as e:
+            print(f"Warning: Could not read session history for time budgets: {e}")
+            history = []
+        return cls(history, **kwargs)
+
+    def _samples(self, level: str, key: str, minimum: int) -> Optional[List[float]]:
+        rows = self._completed[level].get(key, [])
+        same_model = [s for m, s in rows if self.model and m == self.model]
+        if len(same_model) >= minimum:
+            return same_model
+        if len(rows) >= minimum:
+            return [s for _, s in rows]
+        return None
+
+    def explain(self, instance_id: str) -> Tuple[float, str]:
+        """(budget in seconds, where it came from) for an instance."""
+        levels = (
+            ("instance", instance_id, 1),
+            ("repo", repo_of(instance_id), MIN_SAMPLES),
+            ("all", "", MIN_SAMPLES),
+        )
+        budget, source = self.default, "default"
+        for level, key, minimum in levels:
+            samples = self._samples(level, key, minimum)
+            if samples:
+                budget = _percentile(samples, self.percentile) * self.margin
+                source = f"p{self.percentile:g} of {len(samples)} {level} session(s)"
+                break
+
+        timed_out = self._last_timeout.get(instance_id)
+        if timed_out is not None and budget < timed_out * self.timeout_growth:
+            budget = timed_out * self.timeout_growth
+            source = "previous session timed out"
+        return min(max(budget, self.floor), self.ceiling), source
+
+    def for_instance(self, instance_id: str) -> float:
+        return self.explain(instance_id)[0]
+
+
+def run_deadline(budgets: Iterable[float], workers: int = 1, overhead: float = 120.0,
+                 slack: float = 1.25) -> float:
+    """Seconds a run of sessions with these budgets should be allowed in total.
+
+    Each instance also pays ``overhead`` seconds for cloning and patch
+    extraction; ``workers`` sessions run concurrently.
+    """
+    total = sum(budget + overhead for budget in budgets)
+    return total / max(workers, 1) * slack
@@ -0,0 +1,328 @@
+"""Chrome trace-event / Perfetto timelines of benchmark runs.
+
+``session(path)`` turns tracing on for the current process and, through
+``$SWE_BENCH_TRACE_DIR``, for every child process that calls
+``init_from_env`` (the generation agent does). Each process buffers
+complete ("X") events for its spans and appends them to its own part
+file; when the session ends the parts are merged into one JSON trace that
+opens in chrome://tracing or ui.perfetto.dev, with a track per process
+and thread and nested spans per phase.
+
+The SWE-bench harness runs in its own process and is not instrumented;
+its per-instance spans (container start, patch, tests, grading) and image
+builds are reconstructed from the timestamps in its logs.
+
+When tracing is off, ``span`` returns a shared no-op context manager, so
+instrumented code pays one global lookup per span.
+"""
+
+import atexit
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+TRACE_DIR_ENV = "SWE_BENCH_TRACE_DIR"
+
+# Events are appended to the part file in batches of this size.
+FLUSH_EVERY = 512
+
+# Synthetic process IDs for tracks reconstructed from harness logs.
+HARNESS_PID = 1 << 22
+BUILD_PID = HARNESS_PID + 1
+
+_LOG_TIMESTAMP = re.compile(r"^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}),(\d{3})")
+
+# (phase, pattern) pairs marking where each stage of a harness instance
+# starts; a stage ends where the next one found in the log begins.
+HARNESS_STAGES = (
+    ("create container", re.compile(r"Creating container for")),
+    ("apply patch", re.compile(r"Container for .* started")),
+    ("run tests", re.compile(r"Eval script for .* written")),
+    ("grade", re.compile(r"Grading answer for")),
+)
+
+_enabled = False
+_part_file: Optional[Path] = None
+_buffer: List[Dict] = []
+_lock = threading.Lock()
+_named_threads = set()
+
+
+def _now_us() -> int:
+    return time.time_ns() // 1000
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("name", "cat", "args", "start")
+
+    def __init__(self, name: str, cat: str, args: Dict):
+        self.name = name
+        self.cat = cat
+        self.args = args
+
+    def __enter__(self):
+        self.start = _now_us()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        args = self.args
+        if exc_type is not None:
+            args = dict(args, error=exc_type.__name__)
+        record({
+            "name": self.name, "cat": self.cat, "ph": "X",
+            "ts": self.start, "dur": _now_us() - self.start,
+            "pid": os.getpid(), "tid": threading.get_ident(), "args": args,
+        })
+        return False
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def span(name: str, cat: str = "phase", **args):
+    """Context manager recording ``name`` as a complete event on the current thread."""
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name, cat, args)
+
+
+def record(event: Dict):
+    """Buffer a raw trace event, naming the thread's track the first time it is seen."""
+    if not _enabled:
+        return
+    with _lock:
+        thread_key = (event["pid"], event["tid"])
+        if event["pid"] == os.getpid() and thread_key not in _named_threads:
+            _named_threads.add(thread_key)
+            _buffer.append({
+                "name": "thread_name", "ph": "M", "pid": event["pid"], "tid": event["tid"],
+                "args": {"name": threading.current_thread().name},
+            })
+        _buffer.append(event)
+        full = len(_buffer) >= FLUSH_EVERY
+    if full:
+        flush()
+
+
+def flush():
+    """Append buffered events to this process's part file."""
+    global _buffer
+    with _lock:
+        events, _buffer = _buffer, []
+    if not events or _part_file is None:
+        return
+    try:
+        with open(_part_file, "a") as f:
+            for event in events:
+                f.write(json.dumps(event) + "\n")
+    except OSError as exc:
+        print(f"Warning: Could not write trace events: {exc}")
+
+
+def enable(trace_dir: Path, process_name: str):
+    """Record this process's spans into ``trace_dir`` and pass the directory on to children."""
+    global _enabled, _part_file
+    trace_dir = Path(trace_dir)
+    trace_dir.mkdir(parents=True, exist_ok=True)
+    os.environ[TRACE_DIR_ENV] = str(trace_dir)
+    _part_file = trace_dir / f"trace.{os.getpid()}.jsonl"
+    _enabled = True
+    with _lock:
+        _buffer.append({
+            "name": "process_name", "ph": "M", "pid": os.getpid(), "tid": 0,
+            "args": {"name": f"{process_name} (pid {os.getpid()})"},
+        })
+    atexit.register(flush)
+
+
+def init_from_env(process_name: str) -> bool:
+    """Enable tracing if a parent process started a trace session."""
+    trace_dir = os.environ.get(TRACE_DIR_ENV)
+    if trace_dir and not _enabled:
+        enable(Path(trace_dir), process_name)
+    return _enabled
+
+
+def disable():
+    global _enabled, _part_file
+    flush()
+    _enabled = False
+    _part_file = None
+    _named_threads.clear()
+    os.environ.pop(TRACE_DIR_ENV, None)
+
+
+def merge(trace_dir: Path, output: Path) -> int:
+    """Merge every part file in ``trace_dir`` into a Chrome trace JSON; returns the event count."""
+    events = []
+    for part in sorted(Path(trace_dir).glob("trace.*.jsonl")):
+        with open(part) as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    try:
+                        events.append(json.loads(line))
+                    except ValueError:
+                        continue  # truncated by a killed process
+    # Metadata first, then events in time order.
+    events.sort(key=lambda e: (e.get("ph") != "M", e.get("ts", 0)))
+    tmp_file = Path(output).with_name(Path(output).name + ".tmp")
+    with open(tmp_file, "w") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+    os.replace(tmp_file, output)
+    return len(events)
+
+
+@contextmanager
+def session(output: Optional[str], process_name: str) -> Iterator[None]:
+    """Trace everything inside the block (and its child processes) into ``output``."""
+    if not output:
+        yield
+        return
+
+    output = Path(output)
+    trace_dir = output.with_name(output.name + ".parts")
+    shutil.rmtree(trace_dir, ignore_errors=True)
+    enable(trace_dir, process_name)
+    try:
+        with span(process_name, cat="command"):
+            yield
+    finally:
+        disable()
+        count = merge(trace_dir, output)
+        shutil.rmtree(trace_dir, ignore_errors=True)
+        print(f"\n🧭 Wrote {count} trace events to {output} (open in https://ui.perfetto.dev)")
+
+
+# -- harness logs ---------------------------------------------------------
+
+def _log_times(log_path: Path) -> List[Tuple[float, str]]:
+    """(epoch seconds, message) for each timestamped line of a harness log."""
+    entries = []
+    try:
+        with open(log_path, errors="replace") as f:
+            for line in f:
+                match = _LOG_TIMESTAMP.match(line)
+                if match:
+                    stamp = datetime.strptime(match.group(1), "%Y-%m-%d %H:%M:%S")
+                    entries.append((stamp.timestamp() + int(match.group(2)) / 1000, line))
+    except OSError:
+        pass
+    return entries
+
+
+def _assign_lanes(spans: List[Tuple[float, float, Dict]]) -> List[int]:
+    """Give overlapping spans distinct lanes, reusing a lane once it is free."""
+    lane_ends: List[float] = []
+    lanes = []
+    for start, end, _ in spans:
+        for lane, lane_end in enumerate(lane_ends):
+            if lane_end <= start:
+                lane_ends[lane] = end
+                lanes.append(lane)
+                break
+        else:
+            lane_ends.append(end)
+            lanes.append(len(lane_ends) - 1)
+    return lanes
+
+
+def _complete(name: str, cat: str, start: float, end: float, pid: int, tid: int,
+              args: Optional[Dict] = None) -> Dict:
+    return {
+        "name": name, "cat": cat, "ph": "X", "ts": int(start * 1e6),
+        "dur": max(int((end - start) * 1e6), 1), "pid": pid, "tid": tid, "args": args or {},
+    }
+
+
+def harness_events(report_dir: Path, run_id: str, since: float = 0.0) -> List[Dict]:
+    """Reconstruct per-instance evaluation and image build spans from harness logs.
+
+    Instances evaluated concurrently are laid out on separate worker tracks.
+    Only image build logs written after ``since`` are included.
+    """
+    report_dir = Path(report_dir)
+    spans = []
+    for log_path in (report_dir / "logs" / "run_evaluation" / run_id).glob("*/*/run_instance.log"):
+        lines = _log_times(log_path)
+        if not lines:
+            continue
+        spans.append((lines[0][0], lines[-1][0], {
+            "instance_id": log_path.parent.name,
+            "model": log_path.parent.parent.name,
+            "lines": lines,
+        }))
+    spans.sort(key=lambda s: s[0])
+
+    events = [
+        {"name": "process_name", "ph": "M", "pid": HARNESS_PID, "tid": 0,
+         "args": {"name": f"SWE-bench harness ({run_id})"}},
+    ]
+    lanes = _assign_lanes(spans)
+    for lane in sorted(set(lanes)):
+        events.append({"name": "thread_name", "ph": "M", "pid": HARNESS_PID, "tid": lane + 1,
+                       "args": {"name": f"eval worker {lane + 1}"}})
+
+    for (start, end, info), lane in zip(spans, lanes):
+        tid = lane + 1
+        events.append(_complete(f"eval {info['instance_id']}", "docker_eval", start, end,
+                                HARNESS_PID, tid, {"instance_id": info["instance_id"],
+                                                   "model": info["model"]}))
+        marks = []
+        for name, pattern in HARNESS_STAGES:
+            for stamp, line in info["lines"]:
+                if pattern.search(line):
+                    marks.append((stamp, name))
+                    break
+        marks.sort()
+        for i, (stamp, name) in enumerate(marks):
+            stage_end = marks[i + 1][0] if i + 1 < len(marks) else end
+            events.append(_complete(name, "docker_eval", stamp, stage_end, HARNESS_PID, tid))
+
+    builds = []
+    for log_path in (report_dir / "logs").glob("**/build_image.log"):
+        try:
+            if log_path.stat().st_mtime < since:
+                continue
+        except OSError:
+            continue
+        lines = _log_times(log_path)
+        if lines:
+            builds.append((lines[0][0], lines[-1][0], {"image": log_path.parent.name}))
+    builds.sort(key=lambda b: b[0])
+    if builds:
+        events.append({"name": "process_name", "ph": "M", "pid": BUILD_PID, "tid": 0,
+                       "args": {"name": "Docker image builds"}})
+        for (start, end, info), lane in zip(builds, _assign_lanes(builds)):
+            events.append(_complete(f"build {info['image']}", "image_build", start, end,
+                                    BUILD_PID, lane + 1, info))
+    return events
+
+
+def record_harness(report_dir: Path, run_id: str, since: float = 0.0):
+    """Add harness log spans for ``run_id`` to the current trace."""
+    if not _enabled:
+        return
+    for event in harness_events(report_dir, run_id, since):
+        with _lock:
+            _buffer.append(event)
+    flush()
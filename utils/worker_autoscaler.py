@@ -0,0 +1,292 @@
+"""Resource-aware sizing of Docker evaluation workers.
+
+``--max-workers auto`` sizes harness concurrency from the CPUs, memory and
+disk actually available to this host (respecting cgroup limits), then keeps
+re-sizing between evaluation waves using the memory observed in the
+running ``sweb.eval.*`` containers and the system load.
+"""
+
+import argparse
+import math
+import os
+import shutil
+import subprocess
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from utils import tracing
+from utils.evaluation_harness import build_harness_command, run_harness
+
+AUTO = "auto"
+
+GIB = 1024 ** 3
+
+# SWE-bench recommends staying under min(0.75 * cores, 24) workers.
+CPU_FRACTION = 0.75
+HARD_MAX_WORKERS = 24
+# Initial per-container estimates, replaced by observations during the run.
+DEFAULT_CONTAINER_MEMORY = 3 * GIB
+DISK_PER_WORKER = 10 * GIB
+# Keep this much memory/disk free for the Docker daemon and the host itself.
+MEMORY_RESERVE = 2 * GIB
+DISK_RESERVE = 20 * GIB
+
+
+def parse_max_workers(value: str):
+    """argparse type accepting a positive integer or ``auto``."""
+    if str(value).lower() == AUTO:
+        return AUTO
+    try:
+        workers = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected an integer or '{AUTO}', got {value!r}")
+    if workers < 1:
+        raise argparse.ArgumentTypeError("--max-workers must be at least 1")
+    return workers
+
+
+def _read_first_line(path: str) -> Optional[str]:
+    try:
+        with open(path) as f:
+            return f.readline().strip()
+    except OSError:
+        return None
+
+
+def cpu_limit() -> float:
+    """Number of CPUs usable by this process, honouring affinity and cgroup quotas."""
+    try:
+        cpus = float(len(os.sched_getaffinity(0)))
+    except AttributeError:
+        cpus = float(os.cpu_count() or 1)
+
+    # cgroup v2: "<quota> <period>" or "max <period>"
+    line = _read_first_line("/sys/fs/cgroup/cpu.max")
+    if line:
+        quota, _, period = line.partition(" ")
+        if quota != "max" and period:
+            cpus = min(cpus, int(quota) / int(period))
+    else:
+        # cgroup v1
+        quota = _read_first_line("/sys/fs/cgroup/cpu/cpu.cfs_quota_us")
+        period = _read_first_line("/sys/fs/cgroup/cpu/cpu.cfs_period_us")
+        if quota and period and int(quota) > 0:
+            cpus = min(cpus, int(quota) / int(period))
+
+    return max(cpus, 1.0)
+
+
+def _meminfo() -> Dict[str, int]:
+    info = {}
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                parts = rest.split()
+                if parts:
+                    info[key] = int(parts[0]) * 1024
+    except OSError:
+        pass
+    return info
+
+
+def available_memory() -> Optional[int]:
+    """Bytes of memory available for new containers, or None if unknown."""
+    candidates = []
+
+    meminfo = _meminfo()
+    if "MemAvailable" in meminfo:
+        candidates.append(meminfo["MemAvailable"])
+
+    # cgroup v2, then v1. v1 reports a huge sentinel when unlimited.
+    for limit_path, usage_path in (
+        ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory.current"),
+        ("/sys/fs/cgroup/memory/memory.limit_in_bytes", "/sys/fs/cgroup/memory/memory.usage_in_bytes"),
+    ):
+        limit = _read_first_line(limit_path)
+        if not limit:
+            continue
+        if limit != "max" and int(limit) < (1 << 60):
+            usage = _read_first_line(usage_path)
+            candidates.append(int(limit) - int(usage or 0))
+        break
+
+    return min(candidates) if candidates else None
+
+
+def docker_root_dir() -> Path:
+    """Docker's data directory, falling back to the current directory."""
+    try:
+        result = subprocess.run(
+            ["docker", "info", "--format", "{{.DockerRootDir}}"],
+            capture_output=True, text=True, timeout=15,
+        )
+        if result.returncode == 0 and result.stdout.strip():
+            root = Path(result.stdout.strip())
+            if root.exists():
+                return root
+    except (OSError, subprocess.TimeoutExpired):
+        pass
+    return Path.cwd()
+
+
+def free_disk(path: Path) -> int:
+    """Free bytes on the filesystem holding ``path``."""
+    try:
+        return shutil.disk_usage(str(path)).free
+    except OSError:
+        return shutil.disk_usage(str(Path.cwd())).free
+
+
+def parse_size(text: str) -> int:
+    """Parse a Docker size such as ``512.3MiB``, ``1.2GB`` or ``200G``."""
+    text = text.strip()
+    units = {
+        "b": 1, "kb": 1000, "mb": 1000 ** 2, "gb": 1000 ** 3, "tb": 1000 ** 4,
+        "kib": 1024, "mib": 1024 ** 2, "gib": 1024 ** 3, "tib": 1024 ** 4,
+        "k": 1024, "m": 1024 ** 2, "g": 1024 ** 3, "t": 1024 ** 4,
+    }
+    number = text.rstrip("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ")
+    unit = text[len(number):].lower() or "b"
+    try:
+        return int(float(number) * units.get(unit, 1))
+    except ValueError:
+        return 0
+
+
+def container_memory_usage(prefix: str = "sweb.eval.") -> List[int]:
+    """Current memory usage (bytes) of the harness's evaluation containers."""
+    try:
+        result = subprocess.run(
+            ["docker", "stats", "--no-stream", "--format", "{{.Name}}\t{{.MemUsage}}"],
+            capture_output=True, text=True, timeout=30,
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return []
+    if result.returncode != 0:
+        return []
+
+    usages = []
+    for line in result.stdout.splitlines():
+        name, _, usage = line.partition("\t")
+        if name.startswith(prefix) and usage:
+            usages.append(parse_size(usage.split("/")[0]))
+    return usages
+
+
+class WorkerAutoscaler:
+    """Recommend an evaluation worker count and refine it while the run progresses."""
+
+    def __init__(self, min_workers: int = 1, max_workers: int = HARD_MAX_WORKERS,
+                 container_memory: int = DEFAULT_CONTAINER_MEMORY,
+                 disk_per_worker: int = DISK_PER_WORKER,
+                 sample_interval: float = 10.0):
+        self.min_workers = min_workers
+        self.max_workers = max_workers
+        self.container_memory = container_memory
+        self.disk_per_worker = disk_per_worker
+        self.sample_interval = sample_interval
+        self.docker_root = docker_root_dir()
+        self.observed_peak = 0
+        self._stop = threading.Event()
+        self._sampler = None
+
+    def limits(self) -> Dict[str, int]:
+        """Worker ceilings imposed by each resource."""
+        cpus = cpu_limit()
+        cpu_workers = cpus * CPU_FRACTION
+
+        # Back off when the host is already busy with something else.
+        try:
+            load_per_cpu = os.getloadavg()[0] / cpus
+        except (AttributeError, OSError):
+            load_per_cpu = 0.0
+        if load_per_cpu > 1.0:
+            cpu_workers /= load_per_cpu
+
+        per_container = max(self.container_memory, int(self.observed_peak * 1.25))
+        memory = available_memory()
+        if memory is None:
+            memory_workers = self.max_workers
+        else:
+            memory_workers = (memory - MEMORY_RESERVE) // per_container
+
+        disk = free_disk(self.docker_root) - DISK_RESERVE
+        disk_workers = disk // self.disk_per_worker
+
+        return {
+            "cpu": int(math.floor(cpu_workers)),
+            "memory": int(memory_workers),
+            "disk": int(disk_workers),
+        }
+
+    def recommend(self) -> int:
+        """Worker count that fits every resource limit."""
+        workers = min(self.limits().values())
+        return max(self.min_workers, min(self.max_workers, workers))
+
+    def describe(self) -> str:
+        limits = self.limits()
+        parts = ", ".join(f"{name}≤{value}" for name, value in limits.items())
+        return f"{self.recommend()} workers ({parts})"
+
+    def sample(self):
+        """Record the largest container footprint seen so far."""
+        usages = container_memory_usage()
+        if usages:
+            self.observed_peak = max(self.observed_peak, max(usages))
+
+    def _sample_loop(self):
+        while not self._stop.wait(self.sample_interval):
+            self.sample()
+
+    def start_sampling(self):
+        self._stop.clear()
+        self._sampler = threading.Thread(target=self._sample_loop, daemon=True)
+        self._sampler.start()
+
+    def stop_sampling(self):
+        self._stop.set()
+        if self._sampler:
+            self._sampler.join(timeout=self.sample_interval)
+            self._sampler = None
+
+
+def run_harness_autoscaled(predictions_path: str, dataset_name: str, run_id: str,
+                           report_dir: Path, instance_ids: List[str],
+                           timeout: int = 600, cache_level: str = "env",
+                           wave_factor: int = 4) -> List[str]:
+    """Evaluate predictions in waves, re-sizing the worker pool between waves.
+
+    Each wave is a harness invocation restricted to ``--instance_ids`` under the
+    same ``run_id``, so the harness skips instances that already have a report.
+    A final invocation over all predictions then writes the combined run report.
+    """
+    autoscaler = WorkerAutoscaler()
+    autoscaler.start_sampling()
+    output_lines = []
+    remaining = list(instance_ids)
+    try:
+        while remaining:
+            workers = autoscaler.recommend()
+            wave, remaining = remaining[:workers * wave_factor], remaining[workers * wave_factor:]
+            print(f"\n⚙️  Auto workers: {autoscaler.describe()} - "
+                  f"evaluating {len(wave)} instances ({len(remaining)} queued)")
+            cmd = build_harness_command(
+                predictions_path, dataset_name, run_id, workers, report_dir,
+                timeout=timeout, cache_level=cache_level, instance_ids=wave,
+            )
+            with tracing.span("harness wave", cat="evaluation", workers=workers, instances=len(wave)):
+                output_lines.extend(run_harness(cmd, report_dir))
+    finally:
+        autoscaler.stop_sampling()
+
+    # Everything is already graded; this pass only aggregates the run report.
+    cmd = build_harness_command(
+        predictions_path, dataset_name, run_id, 1, report_dir,
+        timeout=timeout, cache_level=cache_level,
+    )
+    with tracing.span("harness report", cat="evaluation"):
+        output_lines.extend(run_harness(cmd, report_dir))
+    return output_lines